@@ -1 +1,9 @@
-from app.main import app
\ No newline at end of file
+import os
+
+# Serverless: cada instância atende uma requisição por vez e pode congelar
+# entre elas, então não mantém pool próprio (use o pooler do provedor na URL)
+os.environ.setdefault("DB_NULL_POOL", "true")
+# Schema vem do `alembic upgrade head` no deploy; o cold start não reflete tabelas
+os.environ.setdefault("DB_CREATE_TABLES_ON_STARTUP", "false")
+
+from app.main import app  # noqa: E402
@@ -10,9 +10,19 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60      # 1 hora (seguro)
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30        # refresh válido por 30 dias
     CRON_SECRET: str | None = None             # segredo para proteger /alerts/run-check
+    AUTH_USER_CACHE_TTL_SECONDS: int = 60      # cache do usuário autenticado (por processo)
+    AUTH_USER_CACHE_SIZE: int = 10000
 
     # === Banco de Dados ===
     DATABASE_URL: str  # ← ESSA LINHA É OBRIGATÓRIA!
+    ASYNC_DATABASE_URL: str | None = None       # rotas async; vazio = DATABASE_URL com asyncpg/aiosqlite
+    DB_POOL_SIZE: int = 5                       # conexões mantidas abertas por engine/processo
+    DB_MAX_OVERFLOW: int = 10                   # extras além do pool_size nos picos
+    DB_POOL_TIMEOUT_SECONDS: int = 30           # espera por uma conexão livre antes do erro "QueuePool limit"
+    DB_POOL_RECYCLE_SECONDS: int = 3600         # recicla conexões mais velhas que isso
+    DB_POOL_PRE_PING: bool = True               # False = sem SELECT 1 por checkout; reconecta após o erro
+    DB_NULL_POOL: bool = False                  # sem pool no processo (serverless / PgBouncer)
+    DB_CREATE_TABLES_ON_STARTUP: bool = True    # create_all no startup (DEV); produção: só migrations
 
     # === Albion API ===
     ALBION_REGION: str = "europe"
@@ -23,6 +33,35 @@ class Settings(BaseSettings):
     }
     ALBION_VALID_REGIONS: list = ["europe", "west", "east"]
     ALBION_API_TIMEOUT: int = 15
+    ALBION_API_RETRIES: int = 2                 # novas tentativas em GET (5xx, 429, conexão)
+    ALBION_API_BACKOFF: float = 0.5             # backoff exponencial entre tentativas (s)
+    ALBION_CIRCUIT_FAILURES: int = 5            # falhas seguidas para abrir o circuito da região
+    ALBION_CIRCUIT_RESET_SECONDS: int = 60      # tempo com o circuito aberto antes de testar de novo
+    ALBION_FRESHNESS_HALF_LIFE_HOURS: float = 6.0  # meia-vida da penalidade por idade do preço (0 = desliga)
+    ALBION_COMPARE_CONCURRENCY: int = 8         # /prices/compare simultâneos (threads = regiões × isso)
+
+    # === Jobs em background (APScheduler) ===
+    SCHEDULER_ENABLED: bool = False             # liga o scheduler no startup (não use em serverless)
+    INGESTION_INTERVAL_SECONDS: int = 120       # < TTL do cache de preços, para o espelho nunca esfriar
+    INGESTION_BATCH_SIZE: int = 50              # itens por chamada ao upstream
+    INGESTION_REGIONS: List[str] = ["europe", "west", "east"]
+
+    # === Alertas ===
+    ALERT_MAX_PRICE_AGE_HOURS: float = 24.0     # ignora preços mais velhos que isso ao checar alertas
+    ALERT_CHECKER_BATCH_SIZE: int = 200         # alertas por lote (commit + checkpoint por lote)
+    ALERT_CHECKER_WORKERS: int = 4              # workers avaliando cada lote em paralelo (1 = sequencial)
+    ALERT_CHECKER_RESUME_HOURS: float = 6.0     # retoma execução interrompida se começou há menos que isso
+    ALERT_CHECKER_LEASE_SECONDS: int = 300      # lease do checkpoint (renovado por lote); outra execução espera expirar
+    ALERT_EVENTS_ENABLED: bool = False          # avalia alertas assim que chegam preços novos
+    ALERT_BASELINE_TTL_SECONDS: int = 600       # baseline da IA compartilhado entre alertas por esse tempo
+    NOTIFICATIONS_SSE_KEEPALIVE_SECONDS: int = 15  # comentário SSE enviado quando não há notificação nova
+
+    # === Retenção de notificações ===
+    NOTIFICATION_RETENTION_DAYS: int = 30       # notificações lidas mais velhas que isso saem da tabela
+    NOTIFICATION_ARCHIVE_ENABLED: bool = True   # move para user_notifications_archive em vez de apagar
+    NOTIFICATION_RETENTION_BATCH_SIZE: int = 1000  # linhas por transação (mantém os locks curtos)
+    NOTIFICATION_COMPACT_LOOKBACK_DAYS: int = 2  # compactação só parte das notificações desse período (0 = tabela inteira)
+    NOTIFICATION_RETENTION_INTERVAL_HOURS: int = 24  # intervalo do job no scheduler
 
     # === E-mail / SMTP / Resend ===
     # Estes campos existem apenas para que o Pydantic não acuse erro de "extra inputs"
@@ -38,6 +77,13 @@ class Settings(BaseSettings):
     RESEND_FROM_EMAIL: str | None = None
     RESEND_REPLY_TO: str | None = None
 
+    # Fila de e-mails (outbox)
+    EMAIL_OUTBOX_BATCH_SIZE: int = 100          # e-mails por chamada ao Resend (limite do /emails/batch)
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 5          # depois disso o e-mail fica como "failed"
+    EMAIL_OUTBOX_BACKOFF_SECONDS: int = 30      # espera base entre tentativas (dobra a cada falha)
+    EMAIL_OUTBOX_CLAIM_SECONDS: int = 300       # lote reservado ("sending") volta à fila se o envio não terminar nesse tempo
+    EMAIL_OUTBOX_INTERVAL_SECONDS: int = 30     # intervalo do job que drena a fila (scheduler)
+
     # URLs auxiliares
     APP_BASE_URL: str | None = None
     FRONTEND_URL: str | None = None
@@ -0,0 +1,154 @@
+# app/core/db_pool.py
+"""
+Configuração e métricas do pool de conexões.
+
+Os engines (síncrono e assíncrono) são criados com `engine_options()`, que lê
+o tamanho do pool, timeouts e o modo de verificação das conexões do
+`Settings`. Cada engine recebe uma subclasse do pool que mede quanto tempo
+cada checkout esperou por uma conexão e quantos estouraram o
+`pool_timeout`; `pool_status()` junta isso ao estado atual do pool para o
+`/health/pool`.
+"""
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+
+from app.core.config import settings
+
+logger = logging.getLogger("albion_market")
+
+
+class PoolStats:
+    """Contadores acumulados de um engine (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.disconnects = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_checkout(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += int(timed_out)
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def record_disconnect(self) -> None:
+        with self._lock:
+            self.disconnects += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "disconnects": self.disconnects,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+# um por engine ("sync", "async"), para o /health/pool
+pool_stats: Dict[str, PoolStats] = {}
+
+
+def _timed_pool_class(base: type, stats: PoolStats) -> type:
+    """
+    Subclasse de `base` que cronometra a obtenção da conexão. `stats` fica
+    na classe para sobreviver ao `Pool.recreate()` (dispose do engine).
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = base._do_get(self)
+        except exc.TimeoutError:
+            stats.record_checkout(time.perf_counter() - started, timed_out=True)
+            logger.warning(f"Pool de conexões esgotado: {self.status()}")
+            raise
+        stats.record_checkout(time.perf_counter() - started)
+        return conn
+
+    return type(f"Timed{base.__name__}", (base,), {"_do_get": _do_get, "stats": stats})
+
+
+def _pgbouncer_connect_args() -> dict:
+    """
+    asyncpg atrás de pooler em modo transaction: cada transação pode cair
+    numa conexão de servidor diferente, então prepared statements com nome
+    fixo ou em cache dão "prepared statement ... already exists / does not
+    exist". Sem cache e com nome único por statement.
+    """
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
+
+def engine_options(name: str, is_async: bool = False, url: Optional[str] = None) -> dict:
+    """
+    kwargs de `create_engine` / `create_async_engine` a partir do Settings.
+
+    - DB_NULL_POOL: sem pool no processo (serverless ou pooler externo como
+      o PgBouncer em modo transaction); cada sessão abre e fecha a conexão.
+      Com asyncpg (`url` do engine), desliga também os prepared statements
+      em cache.
+    - DB_POOL_PRE_PING=False: sem o SELECT 1 a cada checkout; uma conexão
+      morta só é descoberta no erro, e aí o SQLAlchemy invalida o pool
+      inteiro e reconecta no próximo checkout.
+    """
+    stats = pool_stats.setdefault(name, PoolStats())
+
+    if settings.DB_NULL_POOL:
+        options = {"poolclass": _timed_pool_class(NullPool, stats)}
+        if is_async and url and make_url(url).get_driver_name() == "asyncpg":
+            options["connect_args"] = _pgbouncer_connect_args()
+        return options
+
+    base = AsyncAdaptedQueuePool if is_async else QueuePool
+    return {
+        "poolclass": _timed_pool_class(base, stats),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def instrument_engine(name: str, engine: Engine) -> None:
+    """Conta as quedas de conexão detectadas em erro (o que o pre-ping evitaria)."""
+    stats = pool_stats.setdefault(name, PoolStats())
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        if context.is_disconnect:
+            stats.record_disconnect()
+            logger.warning(f"Conexão com o banco caiu ({name}); pool será reciclado")
+
+
+def pool_status(name: str, pool: Pool) -> dict:
+    """Estado atual do pool + contadores acumulados."""
+    status = {"engine": name, "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+    stats = pool_stats.get(name)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
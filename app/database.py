@@ -1,20 +1,17 @@
 # app/database.py
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from app.core.config import settings
+from app.core.db_pool import engine_options, instrument_engine
 
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
-    pool_recycle=3600,
-    echo=False,
-)
+engine = create_engine(settings.DATABASE_URL, echo=False, **engine_options("sync"))
+instrument_engine("sync", engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
@@ -31,4 +28,77 @@ def get_db() -> Generator[Session, None, None]:
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# ==================== ASYNC ====================
+# Rotas de I/O (itens, alertas, notificações) usam o engine assíncrono e não
+# ocupam threads do threadpool enquanto esperam o banco. Jobs e serviços
+# (checker, retenção, scheduler) continuam no engine síncrono acima.
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Mesma URL com o driver assíncrono (postgresql → asyncpg, sqlite → aiosqlite).
+    O asyncpg não entende `sslmode`/`channel_binding` da libpq: vira `ssl`.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Sem driver assíncrono para '{backend}'")
+
+    query = dict(parsed.query)
+    if backend == "postgresql":
+        query.pop("channel_binding", None)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+
+    return parsed.set(
+        drivername=f"{backend}+{ASYNC_DRIVERS[backend]}", query=query
+    ).render_as_string(hide_password=False)
+
+
+_async_engine: Optional[AsyncEngine] = None
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    """Cria o engine assíncrono no primeiro uso (o driver só é importado aqui)."""
+    global _async_engine
+    if _async_engine is None:
+        url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+        _async_engine = create_async_engine(
+            url, echo=False, **engine_options("async", is_async=True, url=url)
+        )
+        instrument_engine("async", _async_engine.sync_engine)
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+def current_async_engine() -> Optional[AsyncEngine]:
+    """Engine assíncrono, se já foi criado (não cria)."""
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Versão assíncrona de `get_db`.
+
+    Uso:
+        db: AsyncSession = Depends(get_async_db)
+
+    `expire_on_commit=False`: depois do commit os atributos continuam
+    carregados (lazy load em sessão assíncrona não é permitido).
+    """
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
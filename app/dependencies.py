@@ -1,30 +1,180 @@
 # app/dependencies.py
-from fastapi import Depends, HTTPException, status
+import hmac
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import cachetools
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db          # ← importa de app.database (não define local)
+from app.database import get_async_db, get_db          # ← importa de app.database (não define local)
 from app.models import User
 from app.core.config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credential_exception = HTTPException(
+@dataclass(frozen=True)
+class Principal:
+    """Usuário autenticado, sem a linha do ORM (para rotas que só precisam do id)."""
+    id: int
+    username: str
+    email: str
+    is_verified: bool
+
+
+# cache curto por "sub" do token; cada processo tem o seu, então o TTL
+# limita quanto tempo uma mudança feita por outro worker demora a aparecer
+principal_cache = cachetools.TTLCache(
+    maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL_SECONDS
+)
+_cache_lock = threading.Lock()
+
+
+def invalidate_user(username: Optional[str]) -> None:
+    """Tira o usuário do cache (chamado automaticamente em update/delete de User)."""
+    if username is None:
+        return
+    with _cache_lock:
+        principal_cache.pop(username, None)
+
+
+_PRINCIPAL_FIELDS = ("username", "email", "is_verified")
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_update(mapper, connection, target: User) -> None:
+    attrs = inspect(target).attrs
+    # contador de não lidas e afins mudam toda hora e não estão no Principal
+    if not any(attrs[name].history.has_changes() for name in _PRINCIPAL_FIELDS):
+        return
+    invalidate_user(target.username)
+    # troca de username: a chave antiga também sai
+    for old in attrs.username.history.deleted or ():
+        invalidate_user(old)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_delete(mapper, connection, target: User) -> None:
+    invalidate_user(target.username)
+
+
+def _credential_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Token inválido ou expirado",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _token_subject(token: str) -> str:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credential_exception
     except JWTError:
-        raise credential_exception
+        raise _credential_exception()
+    username: str = payload.get("sub")
+    if username is None:
+        raise _credential_exception()
+    return username
+
+
+def _cached_principal(username: str) -> Optional[Principal]:
+    with _cache_lock:
+        return principal_cache.get(username)
+
+
+def _principal_query(username: str):
+    # só as colunas do Principal, sem montar a entidade do ORM
+    return select(User.id, User.username, User.email, User.is_verified).where(
+        User.username == username
+    )
 
-    user = db.query(User).filter(User.username == username).first()
+
+def _remember(username: str, row) -> Principal:
+    if row is None:
+        raise _credential_exception()
+    principal = Principal(id=row.id, username=row.username, email=row.email,
+                          is_verified=bool(row.is_verified))
+    with _cache_lock:
+        principal_cache[username] = principal
+    return principal
+
+
+def principal_from_token(token: str, db: Session) -> Principal:
+    """Valida o JWT e resolve o usuário, passando pelo cache."""
+    username = _token_subject(token)
+    principal = _cached_principal(username)
+    if principal is None:
+        principal = _remember(username, db.execute(_principal_query(username)).first())
+    return principal
+
+
+async def principal_from_token_async(token: str, db: AsyncSession) -> Principal:
+    """`principal_from_token` para sessões assíncronas."""
+    username = _token_subject(token)
+    principal = _cached_principal(username)
+    if principal is None:
+        row = (await db.execute(_principal_query(username))).first()
+        principal = _remember(username, row)
+    return principal
+
+
+def user_from_token(token: str, db: Session) -> User:
+    """Valida o JWT e carrega a linha completa do usuário (401 se inválido)."""
+    principal = principal_from_token(token, db)
+    user = db.get(User, principal.id)
+    if user is None:
+        invalidate_user(principal.username)
+        raise _credential_exception()
+    return user
+
+
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """Dependência leve: na maioria das requisições não toca no banco."""
+    return await principal_from_token_async(token, db)
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    """Linha do ORM, para rotas que leem/alteram o próprio usuário."""
+    return user_from_token(token, db)
+
+
+async def get_current_user_async(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    """`get_current_user` para rotas assíncronas (linha carregada na sessão da rota)."""
+    user = await db.get(User, principal.id)
     if user is None:
-        raise credential_exception
-    return user
\ No newline at end of file
+        invalidate_user(principal.username)
+        raise _credential_exception()
+    return user
+
+
+def _cron_secret_matches(secret: str, x_cron_secret: Optional[str], authorization: Optional[str]) -> bool:
+    candidates = [x_cron_secret]
+    # Vercel Cron manda GET com "Authorization: Bearer $CRON_SECRET"
+    if authorization and authorization[:7].lower() == "bearer ":
+        candidates.append(authorization[7:])
+    return any(c is not None and hmac.compare_digest(c, secret) for c in candidates)
+
+
+def require_cron_secret(
+    x_cron_secret: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+) -> None:
+    """
+    Rotas de cron: aceita o segredo em `X-Cron-Secret` ou como Bearer.
+    Sem CRON_SECRET configurado a rota fica aberta (deploy local).
+    """
+    secret = os.getenv("CRON_SECRET")
+    if secret and not _cron_secret_matches(secret, x_cron_secret, authorization):
+        raise HTTPException(status_code=401, detail="Invalid secret")
+
@@ -9,9 +9,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
+from app.core.config import settings
 from app.core.limiter import limiter
-from app.database import Base, engine, SessionLocal
+from app.database import Base, engine, dispose_async_engine
 from app.routers import alerts, auth, items, albion, health
+from app.services.alert_events import start_alert_events, stop_alert_events
+from app.services.scheduler import start_scheduler, shutdown_scheduler
 
 # ── Logging ────────────────────────────────────────────────────────────────
 logger = logging.getLogger("albion_market")
@@ -25,16 +28,20 @@ if not logger.handlers:
     logger.addHandler(handler)
     logger.setLevel(logging.INFO)
 
-# Cria tabelas que ainda não existem (DEV); em produção use `alembic upgrade head`
-if os.getenv("TESTING") != "true":
-    Base.metadata.create_all(bind=engine)
-
-
 # ── Lifespan (startup / shutdown) ──────────────────────────────────────────
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Cria tabelas que ainda não existem (DEV); em produção use `alembic upgrade head`
+    # e DB_CREATE_TABLES_ON_STARTUP=false (o import do app não toca no banco)
+    if settings.DB_CREATE_TABLES_ON_STARTUP and os.getenv("TESTING") != "true":
+        Base.metadata.create_all(bind=engine)
     logger.info("API iniciada.")
+    start_alert_events()
+    start_scheduler()
     yield
+    shutdown_scheduler()
+    stop_alert_events()
+    await dispose_async_engine()
     logger.info("API encerrada.")
 
 
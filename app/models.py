@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Float, func
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ForeignKey, DateTime, Boolean, Float, Index, false, func, true
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -19,6 +19,12 @@ class User(Base):
     verification_token = Column(String, nullable=True, unique=True)
     verification_token_expires_at = Column(DateTime(timezone=True), nullable=True)
 
+    # agrupa os alertas disparados na mesma execução em uma notificação/e-mail
+    alert_digest_enabled = Column(Boolean, nullable=False, default=True, server_default=true())
+
+    # contador de notificações não lidas (badge), mantido junto com as escritas
+    unread_notifications = Column(Integer, nullable=False, default=0, server_default="0")
+
     items = relationship("UserItem", back_populates="user", cascade="all, delete-orphan")
 
     alerts = relationship("PriceAlert", back_populates="user", cascade="all, delete-orphan")
@@ -27,12 +33,18 @@ class User(Base):
 
 class UserItem(Base):
     __tablename__ = "user_items"
+    __table_args__ = (
+        # watchlist do usuário (e checagem de duplicado por nome)
+        Index("ix_user_items_user_id_item_name", "user_id", "item_name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
-    item_name = Column(String, nullable=False)
+    item_name = Column(String, nullable=False)  # UniqueName (resolvido no cadastro)
     display_name = Column(String, nullable=True)
+    # nome legado que o backfill não conseguiu resolver: fica fora dos preços
+    unresolved = Column(Boolean, nullable=False, default=False, server_default=false())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="items")
@@ -72,16 +84,109 @@ class PriceAlert(Base):
     user = relationship("User", back_populates="alerts")
 
 
+# índice parcial: só alertas ativos, na ordem de id usada pelo checker (keyset)
+Index(
+    "ix_price_alerts_active_id",
+    PriceAlert.id,
+    postgresql_where=PriceAlert.is_active.is_(True),
+    sqlite_where=PriceAlert.is_active.is_(True),
+)
+
+
 class UserNotification(Base):
     __tablename__ = "user_notifications"
+    __table_args__ = (
+        # paginação keyset por usuário (WHERE user_id = ? AND id < ? ORDER BY id DESC)
+        Index("ix_user_notifications_user_id_id", "user_id", "id"),
+        # filtro de não lidas (unread=true) na mesma ordem
+        Index("ix_user_notifications_user_id_is_read_id", "user_id", "is_read", "id"),
+        # ponto de partida da compactação de repetidas (criadas nos últimos N dias)
+        Index("ix_user_notifications_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
 
     title = Column(String, nullable=False)
     body = Column(String, nullable=False)
+    # alerta que gerou a notificação (None em digest e avisos gerais); o texto
+    # traz o preço do momento, então é por ele que a compactação agrupa
+    alert_id = Column(Integer, nullable=True)
 
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="notifications")
+
+
+class NotificationArchive(Base):
+    """Notificações lidas antigas, movidas pela retenção para fora da tabela quente."""
+    __tablename__ = "user_notifications_archive"
+
+    id = Column(Integer, primary_key=True)  # mesmo id da notificação original
+    user_id = Column(Integer, index=True, nullable=False)
+
+    title = Column(String, nullable=False)
+    body = Column(String, nullable=False)
+
+    is_read = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CheckerCheckpoint(Base):
+    """Progresso do verificador de alertas, para retomar execuções interrompidas."""
+    __tablename__ = "checker_checkpoints"
+
+    name = Column(String, primary_key=True)
+
+    last_alert_id = Column(Integer, nullable=False, default=0)
+    checked = Column(Integer, nullable=False, default=0)
+    triggered = Column(Integer, nullable=False, default=0)
+
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # quem está rodando agora (lease renovado a cada lote); outra execução só
+    # entra depois que o lease expira, então nunca retoma um checkpoint vivo
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class PriceBaseline(Base):
+    """Estado do baseline incremental (janela + EWMA) por item/cidades/janela."""
+    __tablename__ = "price_baselines"
+
+    key = Column(String, primary_key=True)
+    item_id = Column(String, index=True, nullable=False)
+
+    points = Column(Text, nullable=False, default="[]")  # JSON [[ts, preço], ...]
+    ewma = Column(Float, nullable=True)
+    ewma_count = Column(Integer, nullable=False, default=0)
+    last_ts = Column(BigInteger, nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class EmailOutbox(Base):
+    """Fila de e-mails a enviar (drenada em lote por `email_queue`)."""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    dedup_key = Column(String, unique=True, nullable=False)
+
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    text = Column(Text, nullable=False)
+    html = Column(Text, nullable=True)
+
+    status = Column(String, nullable=False, default="pending", index=True)  # pending | sending | sent | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(String, nullable=True)
+    # Idempotency-Key do lote no Resend; a retentativa reenvia o mesmo lote com ela
+    batch_key = Column(String, nullable=True, index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,10 +1,18 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional
 from sqlalchemy.orm import Session
 
-from app.dependencies import get_current_user, get_db
-from app.utils.albion_client import get_prices, get_price_history, get_gold_prices
-from app.utils.albion_index import buscar_item_por_nome
+from app.dependencies import get_current_principal, get_db
+from app.utils.albion_client import (
+    get_prices,
+    get_prices_with_status,
+    get_price_history_with_status,
+    get_gold_prices,
+)
+from app.utils.albion_index import buscar_item_por_nome, eh_unique_name
+from app.utils.albion_params import REGIONS, max_age_seconds, validate_region
 from app.core.config import settings
 from app.models import UserItem
 
@@ -13,18 +21,13 @@ router = APIRouter(prefix="/albion", tags=["Albion Online"])
 
 LANG_SLUG_TO_KEY = {"pt-br": "pt_br", "en-us": "en_us"}
 
-REGIONS = [
-    {"id": "europe", "label": "Europe", "flag": "🌍", "host": "europe.albion-online-data.com"},
-    {"id": "west",   "label": "Americas", "flag": "🌎", "host": "west.albion-online-data.com"},
-    {"id": "east",   "label": "Asia",     "flag": "🌏", "host": "east.albion-online-data.com"},
-]
-
-
-def _validate_region(region: str) -> str:
-    valid = [r["id"] for r in REGIONS]
-    if region not in valid:
-        raise HTTPException(400, f"Região inválida. Use: {', '.join(valid)}")
-    return region
+# Pool compartilhado para consultar as regiões em paralelo. Cada /prices/compare
+# ocupa até uma thread por região durante o timeout do upstream, então o tamanho
+# define quantas comparações rodam ao mesmo tempo sem enfileirar.
+_region_executor = ThreadPoolExecutor(
+    max_workers=len(REGIONS) * settings.ALBION_COMPARE_CONCURRENCY,
+    thread_name_prefix="albion-region",
+)
 
 
 @router.get("/regions")
@@ -54,6 +57,27 @@ def _serialize_resultados(resultados: List[dict]):
     ]
 
 
+def _freshness_fields(result: dict) -> dict:
+    """
+    Campos de frescor anexados às respostas de preço/histórico.
+    `stale=True` significa que a API do Albion falhou e o dado é o último conhecido.
+    """
+    fetched_at = result.get("fetched_at")
+    return {
+        "stale": result.get("stale", False),
+        "fetched_at": (
+            datetime.fromtimestamp(fetched_at, timezone.utc).isoformat()
+            if fetched_at
+            else None
+        ),
+    }
+
+
+def _raise_if_unavailable(result: dict) -> None:
+    if result.get("unavailable"):
+        raise HTTPException(503, "API do Albion indisponível no momento, tente novamente")
+
+
 def _normalize_lang(lang: str) -> str:
     lang_norm = (lang or "").lower().replace("-", "_")
     return lang_norm if lang_norm in ("pt_br", "en_us") else "pt_br"
@@ -95,7 +119,7 @@ def _resolver_lista_itens(
     """
     resolved: List[str] = []
     for it in raw_items:
-        if it.upper().startswith("T") and "_" in it:
+        if eh_unique_name(it):
             resolved.append(it.upper())
             continue
 
@@ -107,6 +131,16 @@ def _resolver_lista_itens(
     return resolved
 
 
+def _cheapest_by_item(result: dict, region: str) -> dict:
+    """
+    Retorna o mais barato por item a partir do resumo já calculado no cache.
+    """
+    return {
+        item_id: {**summary, "region": region}
+        for item_id, summary in result["summary"].items()
+    }
+
+
 def _buscar_precos_por_idioma(
     items: str,
     cities: str,
@@ -115,6 +149,7 @@ def _buscar_precos_por_idioma(
     current_user,
     permitir_fallback_en: bool = False,
     region: str = "europe",
+    max_age_hours: Optional[float] = None,
 ):
     raw_items = [i.strip() for i in items.split(",") if i.strip()]
     item_list = _resolver_lista_itens(
@@ -127,28 +162,21 @@ def _buscar_precos_por_idioma(
     city_list = [c.strip() for c in cities.split(",") if c.strip()]
     quality_list = [int(q) for q in qualities.split(",") if q.strip()]
 
-    data = get_prices(item_list, city_list, quality_list, region=region)
+    result = get_prices_with_status(
+        item_list, city_list, quality_list, region=region,
+        max_age=max_age_seconds(max_age_hours),
+    )
+    _raise_if_unavailable(result)
+    data = result["data"]
     if not data:
         raise HTTPException(404, "Nenhum preço encontrado")
 
-    # Retorna o mais barato por item
-    cheapest_by_item = {}
-    for d in data:
-        item_id = d["item_id"]
-        if (
-            item_id not in cheapest_by_item
-            or d["sell_price_min"] < cheapest_by_item[item_id]["price"]
-        ):
-            cheapest_by_item[item_id] = {
-                "city": d["city"],
-                "price": d["sell_price_min"],
-                "quality": d["quality"],
-                "enchantment": d.get("enchantment", 0),
-                "updated": d["sell_price_min_date"],
-                "region": region,
-            }
-
-    return {"items": cheapest_by_item, "all_data": data, "region": region}
+    return {
+        "items": _cheapest_by_item(result, region),
+        "all_data": data,
+        "region": region,
+        **_freshness_fields(result),
+    }
 
 
 @router.get("/prices/pt-br")
@@ -160,13 +188,18 @@ def get_prices_pt(
     cities: str = Query(",".join(settings.DEFAULT_CITIES)),
     qualities: str = Query("1,2,3,4,5"),
     region: str = Query("europe", description="Região do servidor: europe, west (Américas) ou east (Ásia)"),
-    current_user=Depends(get_current_user),
+    max_age_hours: Optional[float] = Query(
+        None, gt=0, description="Ignora ofertas mais antigas que N horas"
+    ),
+    current_user=Depends(get_current_principal),
 ):
     """
     Preços para múltiplos itens resolvendo nomes PT-BR.
     """
-    _validate_region(region)
-    return _buscar_precos_por_idioma(items, cities, qualities, "pt_br", current_user, region=region)
+    validate_region(region)
+    return _buscar_precos_por_idioma(
+        items, cities, qualities, "pt_br", current_user, region=region, max_age_hours=max_age_hours
+    )
 
 
 @router.get("/prices/en-us")
@@ -178,13 +211,18 @@ def get_prices_en(
     cities: str = Query(",".join(settings.DEFAULT_CITIES)),
     qualities: str = Query("1,2,3,4,5"),
     region: str = Query("europe", description="Região do servidor: europe, west (Américas) ou east (Ásia)"),
-    current_user=Depends(get_current_user),
+    max_age_hours: Optional[float] = Query(
+        None, gt=0, description="Ignora ofertas mais antigas que N horas"
+    ),
+    current_user=Depends(get_current_principal),
 ):
     """
     Preços para múltiplos itens resolvendo nomes EN-US.
     """
-    _validate_region(region)
-    return _buscar_precos_por_idioma(items, cities, qualities, "en_us", current_user, region=region)
+    validate_region(region)
+    return _buscar_precos_por_idioma(
+        items, cities, qualities, "en_us", current_user, region=region, max_age_hours=max_age_hours
+    )
 
 
 @router.get("/prices")
@@ -196,7 +234,10 @@ def get_prices_endpoint(
     cities: str = Query(",".join(settings.DEFAULT_CITIES)),
     qualities: str = Query("1,2,3,4,5"),
     region: str = Query("europe", description="Região do servidor: europe, west (Américas) ou east (Ásia)"),
-    current_user=Depends(get_current_user),
+    max_age_hours: Optional[float] = Query(
+        None, gt=0, description="Ignora ofertas mais antigas que N horas"
+    ),
+    current_user=Depends(get_current_principal),
 ):
     """
     Preços para múltiplos itens (legado, usa PT-BR como padrão).
@@ -206,27 +247,111 @@ def get_prices_endpoint(
       - Nomes humanos: 'bolsa do adepto, capa letal'
     Faz a resolução de nomes PT/EN -> UniqueName automaticamente.
     """
-    _validate_region(region)
+    validate_region(region)
     return _buscar_precos_por_idioma(
-        items, cities, qualities, "pt_br", current_user, permitir_fallback_en=True, region=region
+        items, cities, qualities, "pt_br", current_user, permitir_fallback_en=True, region=region,
+        max_age_hours=max_age_hours,
     )
 
 
+@router.get("/prices/compare")
+def compare_prices_between_regions(
+    items: str = Query(
+        ...,
+        description="Itens separados por vírgula (UniqueNames OU nomes PT/EN)",
+    ),
+    cities: str = Query(",".join(settings.DEFAULT_CITIES)),
+    qualities: str = Query("1,2,3,4,5"),
+    regions: str = Query(
+        ",".join(r["id"] for r in REGIONS),
+        description="Regiões a comparar, separadas por vírgula",
+    ),
+    lang: str = Query("pt_br", description="Idioma para resolver nomes (pt_br ou en_us)"),
+    max_age_hours: Optional[float] = Query(
+        None, gt=0, description="Ignora ofertas mais antigas que N horas"
+    ),
+    current_user=Depends(get_current_principal),
+):
+    """
+    Compara o mesmo conjunto de itens entre regiões.
+
+    Consulta todas as regiões em paralelo (reaproveitando o cache de cada uma),
+    então a latência é a da região mais lenta e não a soma das três.
+    """
+    region_list = list(dict.fromkeys(r.strip() for r in regions.split(",") if r.strip()))
+    if not region_list:
+        raise HTTPException(400, "Informe ao menos uma região")
+    for region in region_list:
+        validate_region(region)
+
+    raw_items = [i.strip() for i in items.split(",") if i.strip()]
+    item_list = _resolver_lista_itens(
+        raw_items, _normalize_lang(lang), permitir_fallback_en=True
+    )
+    if not item_list:
+        raise HTTPException(404, "Nenhum item válido encontrado")
+
+    city_list = [c.strip() for c in cities.split(",") if c.strip()]
+    quality_list = [int(q) for q in qualities.split(",") if q.strip()]
+
+    futures = {
+        region: _region_executor.submit(
+            get_prices_with_status, item_list, city_list, quality_list, region,
+            max_age_seconds(max_age_hours),
+        )
+        for region in region_list
+    }
+    results = {region: future.result() for region, future in futures.items()}
+
+    if all(r["unavailable"] for r in results.values()):
+        raise HTTPException(503, "API do Albion indisponível no momento, tente novamente")
+
+    comparison = {item_id: {region: None for region in region_list} for item_id in item_list}
+    for region, result in results.items():
+        for item_id, cheapest in _cheapest_by_item(result, region).items():
+            comparison.setdefault(item_id, {r: None for r in region_list})[region] = cheapest
+
+    best_region = {}
+    for item_id, by_region in comparison.items():
+        offers = [(c["price"], region) for region, c in by_region.items() if c]
+        best_region[item_id] = min(offers)[1] if offers else None
+
+    return {
+        "items": comparison,
+        "best_region": best_region,
+        "regions": {
+            region: {"available": not result["unavailable"], **_freshness_fields(result)}
+            for region, result in results.items()
+        },
+    }
+
+
 @router.get("/price-by-name")
 def price_by_name(
     name: str = Query(..., description="Nome em PT-BR ou EN"),
     cities: str = Query(",".join(settings.DEFAULT_CITIES)),
     region: str = Query("europe", description="Região do servidor"),
-    current_user=Depends(get_current_user),
+    max_age_hours: Optional[float] = Query(
+        None, gt=0, description="Ignora ofertas mais antigas que N horas"
+    ),
+    current_user=Depends(get_current_principal),
 ):
     """
     Preço para um único item a partir de nome humano (PT/EN).
     """
-    return price_by_name_pt(name=name, cities=cities, region=region, current_user=current_user)
+    return price_by_name_pt(
+        name=name, cities=cities, region=region, max_age_hours=max_age_hours,
+        current_user=current_user,
+    )
 
 
 def _preco_por_nome(
-    name: str, cities: str, lang_key: str, permitir_fallback_en: bool = False, region: str = "europe"
+    name: str,
+    cities: str,
+    lang_key: str,
+    permitir_fallback_en: bool = False,
+    region: str = "europe",
+    max_age_hours: Optional[float] = None,
 ):
     itens = buscar_item_por_nome(name, lang_key)
     if not itens and permitir_fallback_en and lang_key == "pt_br":
@@ -236,13 +361,17 @@ def _preco_por_nome(
 
     unique = itens[0]["UniqueName"]
     city_list = [c.strip() for c in cities.split(",") if c.strip()]
-    _validate_region(region)
-    data = get_prices([unique], city_list, region=region)
+    validate_region(region)
+    result = get_prices_with_status(
+        [unique], city_list, region=region, max_age=max_age_seconds(max_age_hours)
+    )
+    _raise_if_unavailable(result)
+    data = result["data"]
 
     if not data:
         raise HTTPException(404, "Sem preços disponíveis no momento")
 
-    cheapest = min(data, key=lambda x: x["sell_price_min"])
+    cheapest = result["summary"][unique]
 
     return {
         "searched": name,
@@ -250,11 +379,12 @@ def _preco_por_nome(
         "name_pt": itens[0].get("PT-BR", ""),
         "name_en": itens[0].get("EN-US", ""),
         "cheapest_city": cheapest["city"],
-        "price": cheapest["sell_price_min"],
+        "price": cheapest["price"],
         "quality": cheapest["quality"],
-        "updated_at": cheapest["sell_price_min_date"],
+        "updated_at": cheapest["updated"],
         "region": region,
         "all_prices": data[:10],
+        **_freshness_fields(result),
     }
 
 
@@ -263,9 +393,14 @@ def price_by_name_pt(
     name: str = Query(..., description="Nome em PT-BR"),
     cities: str = Query(",".join(settings.DEFAULT_CITIES)),
     region: str = Query("europe", description="Região do servidor"),
-    current_user=Depends(get_current_user),
+    max_age_hours: Optional[float] = Query(
+        None, gt=0, description="Ignora ofertas mais antigas que N horas"
+    ),
+    current_user=Depends(get_current_principal),
 ):
-    return _preco_por_nome(name, cities, "pt_br", permitir_fallback_en=True, region=region)
+    return _preco_por_nome(
+        name, cities, "pt_br", permitir_fallback_en=True, region=region, max_age_hours=max_age_hours
+    )
 
 
 @router.get("/price-by-name/en-us")
@@ -273,9 +408,12 @@ def price_by_name_en(
     name: str = Query(..., description="Nome em EN-US"),
     cities: str = Query(",".join(settings.DEFAULT_CITIES)),
     region: str = Query("europe", description="Região do servidor"),
-    current_user=Depends(get_current_user),
+    max_age_hours: Optional[float] = Query(
+        None, gt=0, description="Ignora ofertas mais antigas que N horas"
+    ),
+    current_user=Depends(get_current_principal),
 ):
-    return _preco_por_nome(name, cities, "en_us", region=region)
+    return _preco_por_nome(name, cities, "en_us", region=region, max_age_hours=max_age_hours)
 
 
 @router.get("/history/{item_id}")
@@ -285,21 +423,22 @@ def price_history(
     cities: str = Query("Caerleon", description="Cidades separadas por vírgula"),
     resolution: str = Query("6h", description="1h, 6h ou 24h"),
     region: str = Query("europe", description="Região do servidor: europe, west (Américas) ou east (Ásia)"),
-    current_user=Depends(get_current_user),
+    current_user=Depends(get_current_principal),
 ):
     """
     Histórico de preços para uso no gráfico do frontend.
     """
-    _validate_region(region)
+    validate_region(region)
     city_list = [c.strip() for c in cities.split(",") if c.strip()]
 
-    history = get_price_history(
+    result = get_price_history_with_status(
         item_id=item_id.upper(),
         locations=city_list,
         days=days,
         time_resolution=resolution,
         region=region,
     )
+    history = result["data"]
 
     # Se a API não devolver nada, não é erro de servidor, só "sem dados"
     if not history:
@@ -310,6 +449,7 @@ def price_history(
             "days": days,
             "region": region,
             "data": [],
+            **_freshness_fields(result),
         }
 
     return {
@@ -319,54 +459,50 @@ def price_history(
         "days": days,
         "region": region,
         "data": history,
+        **_freshness_fields(result),
     }
 
 
+def _watchlist_items(db: Session, user_id: int) -> List[UserItem]:
+    """Itens salvos com UniqueName válido (sem os legados não resolvidos)."""
+    items = (
+        db.query(UserItem)
+        .filter(UserItem.user_id == user_id, UserItem.unresolved.is_(False))
+        .all()
+    )
+    return [item for item in items if eh_unique_name(item.item_name)]
+
+
 @router.get("/my-items-prices")
 def my_items_prices(
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
-    lang: str = Query(
-        "pt_br",
-        description="Idioma para resolver nomes não únicos (pt_br ou en_us)",
-    ),
+    current_user=Depends(get_current_principal),
     region: str = Query("europe", description="Região do servidor: europe, west (Américas) ou east (Ásia)"),
+    max_age_hours: Optional[float] = Query(
+        None, gt=0, description="Ignora ofertas mais antigas que N horas"
+    ),
 ):
     """
     Retorna os preços dos itens salvos pelo usuário.
 
-    Se houver itens antigos salvos com nomes humanos (BOLSA, BAG),
-    tenta resolver para UniqueName antes de chamar a API.
+    Os nomes já estão salvos como UniqueName (cadastro e backfill em
+    `app.services.watchlist_canonical`); itens legados não resolvidos ficam de fora.
     """
-    user_items = db.query(UserItem).filter(UserItem.user_id == current_user.id).all()
-    raw_names = [item.item_name for item in user_items]
+    user_items = _watchlist_items(db, current_user.id)
     display_map = {item.item_name.upper(): item.display_name for item in user_items}
-
-    if not raw_names:
-        return []
-
-    lang_key = _normalize_lang(lang)
-    resolved_names: List[str] = []
-    for name in raw_names:
-        if name.upper().startswith("T") and "_" in name:
-            resolved_names.append(name.upper())
-        else:
-            candidatos = buscar_item_por_nome(name, lang_key)
-            if not candidatos and lang_key == "pt_br":
-                candidatos = buscar_item_por_nome(name, "en_us")
-            if candidatos:
-                resolved_names.append(candidatos[0]["UniqueName"])
+    resolved_names = list(display_map)
 
     if not resolved_names:
         return []
 
-    _validate_region(region)
-    raw_data = get_prices(resolved_names, region=region)
+    validate_region(region)
+    raw_data = get_prices(
+        resolved_names, region=region, max_age=max_age_seconds(max_age_hours)
+    )
 
+    # linhas já vêm validadas (preço > 0) e ordenadas por preço de cada item
     result = []
     for entry in raw_data:
-        if entry.get("sell_price_min", 0) <= 0:
-            continue
         display_name = display_map.get(entry["item_id"].upper())
         result.append(
             {
@@ -390,7 +526,7 @@ def gold_prices(
     """
     Retorna preços de ouro e variação opcional.
     """
-    _validate_region(region)
+    validate_region(region)
     data = get_gold_prices(count=count, region=region)
     
     if not data:
@@ -416,18 +552,17 @@ def arbitrage_calculator(
     region: str = Query("europe"),
     tax: float = Query(0.08, description="Imposto de mercado (0.04 ou 0.08)"),
     db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    user=Depends(get_current_principal),
 ):
     """
     Calcula oportunidades de arbitragem entre cidades para uma lista de itens.
     Se nenhuma lista for fornecida, usa os itens rastreados do usuário.
     """
-    _validate_region(region)
+    validate_region(region)
     
     # Se não passar itens, usa os itens rastreados do usuário
     if not items:
-        user_items = db.query(UserItem).filter(UserItem.user_id == user.id).all()
-        items = list(set([ui.item_name for ui in user_items]))
+        items = list({ui.item_name.upper() for ui in _watchlist_items(db, user.id)})
     
     if not items:
         return []
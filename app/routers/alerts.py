@@ -1,100 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta, timezone
 from typing import Optional, List
-import os
-import statistics
-
-from app.database import get_db
-from app.dependencies import get_current_user
+from datetime import datetime, timedelta, timezone
+import asyncio
+import json
+
+from app.core.config import settings
+from app.database import get_async_db, get_db
+from app.dependencies import (
+    Principal,
+    get_current_principal,
+    get_current_user_async,
+    principal_from_token_async,
+    require_cron_secret,
+)
 from app import models, schemas
-from app.utils.albion_client import get_prices, get_price_history
-from app.services.mailer import send_price_alert_email
+from app.services.alert_checker import run_checker_internal
+from app.services.alert_index import index as alert_index
+from app.services.backtest import simulate
+from app.services.baselines import history_points
+from app.services.notification_hub import hub, notification_payload
+from app.services.retention import run_retention
+from app.utils.albion_client import get_price_history
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 
-CRON_SECRET = os.getenv("CRON_SECRET")
-
-
-def _now_utc() -> datetime:
-    # Sempre timezone-aware
-    return datetime.now(timezone.utc)
-
-
-def _ensure_aware(dt: Optional[datetime]) -> Optional[datetime]:
-    """
-    Garante datetime timezone-aware em UTC.
-    - None -> None
-    - naive -> assume UTC e marca tzinfo
-    - aware -> converte para UTC
-    - tipo inesperado -> None (evita quebrar o cron)
-    """
-    if dt is None:
-        return None
-    if not isinstance(dt, datetime):
-        return None
-    if dt.tzinfo is None:
-        return dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone(timezone.utc)
-
-
-def _extract_history_prices(history: list) -> list[float]:
-    """
-    Tenta extrair preços do histórico da Albion API de forma robusta,
-    porque o formato pode variar (sell_price_min / avg / etc).
-    """
-    candidates: list[float] = []
-    for row in history or []:
-        if not isinstance(row, dict):
-            continue
-
-        for k in (
-            "sell_price_min",
-            "sell_price_min_avg",
-            "avg_sell_price",
-            "sell_price_avg",
-            "price",
-            "value",
-        ):
-            v = row.get(k)
-            if isinstance(v, (int, float)) and v > 0:
-                candidates.append(float(v))
-                break
-
-    return candidates
-
-
-def _compute_expected_price_from_history(
-    item_id: str,
-    cities: list[str],
-    days: int,
-    resolution: str,
-    stat: str = "median",
-    min_points: int = 10,
-) -> Optional[float]:
-    history = get_price_history(
-        item_id=item_id.upper(),
-        locations=cities,
-        days=days,
-        time_resolution=resolution,
-    )
-
-    values = _extract_history_prices(history)
-    if len(values) < min_points:
-        return None
-
-    if stat == "mean":
-        return float(sum(values) / len(values))
-
-    # padrão: mediana (melhor contra picos/manipulação)
-    return float(statistics.median(values))
-
 
 @router.post("/", response_model=schemas.PriceAlertOut)
-def create_alert(
+async def create_alert(
     payload: schemas.PriceAlertCreate,
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
 ):
     alert = models.PriceAlert(
         user_id=user.id,
@@ -117,208 +56,253 @@ def create_alert(
         is_active=True,
     )
     db.add(alert)
-    db.commit()
-    db.refresh(alert)
+    await db.commit()
+    await db.refresh(alert)
+    alert_index.upsert(alert)
     return alert
 
 
 @router.get("/", response_model=List[schemas.PriceAlertOut])
-def list_alerts(
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user),
+async def list_alerts(
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
 ):
-    return db.query(models.PriceAlert).filter_by(user_id=user.id).all()
+    result = await db.scalars(select(models.PriceAlert).filter_by(user_id=user.id))
+    return result.all()
 
 
 @router.delete("/{alert_id}")
-def delete_alert(
+async def delete_alert(
     alert_id: int,
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
 ):
-    alert = db.query(models.PriceAlert).filter_by(id=alert_id, user_id=user.id).first()
+    alert = await db.scalar(select(models.PriceAlert).filter_by(id=alert_id, user_id=user.id))
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
-    db.delete(alert)
-    db.commit()
+    await db.delete(alert)
+    await db.commit()
+    alert_index.remove(alert_id)
     return {"ok": True}
 
 
+def _ms_to_dt(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts / 1000, tz=timezone.utc)
+
+
+@router.post("/backtest", response_model=schemas.BacktestOut)
+def backtest(
+    payload: schemas.BacktestRequest,
+    user: Principal = Depends(get_current_principal),
+):
+    """
+    Simula configurações de alerta sobre o histórico (em cache) do item e
+    diz quantas vezes e quando cada uma teria disparado.
+    """
+    city = payload.city or "Caerleon"  # mesma cidade usada pelo baseline da IA
+    history = get_price_history(
+        item_id=payload.item_id,
+        locations=[city],
+        days=payload.days,
+        time_resolution=payload.resolution,
+    )
+    start_ms = int((datetime.now(timezone.utc) - timedelta(days=payload.days)).timestamp() * 1000)
+    series = [(ts, price) for ts, price in history_points(history) if ts >= start_ms]
+
+    configs = [c.model_dump() for c in payload.configs]
+    results = simulate(series, configs, payload.resolution)
+
+    return {
+        "item_id": payload.item_id,
+        "city": city,
+        "resolution": payload.resolution,
+        "points": len(series),
+        "start": _ms_to_dt(series[0][0]) if series else None,
+        "end": _ms_to_dt(series[-1][0]) if series else None,
+        "results": [
+            {"config": cfg, "fires": r["fires"], "fired_at": [_ms_to_dt(t) for t in r["fired_at"]]}
+            for cfg, r in zip(configs, results)
+        ],
+    }
+
+
+@router.get("/preferences", response_model=schemas.AlertPreferences)
+async def get_preferences(user: models.User = Depends(get_current_user_async)):
+    return user
+
+
+@router.put("/preferences", response_model=schemas.AlertPreferences)
+async def update_preferences(
+    payload: schemas.AlertPreferences,
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_current_user_async),
+):
+    user.alert_digest_enabled = payload.alert_digest_enabled
+    await db.commit()
+    return user
+
+
 @router.get("/notifications", response_model=List[schemas.NotificationOut])
-def list_notifications(
+async def list_notifications(
     unread: Optional[bool] = Query(None),
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user),
+    since_id: Optional[int] = Query(None, ge=0, description="Só notificações com id maior (polling incremental)"),
+    before_id: Optional[int] = Query(None, ge=1, description="Próxima página: id da última notificação recebida"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
 ):
-    q = db.query(models.UserNotification).filter_by(user_id=user.id)
+    """Página de notificações, da mais nova para a mais antiga (keyset por id)."""
+    q = select(models.UserNotification).filter_by(user_id=user.id)
     if unread is True:
         q = q.filter_by(is_read=False)
-    return q.order_by(models.UserNotification.created_at.desc()).all()
+    if since_id is not None:
+        # fallback do stream: só o que chegou depois do cursor, do mais antigo ao mais novo
+        q = q.where(models.UserNotification.id > since_id).order_by(models.UserNotification.id)
+    else:
+        if before_id is not None:
+            q = q.where(models.UserNotification.id < before_id)
+        q = q.order_by(models.UserNotification.id.desc())
+    result = await db.scalars(q.limit(limit))
+    return result.all()
 
 
-@router.post("/notifications/{nid}/read")
-def mark_read(
-    nid: int,
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user),
-):
-    notif = db.query(models.UserNotification).filter_by(id=nid, user_id=user.id).first()
-    if not notif:
-        raise HTTPException(status_code=404)
-    notif.is_read = True
-    db.commit()
-    return {"ok": True}
+@router.get("/notifications/unread-count")
+async def unread_count(user: models.User = Depends(get_current_user_async)):
+    """Badge de não lidas: lê o contador do usuário, sem varrer notificações."""
+    return {"unread": max(user.unread_notifications or 0, 0)}
 
 
-def run_checker_internal(db: Session) -> dict:
-    """
-    Lógica de verificação de alertas. Pode ser chamada pelo scheduler
-    interno OU pelo endpoint HTTP /run-check.
-    """
-    alerts: list[models.PriceAlert] = (
-        db.query(models.PriceAlert).filter_by(is_active=True).all()
+@router.post("/notifications/read-all")
+async def mark_all_read(
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
+):
+    result = await db.execute(
+        update(models.UserNotification)
+        .where(models.UserNotification.user_id == user.id)
+        .where(models.UserNotification.is_read.is_not(True))
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
     )
+    if result.rowcount:
+        # desconta só o que esta chamada marcou: notificações criadas no meio
+        # continuam contando (mesmo decremento atômico de mark_read)
+        await db.execute(
+            update(models.User)
+            .where(models.User.id == user.id)
+            .values(unread_notifications=case(
+                (models.User.unread_notifications > result.rowcount,
+                 models.User.unread_notifications - result.rowcount),
+                else_=0,
+            ))
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    return {"ok": True, "updated": result.rowcount}
 
-    checked = 0
-    triggered = 0
 
-    for alert in alerts:
-        checked += 1
+def _sse_event(payload: dict) -> str:
+    return f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
 
-        cities = [alert.city] if alert.city else None
-        qualities = [alert.quality] if alert.quality else None
 
-        try:
-            data = get_prices([alert.item_id], cities, qualities)
-        except Exception:
-            continue
-
-        valid = [
-            d.get("sell_price_min")
-            for d in (data or [])
-            if isinstance(d.get("sell_price_min"), (int, float))
-            and d["sell_price_min"] > 0
-        ]
-        if not valid:
-            continue
-
-        current_price = float(min(valid))
-
-        # ---------------------
-        # cooldown anti-spam (à prova de naive/aware)
-        # ---------------------
-        last_triggered = _ensure_aware(alert.last_triggered_at)
-        if last_triggered is not None:
-            if (_now_utc() - last_triggered) < timedelta(
-                minutes=int(alert.cooldown_minutes or 0)
-            ):
-                continue
-
-        item_label = alert.display_name or alert.item_id
-
-        # ---------------------
-        # Regra 1: target_price manual
-        # ---------------------
-        if alert.target_price and current_price <= float(alert.target_price):
-            _fire_alert(db, alert, item_label, current_price, expected_price=None)
-            triggered += 1
-            continue
-
-        # ---------------------
-        # Regra 2: % abaixo do esperado (manual OU IA)
-        # ---------------------
-        if not alert.percent_below:
-            continue
-
-        expected: Optional[float] = None
-
-        # manual
-        if alert.expected_price:
-            expected = float(alert.expected_price)
-
-        # IA: calcula baseline pelo histórico
-        if expected is None and alert.use_ai_expected:
-            city_list = [alert.city] if alert.city else ["Caerleon"]
-
-            try:
-                expected = _compute_expected_price_from_history(
-                    item_id=alert.item_id,
-                    cities=city_list,
-                    days=int(alert.ai_days or 0),
-                    resolution=str(alert.ai_resolution or "hour"),
-                    stat=str(alert.ai_stat or "median"),
-                    min_points=int(alert.ai_min_points or 10),
-                )
-            except Exception:
-                expected = None
-
-            # fallback: se não tiver histórico suficiente, usa o preço atual como baseline
-            if expected is None:
-                expected = current_price
-
-            alert.last_expected_price = expected
-            alert.last_expected_at = _now_utc()
-
-        if expected is None:
-            continue
-
-        threshold = expected * (1 - float(alert.percent_below) / 100.0)
-
-        if current_price <= threshold:
-            _fire_alert(db, alert, item_label, current_price, expected_price=expected)
-            triggered += 1
-
-    db.commit()
-    return {"checked": checked, "triggered": triggered}
-
-
-@router.post("/run-check")
-def run_checker(
-    x_cron_secret: Optional[str] = Header(None),
-    db: Session = Depends(get_db),
+@router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    token: str = Query(..., description="JWT (EventSource não envia header Authorization)"),
+    since_id: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Endpoint HTTP para disparar a verificação manualmente (cron externo ou admin)."""
-    current_cron_secret = os.getenv("CRON_SECRET")
-    if current_cron_secret and x_cron_secret != current_cron_secret:
-        raise HTTPException(status_code=401, detail="Invalid secret")
+    """
+    Server-Sent Events com as notificações novas do usuário, empurradas
+    assim que são gravadas. Ao (re)conectar, envia antes o que chegou
+    depois de `since_id` / Last-Event-ID.
+    """
+    user_id = (await principal_from_token_async(token, db)).id
+    cursor = since_id if since_id is not None else last_event_id
+
+    # assina antes de ler o atraso, para não perder nada no intervalo
+    queue = hub.subscribe(user_id)
+    backlog = []
+    if cursor is not None:
+        rows = await db.scalars(
+            select(models.UserNotification)
+            .where(models.UserNotification.user_id == user_id)
+            .where(models.UserNotification.id > cursor)
+            .order_by(models.UserNotification.id)
+        )
+        backlog = [notification_payload(n) for n in rows]
+    # a conexão volta ao pool já; o stream pode ficar aberto por horas
+    await db.close()
 
-    return run_checker_internal(db)
+    async def events():
+        last_id = cursor or 0
+        try:
+            for payload in backlog:
+                last_id = payload["id"]
+                yield _sse_event(payload)
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(
+                        queue.get(), timeout=settings.NOTIFICATIONS_SSE_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if payload["id"] <= last_id:
+                    continue  # já veio no atraso
+                last_id = payload["id"]
+                yield _sse_event(payload)
+        finally:
+            hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-def _fire_alert(
-    db: Session,
-    alert: models.PriceAlert,
-    item_label: str,
-    current_price: float,
-    expected_price: Optional[float],
+@router.post("/notifications/{nid}/read")
+async def mark_read(
+    nid: int,
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
 ):
-    # notificação no site
-    if expected_price is not None:
-        body = (
-            f"{item_label} chegou a {current_price:.0f} "
-            f"(esperado ~{expected_price:.0f}, -{float(alert.percent_below or 0):.0f}%)."
+    # a troca é condicional: de duas chamadas simultâneas só uma marca a
+    # notificação e só essa desconta do contador
+    result = await db.execute(
+        update(models.UserNotification)
+        .where(models.UserNotification.id == nid, models.UserNotification.user_id == user.id)
+        .where(models.UserNotification.is_read.is_not(True))
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        await db.execute(
+            update(models.User)
+            .where(models.User.id == user.id, models.User.unread_notifications > 0)
+            .values(unread_notifications=models.User.unread_notifications - 1)
+            .execution_options(synchronize_session=False)
         )
     else:
-        body = f"{item_label} chegou a {current_price:.0f}."
-
-    notif = models.UserNotification(
-        user_id=alert.user_id,
-        title="🚨 Oportunidade detectada!",
-        body=body,
-    )
-    db.add(notif)
-
-    # e-mail
-    user = db.query(models.User).filter_by(id=alert.user_id).first()
-    if user and user.email:
-        send_price_alert_email(
-            to_email=user.email,
-            item=item_label,
-            current_price=current_price,
-            city=alert.city,
-            expected_price=expected_price,
-            percent_below=float(alert.percent_below or 0),
+        exists = await db.scalar(
+            select(models.UserNotification.id).filter_by(id=nid, user_id=user.id)
         )
+        if exists is None:
+            raise HTTPException(status_code=404)
+    await db.commit()
+    return {"ok": True}
+
+
+# GET para o Vercel Cron; POST para cron externo/admin
+@router.api_route("/run-check", methods=["GET", "POST"], dependencies=[Depends(require_cron_secret)])
+def run_checker(db: Session = Depends(get_db)):
+    """Endpoint HTTP para disparar a verificação manualmente (cron externo ou admin)."""
+    return run_checker_internal(db)
+
 
-    # salvar timestamps sempre aware (UTC)
-    alert.last_triggered_at = _now_utc()
\ No newline at end of file
+@router.api_route("/run-retention", methods=["GET", "POST"], dependencies=[Depends(require_cron_secret)])
+def run_retention_job(db: Session = Depends(get_db)):
+    """Retenção de notificações via cron HTTP (deploy sem scheduler interno)."""
+    return run_retention(db)
@@ -8,7 +8,7 @@ from sqlalchemy.exc import IntegrityError
 from jose import JWTError, jwt
 
 from app.core.limiter import limiter
-from app.dependencies import get_db, get_current_user
+from app.dependencies import Principal, get_db, get_current_principal
 from app.models import User
 from app.schemas import (
     UserCreate,
@@ -180,7 +180,7 @@ def resend_verification(
 
 
 @router.get("/me", response_model=UserOut, summary="Retorna o usuário logado")
-def me(current_user: User = Depends(get_current_user)):
+def me(current_user: Principal = Depends(get_current_principal)):
     return current_user
 
 
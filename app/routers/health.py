@@ -1,8 +1,23 @@
 # app/routers/health.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from app.core.db_pool import pool_status
+from app.database import current_async_engine, engine
+from app.dependencies import require_cron_secret
 
 router = APIRouter(tags=["Sistema"])
 
 @router.get("/health")
 def health():
-    return {"status": "ok", "service": "Albion Market API"}
\ No newline at end of file
+    return {"status": "ok", "service": "Albion Market API"}
+
+
+# mesmo segredo das rotas de cron: expõe detalhes de infraestrutura
+@router.get("/health/pool", dependencies=[Depends(require_cron_secret)])
+def health_pool():
+    """Pool de conexões deste processo: uso atual, espera no checkout e timeouts."""
+    pools = [pool_status("sync", engine.pool)]
+    async_engine = current_async_engine()
+    if async_engine is not None:
+        pools.append(pool_status("async", async_engine.pool))
+    return {"pools": pools}
@@ -1,13 +1,33 @@
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
+from app.database import get_async_db
 from app.models import UserItem
-from app.schemas import ItemCreate, ItemOut
-from app.dependencies import get_db, get_current_user
-from app.utils.albion_index import buscar_item_por_nome
+from app.schemas import (
+    ItemBulkCreate,
+    ItemBulkDelete,
+    ItemBulkResult,
+    ItemCreate,
+    ItemOut,
+    WatchlistSnapshot,
+)
+from app.dependencies import get_current_principal
+from app.utils.albion_client import get_prices_with_status
+from app.utils.albion_index import eh_unique_name, resolver_unique_name
+from app.utils.albion_params import max_age_seconds, validate_region
 
 router = APIRouter(prefix="/items", tags=["Itens do Usuário"])
 
+EXPORT_BATCH_SIZE = 500  # linhas por consulta/bloco do /export.csv
+
 
 def _normalize_lang(lang: str) -> str:
     lang_norm = (lang or "").lower().replace("-", "_")
@@ -19,34 +39,24 @@ def resolve_to_unique_name(raw_name: str, lang: str = "pt_br") -> str:
     Recebe um nome qualquer (PT/EN/UniqueName parcial) e tenta resolver
     para um UniqueName válido (ex: T4_BAG, T4_BAG@1).
     """
-    lang_key = _normalize_lang(lang)
-    name = (raw_name or "").strip()
-    if not name:
+    if not (raw_name or "").strip():
         raise HTTPException(400, "Nome do item é obrigatório")
 
-    # Se já parece um UniqueName (T4_BAG, T5_CAPE@1, etc.), aceita direto
-    if name.upper().startswith("T") and "_" in name:
-        return name.upper()
-
-    # Tenta resolver pelo índice PT/EN
-    candidatos = buscar_item_por_nome(name, lang_key)
-    if not candidatos and lang_key == "pt_br":
-        candidatos = buscar_item_por_nome(name, "en_us")
-    if not candidatos:
+    unique_name = resolver_unique_name(raw_name, _normalize_lang(lang))
+    if unique_name is None:
         raise HTTPException(404, "Item não encontrado na base do Albion")
-
-    return candidatos[0]["UniqueName"]
+    return unique_name
 
 
 @router.post("/", response_model=ItemOut)
-def add_item(
+async def add_item(
     item: ItemCreate,
     lang: str = Query(
         "pt_br",
         description="Idioma usado para nomes humanos (pt_br ou en_us)",
     ),
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_principal),
 ):
     """
     Adiciona um item para o usuário.
@@ -56,7 +66,8 @@ def add_item(
     - Nome PT-BR: "Bolsa do Adepto"
     - Nome EN: "Adept's Bag"
     """
-    unique_name = resolve_to_unique_name(item.item_name, lang)
+    # a busca aproximada varre o catálogo: fora do event loop
+    unique_name = await run_in_threadpool(resolve_to_unique_name, item.item_name, lang)
 
     db_item = UserItem(
         user_id=user.id,
@@ -64,29 +75,187 @@ def add_item(
         display_name=item.display_name,
     )
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
+    await db.refresh(db_item)
     return db_item
 
 
+def _resolve_many(names: List[str], lang: str) -> Dict[str, Optional[str]]:
+    """Resolve cada nome distinto uma vez só."""
+    lang_key = _normalize_lang(lang)
+    return {name: resolver_unique_name(name, lang_key) for name in dict.fromkeys(names)}
+
+
+@router.post("/bulk", response_model=ItemBulkResult)
+async def add_items_bulk(
+    payload: ItemBulkCreate,
+    lang: str = Query("pt_br", description="Idioma usado para nomes humanos (pt_br ou en_us)"),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_principal),
+):
+    """
+    Adiciona vários itens de uma vez: nomes resolvidos em lote, itens que o
+    usuário já tem (ou repetidos na lista) ignorados e um único INSERT.
+    """
+    resolved = await run_in_threadpool(_resolve_many, [i.item_name for i in payload.items], lang)
+    existing = set(
+        await db.scalars(select(UserItem.item_name).where(UserItem.user_id == user.id))
+    )
+
+    rows, duplicates, not_found = [], [], []
+    for item in payload.items:
+        unique_name = resolved[item.item_name]
+        if unique_name is None:
+            not_found.append(item.item_name)
+        elif unique_name in existing:
+            duplicates.append(unique_name)
+        else:
+            existing.add(unique_name)
+            rows.append({"user_id": user.id, "item_name": unique_name, "display_name": item.display_name})
+
+    added = []
+    if rows:
+        # Core (não o bulk do ORM, que quebra o lote em grupos por colunas nulas)
+        table = UserItem.__table__
+        result = await db.execute(
+            insert(table).returning(table.c.id, table.c.item_name, table.c.display_name, table.c.created_at),
+            rows,
+        )
+        added = sorted(result.all(), key=lambda row: row.id)
+        await db.commit()
+    return {"added": added, "duplicates": duplicates, "not_found": not_found}
+
+
+@router.post("/bulk-delete")
+async def delete_items_bulk(
+    payload: ItemBulkDelete,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_principal),
+):
+    """Remove vários itens num único DELETE (por id e/ou UniqueName)."""
+    if not payload.ids and not payload.item_names:
+        return {"removed": 0}
+    result = await db.execute(
+        delete(UserItem)
+        .where(UserItem.user_id == user.id)
+        .where(or_(
+            UserItem.id.in_(payload.ids),
+            UserItem.item_name.in_([n.strip().upper() for n in payload.item_names]),
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return {"removed": result.rowcount}
+
+
+@router.get("/export.csv")
+async def export_items_csv(
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_principal),
+):
+    """Watchlist em CSV (item_name, display_name, created_at), no formato aceito por /items/bulk."""
+
+    async def lines():
+        # lê e gera o CSV em blocos por id (keyset): nem as linhas nem o arquivo
+        # ficam inteiros na memória; a sessão da dependência só fecha depois
+        # que a resposta termina
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["item_name", "display_name", "created_at"])
+        last_id = 0
+        while True:
+            result = await db.execute(
+                select(UserItem.id, UserItem.item_name, UserItem.display_name, UserItem.created_at)
+                .where(UserItem.user_id == user.id, UserItem.id > last_id)
+                .order_by(UserItem.id)
+                .limit(EXPORT_BATCH_SIZE)
+            )
+            rows = result.all()
+            # devolve a conexão ao pool enquanto o cliente consome o bloco
+            await db.rollback()
+            for _, name, display_name, created_at in rows:
+                writer.writerow([name, display_name or "", created_at.isoformat() if created_at else ""])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            if len(rows) < EXPORT_BATCH_SIZE:
+                break
+            last_id = rows[-1].id
+
+    return StreamingResponse(
+        lines(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="watchlist.csv"'},
+    )
+
+
 @router.get("/", response_model=list[ItemOut])
-def my_items(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(UserItem).filter(UserItem.user_id == user.id).all()
+async def my_items(db: AsyncSession = Depends(get_async_db), user=Depends(get_current_principal)):
+    result = await db.scalars(select(UserItem).where(UserItem.user_id == user.id))
+    return result.all()
+
+
+@router.get("/snapshot", response_model=WatchlistSnapshot)
+async def watchlist_snapshot(
+    region: str = Query("europe", description="Região do servidor: europe, west ou east"),
+    max_age_hours: Optional[float] = Query(
+        None, gt=0, description="Ignora ofertas mais antigas que N horas"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_principal),
+):
+    """
+    Itens salvos + preço atual de cada um, numa chamada só.
+
+    Os nomes já são UniqueName (resolvidos no cadastro), então os preços saem
+    direto do cache por item: com o cache quente não há chamada ao upstream.
+    Se a API do Albion falhar, os itens vêm mesmo assim, sem preço.
+    """
+    validate_region(region)
+
+    result = await db.scalars(
+        select(UserItem).where(UserItem.user_id == user.id).order_by(UserItem.id)
+    )
+    items = result.all()
+
+    names = list(dict.fromkeys(i.item_name.upper() for i in items if eh_unique_name(i.item_name)))
+    prices = {"summary": {}}
+    if names:
+        prices = await run_in_threadpool(
+            get_prices_with_status, names, region=region,
+            max_age=max_age_seconds(max_age_hours),
+        )
+
+    fetched_at = prices.get("fetched_at")
+    return {
+        "region": region,
+        "stale": prices.get("stale", False),
+        "unavailable": prices.get("unavailable", False),
+        "fetched_at": datetime.fromtimestamp(fetched_at, timezone.utc) if fetched_at else None,
+        "items": [
+            {
+                "id": i.id,
+                "item_name": i.item_name,
+                "display_name": i.display_name,
+                "created_at": i.created_at,
+                "price": prices["summary"].get(i.item_name.upper()),
+            }
+            for i in items
+        ],
+    }
 
 
 @router.delete("/{item_id}")
-def delete_item(
+async def delete_item(
     item_id: int,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_principal),
 ):
-    item = (
-        db.query(UserItem)
-        .filter(UserItem.id == item_id, UserItem.user_id == user.id)
-        .first()
+    item = await db.scalar(
+        select(UserItem).where(UserItem.id == item_id, UserItem.user_id == user.id)
     )
     if not item:
         raise HTTPException(404, "Item não encontrado")
-    db.delete(item)
-    db.commit()
+    await db.delete(item)
+    await db.commit()
     return {"message": "Item removido"}
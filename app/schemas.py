@@ -134,6 +134,49 @@ class ItemOut(BaseModel):
     }
 
 
+class ItemBulkCreate(BaseModel):
+    """Importação de vários itens (ex.: lista colada de uma planilha)."""
+    items: list[ItemCreate] = Field(..., min_length=1, max_length=1000)
+
+
+class ItemBulkResult(BaseModel):
+    """Resultado da importação em lote."""
+    added: list[ItemOut]
+    duplicates: list[str] = Field(default_factory=list, description="UniqueNames que o usuário já tinha")
+    not_found: list[str] = Field(default_factory=list, description="Nomes sem correspondência no catálogo")
+
+
+class ItemBulkDelete(BaseModel):
+    """Remoção em lote, por id e/ou UniqueName."""
+    ids: list[int] = Field(default_factory=list, max_length=1000)
+    item_names: list[str] = Field(default_factory=list, max_length=1000)
+
+
+class WatchlistPrice(BaseModel):
+    """Oferta mais barata de um item (resumo do cache de preços)."""
+    city: str
+    price: int
+    quality: int
+    enchantment: int = 0
+    buy_price_max: int = 0
+    buy_city: Optional[str] = None
+    updated: Optional[str] = Field(None, description="sell_price_min_date da oferta")
+
+
+class WatchlistSnapshotItem(ItemOut):
+    """Item da watchlist com o preço atual (None se não há oferta em cache/upstream)."""
+    price: Optional[WatchlistPrice] = None
+
+
+class WatchlistSnapshot(BaseModel):
+    """Watchlist + preços numa resposta só."""
+    region: str
+    stale: bool = Field(False, description="API do Albion falhou; preços são os últimos conhecidos")
+    unavailable: bool = Field(False, description="API do Albion falhou e não há preço conhecido")
+    fetched_at: Optional[datetime] = None
+    items: list[WatchlistSnapshotItem]
+
+
 class ResendVerificationRequest(BaseModel):
     """Payload para solicitar reenvio do link de verificação."""
     email: EmailStr = Field(
@@ -228,3 +271,56 @@ class NotificationOut(BaseModel):
     created_at: datetime
 
     model_config = {"from_attributes": True}
+
+
+class AlertPreferences(BaseModel):
+    alert_digest_enabled: bool = Field(
+        ..., description="Agrupa vários alertas disparados juntos em uma notificação/e-mail"
+    )
+
+    model_config = {"from_attributes": True}
+
+
+class BacktestConfig(BaseModel):
+    """Regra candidata de alerta (mesmos campos de PriceAlertCreate)."""
+    target_price: Optional[float] = None
+    expected_price: Optional[float] = None
+    percent_below: Optional[float] = 20.0
+
+    use_ai_expected: bool = True
+    ai_days: int = Field(7, ge=0, le=60)
+    ai_stat: str = "median"     # "median" | "mean"
+    ai_min_points: int = Field(10, ge=1)
+
+    cooldown_minutes: int = Field(60, ge=0)
+
+
+class BacktestRequest(BaseModel):
+    item_id: str
+    city: Optional[str] = None
+    days: int = Field(30, ge=1, le=90, description="Período do histórico reproduzido")
+    resolution: str = Field("1h", description="1h, 6h ou 24h")
+    configs: list[BacktestConfig] = Field(..., min_length=1, max_length=50)
+
+    @field_validator("item_id")
+    @classmethod
+    def normalize_item_id(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("item_id não pode estar vazio")
+        return v.strip().upper()
+
+
+class BacktestResult(BaseModel):
+    config: BacktestConfig
+    fires: int
+    fired_at: list[datetime]
+
+
+class BacktestOut(BaseModel):
+    item_id: str
+    city: str
+    resolution: str
+    points: int
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    results: list[BacktestResult]
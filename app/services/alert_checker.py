@@ -0,0 +1,580 @@
+# app/services/alert_checker.py
+"""
+Verificador de alertas de preço.
+
+Percorre os alertas ativos em lotes paginados por id (keyset), avalia cada
+lote em um pool de workers e faz commit por lote junto com um checkpoint.
+Se a execução cair no meio (timeout do cron, crash), a próxima retoma do
+último lote confirmado em vez de recomeçar do zero.
+
+Os disparos de cada lote são agrupados por usuário (digest): quem tem
+`alert_digest_enabled` recebe uma notificação e um e-mail com todos os
+alertas do lote, em vez de um por alerta.
+"""
+import hashlib
+import logging
+import uuid
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import bindparam, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import models
+from app.core.config import settings
+from app.services.alert_index import index as alert_index
+from app.services.baselines import get_expected_price
+from app.services.email_queue import drain_outbox, enqueue_emails
+from app.services.mailer import build_price_alert_digest_email, build_price_alert_email
+from app.services.notification_hub import notification_payload, publish_after_commit
+from app.utils.albion_client import get_prices_with_status
+
+CHECKPOINT_NAME = "price_alerts"
+
+logger = logging.getLogger("albion_market")
+
+
+def _now_utc() -> datetime:
+    # Sempre timezone-aware
+    return datetime.now(timezone.utc)
+
+
+def _ensure_aware(dt: Optional[datetime]) -> Optional[datetime]:
+    """
+    Garante datetime timezone-aware em UTC.
+    - None -> None
+    - naive -> assume UTC e marca tzinfo
+    - aware -> converte para UTC
+    - tipo inesperado -> None (evita quebrar o cron)
+    """
+    if dt is None:
+        return None
+    if not isinstance(dt, datetime):
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _snapshot(alert: models.PriceAlert) -> dict:
+    """
+    Cópia simples dos campos usados na avaliação, para que os workers não
+    toquem na Session (que não é thread-safe) nem façam lazy-load.
+    """
+    return {
+        "id": alert.id,
+        "item_id": alert.item_id,
+        "city": alert.city,
+        "quality": alert.quality,
+        "target_price": alert.target_price,
+        "expected_price": alert.expected_price,
+        "percent_below": alert.percent_below,
+        "use_ai_expected": alert.use_ai_expected,
+        "ai_days": alert.ai_days,
+        "ai_resolution": alert.ai_resolution,
+        "ai_stat": alert.ai_stat,
+        "ai_min_points": alert.ai_min_points,
+        "cooldown_minutes": alert.cooldown_minutes,
+        "last_triggered_at": alert.last_triggered_at,
+    }
+
+
+def evaluate_alert(alert: dict) -> dict:
+    """
+    Avalia um alerta (snapshot) sem acessar o banco.
+
+    Retorna {"alert_id", "fire", "current_price", "expected_price",
+    "baseline"} onde `baseline` é o novo last_expected_price calculado pela
+    IA (ou None se não houve cálculo).
+    """
+    result = {
+        "alert_id": alert["id"],
+        "fire": False,
+        "current_price": None,
+        "expected_price": None,
+        "baseline": None,
+    }
+
+    cities = [alert["city"]] if alert["city"] else None
+    qualities = [alert["quality"]] if alert["quality"] else None
+
+    try:
+        # notify=False: sem isso a busca do próprio verificador acionaria a
+        # avaliação por evento do mesmo alerta em paralelo
+        prices = get_prices_with_status(
+            [alert["item_id"]], cities, qualities,
+            max_age=settings.ALERT_MAX_PRICE_AGE_HOURS * 3600 or None,
+            notify=False,
+        )
+    except Exception:
+        return result
+
+    # menor preço já vem calculado no resumo do cache
+    cheapest = prices["summary"].get(alert["item_id"])
+    if not cheapest:
+        return result
+
+    current_price = float(cheapest["price"])
+    result["current_price"] = current_price
+
+    # ---------------------
+    # cooldown anti-spam (à prova de naive/aware)
+    # ---------------------
+    last_triggered = _ensure_aware(alert["last_triggered_at"])
+    if last_triggered is not None:
+        if (_now_utc() - last_triggered) < timedelta(
+            minutes=int(alert["cooldown_minutes"] or 0)
+        ):
+            return result
+
+    # ---------------------
+    # Regra 1: target_price manual
+    # ---------------------
+    if alert["target_price"] and current_price <= float(alert["target_price"]):
+        result["fire"] = True
+        return result
+
+    # ---------------------
+    # Regra 2: % abaixo do esperado (manual OU IA)
+    # ---------------------
+    if not alert["percent_below"]:
+        return result
+
+    expected: Optional[float] = None
+
+    # manual
+    if alert["expected_price"]:
+        expected = float(alert["expected_price"])
+
+    # IA: calcula baseline pelo histórico
+    if expected is None and alert["use_ai_expected"]:
+        city_list = [alert["city"]] if alert["city"] else ["Caerleon"]
+
+        # compartilhado entre todos os alertas com os mesmos parâmetros
+        try:
+            expected = get_expected_price(
+                item_id=alert["item_id"],
+                cities=city_list,
+                days=int(alert["ai_days"] or 0),
+                resolution=str(alert["ai_resolution"] or "hour"),
+                stat=str(alert["ai_stat"] or "median"),
+                min_points=int(alert["ai_min_points"] or 10),
+            )
+        except Exception:
+            expected = None
+
+        # fallback: se não tiver histórico suficiente, usa o preço atual como baseline
+        if expected is None:
+            expected = current_price
+
+        result["baseline"] = expected
+
+    if expected is None:
+        return result
+
+    threshold = expected * (1 - float(alert["percent_below"]) / 100.0)
+
+    if current_price <= threshold:
+        result["fire"] = True
+        result["expected_price"] = expected
+
+    return result
+
+
+def _fire_alert(
+    alert: models.PriceAlert,
+    item_label: str,
+    current_price: float,
+    expected_price: Optional[float],
+) -> dict:
+    """
+    Monta o evento de disparo. `last_triggered_at`, notificação e e-mail são
+    gravados em lote por `apply_results` / `deliver_firings`.
+    """
+    return {
+        "alert_id": alert.id,
+        "user_id": alert.user_id,
+        "item": item_label,
+        "current_price": current_price,
+        "city": alert.city,
+        "expected_price": expected_price,
+        "percent_below": float(alert.percent_below or 0),
+    }
+
+
+def _notification_line(firing: dict) -> str:
+    if firing["expected_price"] is not None:
+        return (
+            f"{firing['item']} chegou a {firing['current_price']:.0f} "
+            f"(esperado ~{firing['expected_price']:.0f}, -{firing['percent_below']:.0f}%)."
+        )
+    return f"{firing['item']} chegou a {firing['current_price']:.0f}."
+
+
+def _prefetch_users(db: Session, users: dict, user_ids) -> None:
+    """Carrega numa query só (email, digest ligado?) dos usuários fora do cache."""
+    missing = [uid for uid in user_ids if uid not in users]
+    if not missing:
+        return
+    rows = (
+        db.query(models.User.id, models.User.email, models.User.alert_digest_enabled)
+        .filter(models.User.id.in_(missing))
+        .all()
+    )
+    for uid in missing:
+        users[uid] = None
+    for uid, email, digest in rows:
+        users[uid] = (email, bool(digest))
+
+
+def _firing_key(firing: dict) -> str:
+    """
+    Alerta + janela de cooldown (o disparo anterior). Dois caminhos que
+    avaliaram o mesmo estado do alerta geram a mesma chave, e a outbox
+    descarta a segunda cópia; o instante do disparo não entra.
+    """
+    previous = firing.get("previous_trigger")
+    return f"{firing['alert_id']}:{int(previous.timestamp()) if previous else 0}"
+
+
+def _digest_key(group: list[dict]) -> str:
+    keys = ",".join(sorted(_firing_key(f) for f in group))
+    return hashlib.sha1(keys.encode()).hexdigest()
+
+
+def deliver_firings(db: Session, firings: list[dict], users: Optional[dict] = None) -> None:
+    """
+    Cria notificações e enfileira e-mails dos disparos. Usuários com digest
+    ligado recebem uma notificação e um e-mail só para todos os disparos.
+    Tudo sai em INSERTs em lote; não faz commit.
+    """
+    if not firings:
+        return
+    users = users if users is not None else {}
+
+    by_user: dict[int, list[dict]] = {}
+    for firing in firings:
+        by_user.setdefault(firing["user_id"], []).append(firing)
+    _prefetch_users(db, users, by_user.keys())
+
+    notifications: list[dict] = []
+    emails: list[dict] = []
+
+    for user_id, group in by_user.items():
+        info = users.get(user_id)
+        email = info[0] if info else None
+
+        if info and info[1] and len(group) > 1:
+            notifications.append({
+                "user_id": user_id,
+                "title": f"🚨 {len(group)} oportunidades detectadas!",
+                "body": "\n".join(_notification_line(f) for f in group),
+                "alert_id": None,
+                "is_read": False,
+            })
+            if email:
+                subject, text, html = build_price_alert_digest_email(group)
+                emails.append({
+                    "to_email": email, "subject": subject, "text": text, "html": html,
+                    "dedup_key": f"price_digest:{user_id}:{_digest_key(group)}",
+                })
+            continue
+
+        for firing in group:
+            notifications.append({
+                "user_id": user_id,
+                "title": "🚨 Oportunidade detectada!",
+                "body": _notification_line(firing),
+                "alert_id": firing["alert_id"],
+                "is_read": False,
+            })
+            if email:
+                subject, text, html = build_price_alert_email(
+                    item=firing["item"],
+                    current_price=firing["current_price"],
+                    city=firing["city"],
+                    expected_price=firing["expected_price"],
+                    percent_below=firing["percent_below"],
+                )
+                emails.append({
+                    "to_email": email, "subject": subject, "text": text, "html": html,
+                    "dedup_key": f"price_alert:{_firing_key(firing)}",
+                })
+
+    created = db.execute(
+        insert(models.UserNotification).returning(
+            models.UserNotification.id,
+            models.UserNotification.user_id,
+            models.UserNotification.title,
+            models.UserNotification.body,
+            models.UserNotification.is_read,
+            models.UserNotification.created_at,
+        ),
+        notifications,
+    )
+    # contador de não lidas: um UPDATE (executemany) para todos os usuários
+    per_user: dict[int, int] = {}
+    for n in notifications:
+        per_user[n["user_id"]] = per_user.get(n["user_id"], 0) + 1
+    db.connection().execute(
+        update(models.User)
+        .where(models.User.id == bindparam("uid"))
+        .values(unread_notifications=models.User.unread_notifications + bindparam("n")),
+        [{"uid": uid, "n": n} for uid, n in per_user.items()],
+    )
+
+    # push (SSE) só depois do commit
+    publish_after_commit(db, [notification_payload(dict(r._mapping)) for r in created])
+    enqueue_emails(db, emails)
+
+
+def _claim_firings(
+    db: Session, alerts: list[models.PriceAlert], firings: list[dict], now: datetime
+) -> set[int]:
+    """
+    Grava `last_triggered_at` só nos alertas que ainda estão fora do cooldown
+    NO BANCO (UPDATE condicional) e retorna os ids que esta chamada levou.
+    Se o verificador e a avaliação por evento dispararem o mesmo alerta ao
+    mesmo tempo, só um deles entrega a notificação e o e-mail.
+    """
+    if not firings:
+        return set()
+    cooldowns = {a.id: int(a.cooldown_minutes or 0) for a in alerts}
+
+    # um UPDATE por valor de cooldown (normalmente um só)
+    by_cooldown: dict[int, list[int]] = {}
+    for firing in firings:
+        by_cooldown.setdefault(cooldowns[firing["alert_id"]], []).append(firing["alert_id"])
+
+    PA = models.PriceAlert
+    claimed: set[int] = set()
+    for minutes, ids in by_cooldown.items():
+        cutoff = now - timedelta(minutes=minutes)
+        claimed.update(db.scalars(
+            update(PA)
+            .where(PA.id.in_(ids))
+            .where(or_(PA.last_triggered_at.is_(None), PA.last_triggered_at < cutoff))
+            .values(last_triggered_at=now)
+            .returning(PA.id)
+            .execution_options(synchronize_session=False)
+        ).all())
+    return claimed
+
+
+def apply_results(
+    db: Session,
+    alerts: list[models.PriceAlert],
+    results: list[dict],
+    users: Optional[dict] = None,
+) -> int:
+    """
+    Aplica no banco o resultado das avaliações (baseline da IA e disparos)
+    com UPDATEs em lote. Não faz commit; retorna quantos alertas dispararam.
+    """
+    firings = []
+    baselines = []
+    now = _now_utc()  # salvar timestamps sempre aware (UTC)
+
+    for alert, result in zip(alerts, results):
+        if result["baseline"] is not None:
+            baselines.append({
+                "id": alert.id,
+                "last_expected_price": result["baseline"],
+                "last_expected_at": now,
+            })
+            # mantém o objeto em memória igual ao banco, sem gerar outro UPDATE
+            set_committed_value(alert, "last_expected_price", result["baseline"])
+            set_committed_value(alert, "last_expected_at", now)
+            # baseline mudou -> limiar de disparo no índice também
+            alert_index.upsert(alert)
+        if result["fire"]:
+            firing = _fire_alert(
+                alert,
+                alert.display_name or alert.item_id,
+                result["current_price"],
+                expected_price=result["expected_price"],
+            )
+            # disparo anterior: identifica a janela de cooldown deste disparo
+            firing["previous_trigger"] = _ensure_aware(alert.last_triggered_at)
+            firings.append(firing)
+
+    if baselines:
+        # UPDATE por chave primária, executemany
+        db.execute(update(models.PriceAlert), baselines)
+
+    claimed = _claim_firings(db, alerts, firings, now)
+    firings = [f for f in firings if f["alert_id"] in claimed]
+    for alert in alerts:
+        if alert.id in claimed:
+            set_committed_value(alert, "last_triggered_at", now)
+
+    deliver_firings(db, firings, users)
+    return len(firings)
+
+
+def _make_executor(workers: int) -> Optional[Executor]:
+    # threads e não processos: a avaliação espera upstream/banco (I/O) e
+    # precisa do cache de preços, circuit breakers e memo de baselines do processo
+    if workers <= 1:
+        return None
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="alert-checker")
+
+
+def _acquire_lease(db: Session, owner: str) -> bool:
+    """
+    Toma o checkpoint para esta execução com um UPDATE condicional (só se
+    ninguém tem o lease ou ele expirou). Funciona entre processos/instâncias.
+    """
+    if db.get(models.CheckerCheckpoint, CHECKPOINT_NAME) is None:
+        try:
+            db.add(models.CheckerCheckpoint(name=CHECKPOINT_NAME, last_alert_id=0, checked=0, triggered=0))
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # outra execução criou a linha ao mesmo tempo
+
+    now = _now_utc()
+    CP = models.CheckerCheckpoint
+    acquired = db.execute(
+        update(CP)
+        .where(CP.name == CHECKPOINT_NAME)
+        .where(or_(CP.lease_owner.is_(None), CP.lease_expires_at < now))
+        .values(
+            lease_owner=owner,
+            lease_expires_at=now + timedelta(seconds=settings.ALERT_CHECKER_LEASE_SECONDS),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    db.commit()
+    return acquired
+
+
+def _renew_lease(db: Session, owner: str) -> None:
+    """Heartbeat, na mesma transação do lote: se o lease foi perdido, o lote não é confirmado."""
+    CP = models.CheckerCheckpoint
+    renewed = db.execute(
+        update(CP)
+        .where(CP.name == CHECKPOINT_NAME, CP.lease_owner == owner)
+        .values(lease_expires_at=_now_utc() + timedelta(seconds=settings.ALERT_CHECKER_LEASE_SECONDS))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if renewed != 1:
+        raise RuntimeError("Lease do checkpoint perdido para outra execução")
+
+
+def _release_lease(db: Session, owner: str) -> None:
+    CP = models.CheckerCheckpoint
+    db.execute(
+        update(CP)
+        .where(CP.name == CHECKPOINT_NAME, CP.lease_owner == owner)
+        .values(lease_owner=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def _load_checkpoint(db: Session) -> tuple[models.CheckerCheckpoint, bool]:
+    """
+    Carrega o checkpoint (com o lease já tomado); retoma se a última
+    execução não terminou e é recente, senão começa uma nova passada.
+    """
+    cp = db.get(models.CheckerCheckpoint, CHECKPOINT_NAME)
+    db.refresh(cp)
+
+    started = _ensure_aware(cp.started_at)
+    resume_window = timedelta(hours=settings.ALERT_CHECKER_RESUME_HOURS)
+    resumed = (
+        started is not None
+        and cp.finished_at is None
+        and _now_utc() - started < resume_window
+    )
+    if not resumed:
+        cp.last_alert_id = 0
+        cp.checked = 0
+        cp.triggered = 0
+        cp.started_at = _now_utc()
+        cp.finished_at = None
+    cp.updated_at = _now_utc()
+    db.commit()
+    return cp, resumed
+
+
+def run_checker_internal(
+    db: Session,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> dict:
+    """
+    Lógica de verificação de alertas. Pode ser chamada pelo scheduler
+    interno OU pelo endpoint HTTP /run-check.
+    """
+    batch_size = batch_size or settings.ALERT_CHECKER_BATCH_SIZE
+    workers = workers if workers is not None else settings.ALERT_CHECKER_WORKERS
+
+    owner = uuid.uuid4().hex
+    if not _acquire_lease(db, owner):
+        # outra execução (cron repetido, chamada manual) ainda está no meio
+        logger.info("Verificação de alertas já em andamento; ignorando esta chamada")
+        return {"skipped": True, "reason": "already_running"}
+
+    executor = None
+    try:
+        cp, resumed = _load_checkpoint(db)
+        executor = _make_executor(workers)
+        batches = 0
+        users: dict = {}  # cache de usuários da execução
+
+        while True:
+            alerts: list[models.PriceAlert] = (
+                db.query(models.PriceAlert)
+                .filter(models.PriceAlert.is_active.is_(True))
+                .filter(models.PriceAlert.id > cp.last_alert_id)
+                .order_by(models.PriceAlert.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not alerts:
+                break
+
+            snapshots = [_snapshot(a) for a in alerts]
+            if executor is None:
+                results = [evaluate_alert(s) for s in snapshots]
+            else:
+                results = list(executor.map(evaluate_alert, snapshots))
+
+            triggered = apply_results(db, alerts, results, users)
+
+            cp.last_alert_id = alerts[-1].id
+            cp.checked += len(alerts)
+            cp.triggered += triggered
+            cp.updated_at = _now_utc()
+            _renew_lease(db, owner)
+            db.commit()
+            batches += 1
+
+            # mantém a memória limitada ao tamanho do lote
+            for alert in alerts:
+                db.expunge(alert)
+
+        cp.finished_at = _now_utc()
+        cp.updated_at = cp.finished_at
+        db.commit()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+        # libera já (também em erro), para a próxima chamada retomar sem esperar o lease expirar
+        db.rollback()
+        _release_lease(db, owner)
+
+    # e-mails dos disparos saem em lote, fora do loop de avaliação
+    emails = drain_outbox(db)
+
+    return {
+        "checked": cp.checked,
+        "triggered": cp.triggered,
+        "batches": batches,
+        "resumed": resumed,
+        "emails": emails,
+    }
@@ -0,0 +1,98 @@
+# app/services/alert_events.py
+"""
+Avaliação de alertas dirigida por eventos de preço.
+
+Usa o índice em memória de `alert_index` (alertas ativos por item, cidade
+e qualidade, ordenados pelo preço de disparo). Sempre que o cliente da
+Albion recebe preços novos (requisição de usuário ou worker de ingestão),
+só os alertas que disparariam com esse preço são avaliados, na hora, em
+uma thread dedicada. O cron diário continua existindo como rede de
+segurança.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.database import SessionLocal
+from app.services.alert_checker import _snapshot, apply_results, evaluate_alert
+from app.services.alert_index import index
+from app.services.email_queue import drain_outbox
+from app.utils.albion_client import add_price_listener, remove_price_listener
+
+logger = logging.getLogger("albion_market")
+
+# Uma única thread: avaliações do mesmo alerta nunca correm em paralelo
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def evaluate_alert_ids(db: Session, alert_ids: List[int]) -> int:
+    """Avalia e aplica só os alertas informados; retorna quantos dispararam."""
+    alerts = (
+        db.query(models.PriceAlert)
+        .filter(models.PriceAlert.id.in_(alert_ids))
+        .filter(models.PriceAlert.is_active.is_(True))
+        .all()
+    )
+    results = [evaluate_alert(_snapshot(a)) for a in alerts]
+    triggered = apply_results(db, alerts, results)
+    db.commit()
+    return triggered
+
+
+def _evaluate_in_background(alert_ids: List[int]) -> None:
+    db = SessionLocal()
+    try:
+        triggered = evaluate_alert_ids(db, alert_ids)
+        if triggered:
+            logger.info(f"Alertas por evento: {triggered} disparados de {len(alert_ids)} avaliados")
+            drain_outbox(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro avaliando alertas por evento: {e}")
+    finally:
+        db.close()
+
+
+def on_prices_updated(region: str, rows_by_item: Dict[str, List[dict]]) -> None:
+    """Listener registrado no cliente da Albion."""
+    # os alertas são sempre checados na região padrão
+    if region != settings.ALBION_REGION or _executor is None:
+        return
+
+    alert_ids: Set[int] = set()
+    for item_id, rows in rows_by_item.items():
+        alert_ids |= index.match(item_id, rows)
+
+    if alert_ids:
+        _executor.submit(_evaluate_in_background, sorted(alert_ids))
+
+
+def start_alert_events() -> bool:
+    """Monta o índice e passa a ouvir os preços (se ALERT_EVENTS_ENABLED)."""
+    global _executor
+    if not settings.ALERT_EVENTS_ENABLED:
+        return False
+
+    db = SessionLocal()
+    try:
+        index.rebuild(db)
+    finally:
+        db.close()
+
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alert-events")
+    add_price_listener(on_prices_updated)
+    logger.info(f"Avaliação de alertas por evento ligada ({len(index)} alertas indexados).")
+    return True
+
+
+def stop_alert_events() -> None:
+    global _executor
+    remove_price_listener(on_prices_updated)
+    index.clear()
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
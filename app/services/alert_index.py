@@ -0,0 +1,202 @@
+# app/services/alert_index.py
+"""
+Índice de limiares dos alertas ativos.
+
+Para cada (item, cidade, qualidade) guarda os alertas ordenados pelo preço
+efetivo de disparo. Um preço novo encontra todos os alertas que disparariam
+com uma busca binária, então o custo cresce com o número de alertas
+disparados e não com o total de alertas do item.
+"""
+import bisect
+import math
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import models
+
+IndexKey = Tuple[str, Optional[str], Optional[int]]
+
+
+def effective_trigger_price(alert: models.PriceAlert) -> Optional[float]:
+    """
+    Maior preço que ainda dispara o alerta (regras são combinadas com OU):
+    - target_price manual
+    - expected * (1 - percent_below) com expected manual ou o último da IA
+
+    Alerta de IA ainda sem baseline retorna +inf (sempre candidato, para que
+    a avaliação calcule o baseline). Sem nenhuma regra aplicável: None.
+    """
+    thresholds = []
+    if alert.target_price:
+        thresholds.append(float(alert.target_price))
+
+    if alert.percent_below:
+        factor = 1 - float(alert.percent_below) / 100.0
+        if alert.expected_price:
+            thresholds.append(float(alert.expected_price) * factor)
+        elif alert.use_ai_expected:
+            if alert.last_expected_price is None:
+                return math.inf
+            thresholds.append(float(alert.last_expected_price) * factor)
+
+    return max(thresholds) if thresholds else None
+
+
+class _Bucket:
+    """
+    Limiares ordenados (crescente) e ids na mesma posição.
+
+    Inserções e remoções ficam pendentes e só são aplicadas na próxima
+    consulta: `list.insert`/`del` no meio de um bucket grande custam O(n)
+    cada, e o verificador atualiza muitos alertas seguidos entre dois
+    eventos de preço. A consolidação junta tudo com um único sort (o
+    Timsort aproveita a parte que já está ordenada).
+    """
+
+    __slots__ = ("thresholds", "ids", "_added", "_removed")
+
+    def __init__(self):
+        self.thresholds: list[float] = []
+        self.ids: list[int] = []
+        self._added: Set[Tuple[float, int]] = set()
+        self._removed: Set[Tuple[float, int]] = set()
+
+    def add(self, threshold: float, alert_id: int) -> None:
+        entry = (threshold, alert_id)
+        if entry in self._removed:
+            self._removed.discard(entry)
+        else:
+            self._added.add(entry)
+
+    def discard(self, threshold: float, alert_id: int) -> None:
+        entry = (threshold, alert_id)
+        if entry in self._added:
+            self._added.discard(entry)
+        else:
+            self._removed.add(entry)
+
+    def _consolidate(self) -> None:
+        if not (self._added or self._removed):
+            return
+        entries = [e for e in zip(self.thresholds, self.ids) if e not in self._removed]
+        entries.extend(sorted(self._added))
+        entries.sort()
+        self.thresholds = [t for t, _ in entries]
+        self.ids = [i for _, i in entries]
+        self._added.clear()
+        self._removed.clear()
+
+    def triggered_by(self, price: float) -> list[int]:
+        """Alertas com limiar >= preço (os que disparariam)."""
+        self._consolidate()
+        pos = bisect.bisect_left(self.thresholds, price)
+        return self.ids[pos:]
+
+    def __bool__(self) -> bool:
+        return len(self.ids) - len(self._removed) + len(self._added) > 0
+
+
+class AlertIndex:
+    """
+    Índice em memória: (item_id, city | None, quality | None) -> limiares.
+    `None` significa "qualquer cidade/qualidade", como no próprio alerta.
+
+    Só é mantido depois do `rebuild()` (feito por `start_alert_events` com
+    ALERT_EVENTS_ENABLED); antes disso `upsert`/`remove` não fazem nada,
+    para não gastar memória e CPU com um índice que ninguém consulta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key: Dict[IndexKey, _Bucket] = {}
+        self._entry_by_alert: Dict[int, Tuple[IndexKey, float]] = {}
+        self.live = False
+
+    @staticmethod
+    def _key(alert: models.PriceAlert) -> IndexKey:
+        return (alert.item_id.upper(), alert.city or None, alert.quality or None)
+
+    def __len__(self) -> int:
+        return len(self._entry_by_alert)
+
+    def rebuild(self, db: Session) -> None:
+        alerts = db.query(models.PriceAlert).filter(models.PriceAlert.is_active.is_(True))
+        with self._lock:
+            self._by_key.clear()
+            self._entry_by_alert.clear()
+            self.live = True
+        for alert in alerts:
+            self.upsert(alert)
+
+    def clear(self) -> None:
+        """Esvazia o índice e para de mantê-lo."""
+        with self._lock:
+            self.live = False
+            self._by_key.clear()
+            self._entry_by_alert.clear()
+
+    def upsert(self, alert: models.PriceAlert) -> None:
+        """Insere/atualiza o alerta (chamar quando regra ou baseline mudar)."""
+        if not self.live:
+            return
+        threshold = effective_trigger_price(alert) if alert.is_active else None
+        with self._lock:
+            self._discard_locked(alert.id)
+            if threshold is None:
+                return
+            key = self._key(alert)
+            self._by_key.setdefault(key, _Bucket()).add(threshold, alert.id)
+            self._entry_by_alert[alert.id] = (key, threshold)
+
+    def remove(self, alert_id: int) -> None:
+        if not self.live:
+            return
+        with self._lock:
+            self._discard_locked(alert_id)
+
+    def _discard_locked(self, alert_id: int) -> None:
+        entry = self._entry_by_alert.pop(alert_id, None)
+        if entry is None:
+            return
+        key, threshold = entry
+        bucket = self._by_key.get(key)
+        if bucket is not None:
+            bucket.discard(threshold, alert_id)
+            if not bucket:
+                del self._by_key[key]
+
+    def match(self, item_id: str, rows: Iterable[dict]) -> Set[int]:
+        """
+        Ids dos alertas cujo limiar é atingido pelo menor preço de venda
+        das linhas compatíveis com o (item, cidade, qualidade) do alerta.
+        """
+        item_id = item_id.upper()
+
+        # menor preço por chave do índice (cada linha alimenta 4 chaves)
+        best: Dict[IndexKey, float] = {}
+        for d in rows:
+            price = d.get("sell_price_min")
+            if not price or price <= 0:
+                continue
+            city, quality = d.get("city"), d.get("quality")
+            for key in (
+                (item_id, city, quality),
+                (item_id, city, None),
+                (item_id, None, quality),
+                (item_id, None, None),
+            ):
+                if price < best.get(key, math.inf):
+                    best[key] = price
+
+        matched: Set[int] = set()
+        with self._lock:
+            for key, price in best.items():
+                bucket = self._by_key.get(key)
+                if bucket:
+                    matched.update(bucket.triggered_by(price))
+        return matched
+
+
+index = AlertIndex()
@@ -0,0 +1,267 @@
+# app/services/baselines.py
+"""
+Baseline ("preço esperado") da IA a partir do histórico.
+
+O cálculo é compartilhado: alertas com os mesmos parâmetros (item, cidades,
+dias, resolução, estatística, mínimo de pontos) usam um único resultado,
+memoizado com TTL. Se vários workers pedirem a mesma chave ao mesmo tempo,
+só um calcula e os outros esperam o resultado.
+
+Por baixo, cada (item, cidades, dias, resolução) mantém um estado
+incremental: mediana de janela deslizante (dois heaps) e EWMA para
+`stat="mean"`. Só os pontos de histórico mais novos que o último visto
+entram no estado (O(log n) por ponto), e o estado é salvo em
+`price_baselines` para sobreviver entre execuções.
+"""
+import json
+import logging
+import math
+import threading
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import cachetools
+
+from app import models
+from app.core.config import settings
+from app.database import SessionLocal
+from app.utils.albion_client import get_price_history
+from app.utils.rolling import Ewma, RollingMedian
+
+logger = logging.getLogger("albion_market")
+
+BaselineKey = Tuple[str, Tuple[str, ...], int, str, str, int]
+StateKey = Tuple[str, Tuple[str, ...], int, str]
+
+baseline_cache = cachetools.TTLCache(maxsize=2000, ttl=settings.ALERT_BASELINE_TTL_SECONDS)
+
+_lock = threading.Lock()
+_inflight: Dict[BaselineKey, Future] = {}
+
+# estados incrementais em memória (o banco guarda a cópia persistente)
+_states = cachetools.LRUCache(maxsize=5000)
+
+# horas por ponto de cada resolução (mesmo mapa do cliente da Albion)
+RESOLUTION_HOURS = {"1h": 1, "6h": 6, "24h": 24}
+
+_PRICE_KEYS = (
+    "sell_price_min",
+    "sell_price_min_avg",
+    "avg_sell_price",
+    "sell_price_avg",
+    "avg_price",
+    "price",
+    "value",
+)
+
+
+def _row_price(row) -> Optional[float]:
+    if not isinstance(row, dict):
+        return None
+    for k in _PRICE_KEYS:
+        v = row.get(k)
+        if isinstance(v, (int, float)) and v > 0:
+            return float(v)
+    return None
+
+
+def history_points(history: list) -> List[Tuple[int, float]]:
+    """Pares (timestamp, preço) em ordem de tempo; linhas sem timestamp são ignoradas."""
+    points = []
+    for row in history or []:
+        price = _row_price(row)
+        ts = row.get("timestamp") if isinstance(row, dict) else None
+        if price is not None and isinstance(ts, (int, float)):
+            points.append((int(ts), price))
+    points.sort(key=lambda p: p[0])
+    return points
+
+
+class BaselineState:
+    """Mediana de janela deslizante + EWMA de uma série (item, cidades, janela)."""
+
+    def __init__(self, key: StateKey):
+        _, _, days, resolution = key
+        self.key = key
+        self.lock = threading.Lock()
+        self.loaded = False
+
+        # timestamps do histórico estão em ms
+        window = days * 86400 * 1000 if days > 0 else math.inf
+        self.median = RollingMedian(window)
+        # cada ponto da janela já serializado, para o dump não reconverter
+        # a janela inteira a cada save (só os pontos novos são codificados)
+        self._encoded: deque = deque()
+
+        # EWMA com "memória" equivalente ao número de pontos da janela
+        step_hours = RESOLUTION_HOURS.get(resolution, 6)
+        span = int(days * 24 / step_hours) if days > 0 else 0
+        self.ewma = Ewma.for_span(span)
+
+    @property
+    def db_key(self) -> str:
+        item_id, cities, days, resolution = self.key
+        return f"{item_id}:{','.join(cities)}:{days}:{resolution}"
+
+    def feed(self, points: Iterable[Tuple[int, float]]) -> int:
+        """Adiciona só os pontos mais novos que o último visto; retorna quantos."""
+        last = self.median.last_ts
+        added = 0
+        for ts, value in points:
+            if last is not None and ts <= last:
+                continue
+            self.median.add(ts, value)
+            self.ewma.update(value)
+            self._encoded.append(json.dumps([ts, value]))
+            added += 1
+        self._trim_encoded()
+        return added
+
+    def _trim_encoded(self) -> None:
+        # a janela descarta os mais antigos; a cópia serializada acompanha
+        while len(self._encoded) > len(self.median):
+            self._encoded.popleft()
+
+    def value(self, stat: str, min_points: int) -> Optional[float]:
+        if len(self.median) < min_points:
+            return None
+        if stat == "mean":
+            return self.ewma.value
+        # padrão: mediana (melhor contra picos/manipulação)
+        return self.median.median()
+
+    def load(self, row: models.PriceBaseline) -> None:
+        for ts, value in json.loads(row.points or "[]"):
+            self.median.add(ts, value)
+            self._encoded.append(json.dumps([ts, value]))
+        self._trim_encoded()
+        self.ewma.value = row.ewma
+        self.ewma.count = row.ewma_count or 0
+
+    def dump(self, row: models.PriceBaseline) -> None:
+        row.item_id = self.key[0]
+        row.points = "[" + ",".join(self._encoded) + "]"
+        row.ewma = self.ewma.value
+        row.ewma_count = self.ewma.count
+        row.last_ts = self.median.last_ts
+        row.updated_at = datetime.now(timezone.utc)
+
+
+def _load_state(state: BaselineState) -> None:
+    db = SessionLocal()
+    try:
+        row = db.get(models.PriceBaseline, state.db_key)
+        if row is not None:
+            state.load(row)
+    except Exception as e:
+        logger.warning(f"Baseline {state.db_key}: estado salvo indisponível ({e})")
+    finally:
+        db.close()
+
+
+def _save_state(state: BaselineState) -> None:
+    db = SessionLocal()
+    try:
+        row = db.get(models.PriceBaseline, state.db_key)
+        if row is None:
+            row = models.PriceBaseline(key=state.db_key)
+            db.add(row)
+        state.dump(row)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Baseline {state.db_key}: falha ao salvar estado ({e})")
+    finally:
+        db.close()
+
+
+def _get_state(item_id: str, cities: list[str], days: int, resolution: str) -> BaselineState:
+    key: StateKey = (item_id.upper(), tuple(sorted(cities)), days, resolution)
+    with _lock:
+        state = _states.get(key)
+        if state is None:
+            state = _states[key] = BaselineState(key)
+    return state
+
+
+def compute_expected_price_from_history(
+    item_id: str,
+    cities: list[str],
+    days: int,
+    resolution: str,
+    stat: str = "median",
+    min_points: int = 10,
+) -> Optional[float]:
+    history = get_price_history(
+        item_id=item_id.upper(),
+        locations=cities,
+        days=days,
+        time_resolution=resolution,
+    )
+
+    state = _get_state(item_id, cities, days, resolution)
+    with state.lock:
+        if not state.loaded:
+            _load_state(state)
+            state.loaded = True
+        if state.feed(history_points(history)):
+            _save_state(state)
+        return state.value(stat, min_points)
+
+
+def baseline_key(
+    item_id: str,
+    cities: list[str],
+    days: int,
+    resolution: str,
+    stat: str,
+    min_points: int,
+) -> BaselineKey:
+    return (item_id.upper(), tuple(sorted(cities)), days, resolution, stat, min_points)
+
+
+def get_expected_price(
+    item_id: str,
+    cities: list[str],
+    days: int,
+    resolution: str,
+    stat: str = "median",
+    min_points: int = 10,
+) -> Optional[float]:
+    """
+    Baseline compartilhado por chave. `None` (histórico insuficiente) também
+    é memoizado, para não refazer o fetch a cada alerta do mesmo item.
+    """
+    key = baseline_key(item_id, cities, days, resolution, stat, min_points)
+
+    with _lock:
+        if key in baseline_cache:
+            return baseline_cache[key]
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+
+    if not owner:
+        return future.result()
+
+    try:
+        value = compute_expected_price_from_history(
+            item_id, cities, days, resolution, stat, min_points
+        )
+    except Exception as e:
+        # falha de fetch/cálculo não é "histórico insuficiente": não memoiza,
+        # para a próxima avaliação tentar de novo
+        logger.warning(f"Baseline {key[0]}: falha ao calcular ({e})")
+        with _lock:
+            _inflight.pop(key, None)
+        future.set_result(None)
+        return None
+
+    with _lock:
+        baseline_cache[key] = value
+        _inflight.pop(key, None)
+    future.set_result(value)
+    return value
@@ -0,0 +1,252 @@
+# app/services/email_queue.py
+"""
+Fila durável de e-mails (tabela `email_outbox`).
+
+Quem dispara um alerta só enfileira (na mesma transação da notificação);
+`drain_outbox` envia depois, em lotes de até 100 pelo /emails/batch do
+Resend (ou um a um via SMTP quando o Resend não está configurado), com
+backoff exponencial em caso de falha. `dedup_key` é único, então o mesmo
+e-mail nunca entra duas vezes na fila.
+
+Cada lote é reservado antes do envio: um UPDATE condicional passa as linhas
+de `pending` para `sending` e só as que ele devolveu são enviadas, então
+drenagens em processos diferentes nunca mandam o mesmo e-mail. Se o
+processo morrer no meio do envio, a reserva vence em
+EMAIL_OUTBOX_CLAIM_SECONDS e o lote volta a ser elegível.
+
+Cada lote enviado ao Resend leva um `Idempotency-Key` (derivado das
+`dedup_key` do lote) gravado em `batch_key`: se a chamada estourar o
+timeout depois de o Resend aceitar, a nova tentativa reenvia exatamente as
+mesmas linhas com a mesma chave e o Resend não entrega de novo.
+"""
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.database import SessionLocal
+from app.services import mailer
+
+logger = logging.getLogger("albion_market")
+
+# evita duas drenagens simultâneas no mesmo processo (scheduler + /run-check)
+_drain_lock = threading.Lock()
+
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_emails(db: Session, messages: list[dict]) -> int:
+    """
+    Enfileira as mensagens (sem commit) e retorna quantas entraram: uma
+    query para as chaves já existentes e um INSERT (executemany) para o
+    resto; chaves repetidas no próprio lote entram uma vez só. Cada
+    mensagem: {"to_email", "subject", "text", "html", "dedup_key"}.
+    """
+    if not messages:
+        return 0
+    keys = [m["dedup_key"] for m in messages]
+    seen = {
+        k for (k,) in db.query(models.EmailOutbox.dedup_key)
+        .filter(models.EmailOutbox.dedup_key.in_(keys))
+    }
+    now = _now_utc()
+    rows = []
+    for m in messages:
+        if m["dedup_key"] in seen:
+            continue
+        seen.add(m["dedup_key"])
+        rows.append({**m, "status": "pending", "attempts": 0, "next_attempt_at": now})
+
+    if rows:
+        db.execute(insert(models.EmailOutbox), rows)
+    return len(rows)
+
+
+def _batch_key(dedup_keys: list[str]) -> str:
+    keys = "\n".join(sorted(dedup_keys))
+    return "outbox-" + hashlib.sha256(keys.encode()).hexdigest()
+
+
+def _send(batch: list[models.EmailOutbox], key: str) -> list[tuple[models.EmailOutbox, Exception]]:
+    """Envia o lote; retorna os e-mails que falharam (com o erro)."""
+    if mailer.resend_configured():
+        # o batch do Resend é tudo ou nada
+        try:
+            mailer.send_batch_via_resend(
+                [
+                    {"to_email": m.to_email, "subject": m.subject, "text": m.text, "html": m.html}
+                    for m in batch
+                ],
+                idempotency_key=key,
+            )
+        except Exception as e:
+            return [(m, e) for m in batch]
+        return []
+
+    failures = []
+    for m in batch:
+        try:
+            mailer.send_email(m.to_email, m.subject, m.text, m.html)
+        except Exception as e:
+            failures.append((m, e))
+    return failures
+
+
+def _mark_failed(m: models.EmailOutbox, error: Exception, now: datetime) -> bool:
+    """
+    Agenda nova tentativa com backoff; retorna True se desistiu de vez.
+    `now` é o mesmo para o lote inteiro, para ele voltar junto na retentativa.
+    """
+    m.attempts = (m.attempts or 0) + 1
+    m.last_error = str(error)[:500]
+    if m.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        m.status = "failed"
+        return True
+    m.status = "pending"
+    delay = settings.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (m.attempts - 1)
+    m.next_attempt_at = now + timedelta(seconds=delay)
+    return False
+
+
+def _due_filter(now: datetime):
+    """Pendentes com tentativa vencida, ou reservas abandonadas."""
+    return and_(
+        models.EmailOutbox.status.in_(("pending", "sending")),
+        or_(
+            models.EmailOutbox.next_attempt_at.is_(None),
+            models.EmailOutbox.next_attempt_at <= now,
+        ),
+    )
+
+
+def _claim(db: Session, last_id: int, size: int) -> tuple[list[int], Optional[int]]:
+    """
+    Reserva até `size` e-mails com id > last_id e faz commit. Retorna os ids
+    reservados por ESTA chamada e o maior id lido (None se não havia nada):
+    uma drenagem concorrente que leu as mesmas linhas não passa na condição
+    do UPDATE e recebe menos (ou nenhum) id. Lotes já tentados (`batch_key`)
+    entram inteiros, para a retentativa repetir o mesmo payload.
+    """
+    now = _now_utc()
+    rows = db.execute(
+        select(models.EmailOutbox.id, models.EmailOutbox.batch_key)
+        .where(models.EmailOutbox.id > last_id, _due_filter(now))
+        .order_by(models.EmailOutbox.id)
+        .limit(size)
+    ).all()
+    if not rows:
+        return [], None
+
+    candidates = [r.id for r in rows]
+    retried = {r.batch_key for r in rows if r.batch_key}
+    if retried:
+        candidates += db.scalars(
+            select(models.EmailOutbox.id)
+            .where(models.EmailOutbox.batch_key.in_(retried), _due_filter(now))
+            .where(models.EmailOutbox.id.not_in(candidates))
+        ).all()
+
+    claimed = db.execute(
+        update(models.EmailOutbox)
+        .where(models.EmailOutbox.id.in_(candidates), _due_filter(now))
+        .values(
+            status="sending",
+            next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_SECONDS),
+        )
+        .returning(models.EmailOutbox.id, models.EmailOutbox.dedup_key, models.EmailOutbox.batch_key)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    # chave do lote novo gravada junto com a reserva, antes do envio
+    fresh = [r for r in claimed if not r.batch_key]
+    if fresh:
+        db.execute(
+            update(models.EmailOutbox)
+            .where(models.EmailOutbox.id.in_([r.id for r in fresh]))
+            .values(batch_key=_batch_key([r.dedup_key for r in fresh]))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return sorted(r.id for r in claimed), rows[-1].id
+
+
+def _drain(db: Session, limit: Optional[int]) -> dict:
+    batch_size = min(settings.EMAIL_OUTBOX_BATCH_SIZE, mailer.RESEND_BATCH_LIMIT)
+    stats = {"sent": 0, "retry": 0, "failed": 0}
+    last_id = 0
+    processed = 0
+
+    while limit is None or processed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        claimed, last_seen = _claim(db, last_id, size)
+        if last_seen is None:
+            break
+        last_id = last_seen
+        if not claimed:
+            # outra drenagem levou o lote inteiro: segue para os próximos ids
+            continue
+
+        batch = (
+            db.query(models.EmailOutbox)
+            .filter(models.EmailOutbox.id.in_(claimed))
+            .order_by(models.EmailOutbox.id)
+            .all()
+        )
+        processed += len(batch)
+
+        # retentativas vão com a chave original, o resto com a do lote novo
+        groups: dict[str, list[models.EmailOutbox]] = {}
+        for m in batch:
+            groups.setdefault(m.batch_key, []).append(m)
+
+        for key, group in groups.items():
+            failures = _send(group, key)
+            now = _now_utc()
+            failed_ids = set()
+            for m, error in failures:
+                failed_ids.add(m.id)
+                stats["failed" if _mark_failed(m, error, now) else "retry"] += 1
+            if failures:
+                logger.warning(f"Falha enviando {len(failures)} e-mails da fila: {failures[0][1]}")
+
+            for m in group:
+                if m.id in failed_ids:
+                    continue
+                m.status = "sent"
+                m.sent_at = now
+                m.attempts = (m.attempts or 0) + 1
+                m.last_error = None
+                stats["sent"] += 1
+        db.commit()
+
+    return stats
+
+
+def drain_outbox(db: Optional[Session] = None, limit: Optional[int] = None) -> dict:
+    """
+    Envia os e-mails pendentes cuja próxima tentativa já venceu.
+    Retorna {"sent", "retry", "failed"}.
+    """
+    if not _drain_lock.acquire(blocking=False):
+        return {"sent": 0, "retry": 0, "failed": 0, "skipped": True}
+
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        return _drain(db, limit)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro drenando fila de e-mails: {e}")
+        raise
+    finally:
+        if own_session:
+            db.close()
+        _drain_lock.release()
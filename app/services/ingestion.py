@@ -0,0 +1,63 @@
+# app/services/ingestion.py
+"""
+Worker de ingestão: mantém no cache de preços um espelho de todos os itens
+observados (watchlists + alertas ativos), atualizado em lotes por região.
+
+Com ele ligado, as requisições dos usuários leem o espelho local e o número
+de chamadas ao upstream passa a depender dos itens distintos, não do tráfego.
+"""
+import logging
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models import PriceAlert, UserItem
+from app.utils.albion_client import refresh_prices
+from app.utils.albion_index import eh_unique_name
+
+logger = logging.getLogger("albion_market")
+
+
+def watched_item_ids(db: Session) -> List[str]:
+    """
+    União (sem repetição) dos itens das watchlists e dos alertas ativos.
+    Nomes legados que não são UniqueName ficam de fora.
+    """
+    names = {
+        row[0]
+        for row in db.query(UserItem.item_name).filter(UserItem.unresolved.is_(False)).distinct()
+    }
+    names.update(
+        row[0]
+        for row in db.query(PriceAlert.item_id)
+        .filter(PriceAlert.is_active.is_(True))
+        .distinct()
+    )
+    return sorted(n.upper() for n in names if n and eh_unique_name(n))
+
+
+def refresh_watched_items(
+    db: Optional[Session] = None,
+    regions: Optional[List[str]] = None,
+) -> dict:
+    """
+    Atualiza o espelho de preços para todos os itens observados.
+    Pode ser chamada pelo scheduler (sem `db`) ou diretamente.
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        items = watched_item_ids(db)
+    finally:
+        if own_session:
+            db.close()
+
+    regions = regions or settings.INGESTION_REGIONS
+    refreshed = {
+        region: refresh_prices(items, region=region, batch_size=settings.INGESTION_BATCH_SIZE)
+        for region in regions
+    }
+    logger.info(f"Ingestão de preços: {len(items)} itens, {refreshed}")
+    return {"items": len(items), "refreshed": refreshed}
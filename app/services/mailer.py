@@ -29,12 +29,23 @@ SMTP_PASS = os.getenv("SMTP_PASS")
 SMTP_FROM = os.getenv("SMTP_FROM", SMTP_USER)
 
 
+RESEND_API_URL = "https://api.resend.com/emails"
+RESEND_BATCH_LIMIT = 100  # máximo de e-mails por chamada em /emails/batch
+
+# cliente HTTP reaproveitado (keep-alive) entre envios
+_resend_client = None
+
+
 def _is_render() -> bool:
     return os.getenv("RENDER") is not None or "render.com" in os.getenv("RENDER_EXTERNAL_URL", "")
 
 
-def _send_via_resend(to_email: str, subject: str, text: str, html: str | None = None) -> None:
-    """Envia e-mail via Resend API."""
+def resend_configured() -> bool:
+    return bool(RESEND_API_KEY and RESEND_FROM_EMAIL)
+
+
+def _get_resend_client():
+    global _resend_client
     try:
         import httpx
     except ImportError as e:
@@ -48,6 +59,18 @@ def _send_via_resend(to_email: str, subject: str, text: str, html: str | None =
             '"Market Albion <no-reply@marketalbionbr.com.br>"'
         )
 
+    if _resend_client is None:
+        _resend_client = httpx.Client(
+            headers={
+                "Authorization": f"Bearer {RESEND_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            timeout=httpx.Timeout(10.0, connect=5.0),
+        )
+    return _resend_client
+
+
+def _resend_payload(to_email: str, subject: str, text: str, html: str | None = None) -> dict:
     payload = {
         "from": RESEND_FROM_EMAIL,      # IMPORTANTÍSSIMO: precisa ser do seu domínio verificado
         "to": [to_email],
@@ -58,22 +81,41 @@ def _send_via_resend(to_email: str, subject: str, text: str, html: str | None =
         payload["html"] = html
     if RESEND_REPLY_TO:
         payload["reply_to"] = RESEND_REPLY_TO
+    return payload
 
-    response = httpx.post(
-        "https://api.resend.com/emails",
-        headers={
-            "Authorization": f"Bearer {RESEND_API_KEY}",
-            "Content-Type": "application/json",
-        },
-        json=payload,
-        timeout=20.0,
-    )
+
+def _send_via_resend(to_email: str, subject: str, text: str, html: str | None = None) -> None:
+    """Envia e-mail via Resend API."""
+    client = _get_resend_client()
+    response = client.post(RESEND_API_URL, json=_resend_payload(to_email, subject, text, html))
 
     # Resend pode retornar 200 ou 201
     if response.status_code not in (200, 201):
         raise RuntimeError(f"Erro ao enviar e-mail via Resend ({response.status_code}): {response.text}")
 
 
+def send_batch_via_resend(messages: list[dict], idempotency_key: str | None = None) -> None:
+    """
+    Envia até RESEND_BATCH_LIMIT e-mails numa única chamada (/emails/batch).
+    Cada mensagem: {"to_email", "subject", "text", "html"}.
+
+    Com `idempotency_key`, o Resend ignora a repetição da mesma chamada
+    (mesma chave e mesmo payload) por 24h.
+    """
+    if len(messages) > RESEND_BATCH_LIMIT:
+        raise ValueError(f"Resend aceita no máximo {RESEND_BATCH_LIMIT} e-mails por lote.")
+
+    client = _get_resend_client()
+    payload = [
+        _resend_payload(m["to_email"], m["subject"], m["text"], m.get("html"))
+        for m in messages
+    ]
+    headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+    response = client.post(f"{RESEND_API_URL}/batch", json=payload, headers=headers)
+    if response.status_code not in (200, 201):
+        raise RuntimeError(f"Erro no envio em lote via Resend ({response.status_code}): {response.text}")
+
+
 def _send_via_smtp(to_email: str, subject: str, text: str) -> None:
     """Envia e-mail via SMTP (use só fora do Render)."""
     import logging
@@ -141,18 +183,14 @@ def send_verification_email(to_email: str, token: str) -> None:
     # Fallback SMTP (apenas fora do Render)
     _send_via_smtp(to_email, subject, text=text)
 
-def send_price_alert_email(
-    to_email: str,
+def build_price_alert_email(
     item: str,
     current_price: float,
     city: str | None,
     expected_price: float | None = None,
     percent_below: float = 0,
-) -> None:
-    """
-    Envia e-mail de alerta de preço usando a mesma estratégia do e-mail de verificação:
-    tenta Resend primeiro e, se não estiver configurado, faz fallback para SMTP.
-    """
+) -> tuple[str, str, str]:
+    """Monta (assunto, texto, html) do e-mail de alerta de preço."""
     subject = "🚨 Oportunidade detectada no Albion!"
     city_txt = city or "Qualquer"
 
@@ -187,10 +225,37 @@ def send_price_alert_email(
         <p><b>Cidade:</b> {city_txt}</p>
         """
 
-    # Sempre tenta Resend primeiro (produção)
-    if RESEND_API_KEY and RESEND_FROM_EMAIL:
+    return subject, text, html
+
+
+def build_price_alert_digest_email(entries: list[dict]) -> tuple[str, str, str]:
+    """
+    Monta (assunto, texto, html) de um resumo com vários alertas.
+    Cada entrada: {"item", "current_price", "city", "expected_price", "percent_below"}.
+    """
+    subject = f"🚨 {len(entries)} oportunidades detectadas no Albion!"
+
+    lines = []
+    rows = []
+    for e in entries:
+        city_txt = e.get("city") or "Qualquer"
+        extra = ""
+        if e.get("expected_price") is not None:
+            extra = f" (esperado ~{e['expected_price']:.0f}, -{e.get('percent_below') or 0:.0f}%)"
+        lines.append(f"- {e['item']}: {e['current_price']:.0f} em {city_txt}{extra}")
+        rows.append(f"<li><b>{e['item']}</b>: {e['current_price']:.0f} em {city_txt}{extra}</li>")
+
+    text = "Oportunidades detectadas!\n\n" + "\n".join(lines) + "\n"
+    html = f"""
+        <h3>Oportunidades detectadas!</h3>
+        <ul>{''.join(rows)}</ul>
+        """
+    return subject, text, html
+
+
+def send_email(to_email: str, subject: str, text: str, html: str | None = None) -> None:
+    """Resend se configurado; senão SMTP (apenas fora do Render)."""
+    if resend_configured():
         _send_via_resend(to_email, subject, text=text, html=html)
         return
-
-    # Fallback SMTP (apenas fora do Render)
     _send_via_smtp(to_email, subject, text=text)
@@ -0,0 +1,119 @@
+# app/services/notification_hub.py
+"""
+Fan-out em processo das notificações novas para clientes conectados (SSE).
+
+Cada conexão assina uma fila asyncio do seu usuário. `publish` pode ser
+chamado de qualquer thread (checker, avaliação por evento, scheduler): a
+entrega é agendada no event loop da conexão com `call_soon_threadsafe`.
+
+As notificações criadas numa Session só são publicadas depois do commit
+(`publish_after_commit`), para nenhum cliente ver linha que sofreu rollback.
+"""
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("albion_market")
+
+# mensagens pendentes por conexão; se o cliente não acompanhar, as mais novas
+# são descartadas e ele se recupera pelo since_id / Last-Event-ID
+QUEUE_MAXSIZE = 100
+
+_PENDING_KEY = "notifications_to_publish"
+
+Subscriber = Tuple[asyncio.AbstractEventLoop, asyncio.Queue]
+
+
+def _offer(queue: asyncio.Queue, payload: dict) -> None:
+    try:
+        queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        logger.warning("Fila SSE cheia; notificação descartada para um cliente lento.")
+
+
+class NotificationHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Chamar de dentro do event loop da conexão."""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_MAXSIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((loop, queue))
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = self._subscribers.get(user_id)
+            if not subs:
+                return
+            for sub in [s for s in subs if s[1] is queue]:
+                subs.discard(sub)
+            if not subs:
+                del self._subscribers[user_id]
+
+    def connected(self, user_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+    def publish(self, user_id: int, payload: dict) -> int:
+        """Entrega `payload` a todas as conexões do usuário; retorna quantas."""
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        delivered = 0
+        for loop, queue in subs:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, payload)
+                delivered += 1
+            except RuntimeError:
+                # loop já fechado (conexão morreu sem desinscrever)
+                self.unsubscribe(user_id, queue)
+        return delivered
+
+    def publish_many(self, payloads: List[dict]) -> None:
+        for payload in payloads:
+            self.publish(payload["user_id"], payload)
+
+
+hub = NotificationHub()
+
+
+_FIELDS = ("id", "user_id", "title", "body", "is_read", "created_at")
+
+
+def notification_payload(notif) -> dict:
+    """Formato enviado no stream (campos de NotificationOut + user_id)."""
+    row = notif if isinstance(notif, dict) else {k: getattr(notif, k) for k in _FIELDS}
+    created_at = row.get("created_at")
+    return {
+        "id": row["id"],
+        "user_id": row["user_id"],
+        "title": row["title"],
+        "body": row["body"],
+        "is_read": bool(row.get("is_read")),
+        "created_at": created_at.isoformat() if created_at else None,
+    }
+
+
+def publish_after_commit(db: Session, payloads: List[dict]) -> None:
+    """Guarda as notificações para publicar quando a transação confirmar."""
+    if payloads:
+        db.info.setdefault(_PENDING_KEY, []).extend(payloads)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        hub.publish_many(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,174 @@
+# app/services/retention.py
+"""
+Retenção da tabela `user_notifications`.
+
+- Notificações lidas mais velhas que NOTIFICATION_RETENTION_DAYS são
+  movidas para `user_notifications_archive` (ou apagadas, se o arquivo
+  estiver desligado).
+- Notificações repetidas são compactadas: fica só a mais nova. Disparos
+  do mesmo alerta contam como repetidos mesmo com preços diferentes no
+  texto; notificações sem alerta (digest, avisos) só com título e texto
+  iguais. Uma repetição só nasce quando chega a cópia nova,
+  então basta olhar as notificações dos últimos
+  NOTIFICATION_COMPACT_LOOKBACK_DAYS e apagar as cópias mais velhas delas
+  (arquivadas, como as lidas, se o arquivo estiver ligado).
+
+Tudo roda em lotes de NOTIFICATION_RETENTION_BATCH_SIZE linhas, cada um na
+sua transação, para nunca segurar lock por muito tempo.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, bindparam, case, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app import models
+from app.core.config import settings
+from app.database import SessionLocal
+
+logger = logging.getLogger("albion_market")
+
+Notif = models.UserNotification
+ARCHIVE_COLUMNS = ["id", "user_id", "title", "body", "is_read", "created_at"]
+
+
+def _remove(db: Session, ids: list[int], archive: bool) -> None:
+    """Apaga as notificações (sem commit), copiando antes para o arquivo se pedido."""
+    if archive:
+        db.execute(
+            insert(models.NotificationArchive).from_select(
+                ARCHIVE_COLUMNS,
+                select(*(getattr(Notif, c) for c in ARCHIVE_COLUMNS)).where(Notif.id.in_(ids)),
+            )
+        )
+    db.execute(delete(Notif).where(Notif.id.in_(ids)).execution_options(synchronize_session=False))
+
+
+def archive_read_notifications(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    archive: Optional[bool] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """Arquiva/apaga as notificações lidas antigas; retorna quantas saíram."""
+    days = older_than_days if older_than_days is not None else settings.NOTIFICATION_RETENTION_DAYS
+    archive = settings.NOTIFICATION_ARCHIVE_ENABLED if archive is None else archive
+    batch_size = batch_size or settings.NOTIFICATION_RETENTION_BATCH_SIZE
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+
+    total = 0
+    while True:
+        ids = [
+            nid for (nid,) in db.query(Notif.id)
+            .filter(Notif.is_read.is_(True))
+            .filter(Notif.created_at < cutoff)
+            .order_by(Notif.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            break
+
+        _remove(db, ids, archive)
+        db.commit()
+        total += len(ids)
+
+        if len(ids) < batch_size:
+            break
+    return total
+
+
+def compact_duplicate_notifications(
+    db: Session,
+    batch_size: Optional[int] = None,
+    lookback_days: Optional[int] = None,
+    archive: Optional[bool] = None,
+) -> int:
+    """
+    Mantém só a notificação mais nova de cada (usuário, alerta) ou, sem
+    alerta, de cada (usuário, título, texto) repetido. Percorre por id só as criadas nos últimos `lookback_days`
+    (0 = tabela inteira) e, para cada lote, busca as cópias mais velhas pelo
+    índice (user_id, id). Ajusta o contador de não lidas; retorna quantas
+    foram apagadas/arquivadas.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_RETENTION_BATCH_SIZE
+    days = lookback_days if lookback_days is not None else settings.NOTIFICATION_COMPACT_LOOKBACK_DAYS
+    archive = settings.NOTIFICATION_ARCHIVE_ENABLED if archive is None else archive
+
+    last_id = 0
+    if days > 0:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        first = db.scalar(select(func.min(Notif.id)).where(Notif.created_at >= cutoff))
+        if first is None:
+            return 0
+        last_id = first - 1
+
+    older = aliased(Notif)
+    total = 0
+    while True:
+        newest = db.scalars(
+            select(Notif.id).where(Notif.id > last_id).order_by(Notif.id).limit(batch_size)
+        ).all()
+        if not newest:
+            break
+        last_id = newest[-1]
+
+        rows = db.execute(
+            select(older.id, older.user_id, older.is_read)
+            .join(Notif, and_(
+                Notif.user_id == older.user_id,
+                Notif.id > older.id,
+                or_(
+                    and_(Notif.alert_id.is_not(None), Notif.alert_id == older.alert_id),
+                    and_(
+                        Notif.alert_id.is_(None), older.alert_id.is_(None),
+                        Notif.title == older.title, Notif.body == older.body,
+                    ),
+                ),
+            ))
+            .where(Notif.id.in_(newest))
+            .distinct()
+        ).all()
+        if not rows:
+            continue
+
+        doomed: list[int] = []
+        unread_by_user: dict[int, int] = {}
+        for nid, user_id, is_read in rows:
+            doomed.append(nid)
+            if not is_read:
+                unread_by_user[user_id] = unread_by_user.get(user_id, 0) + 1
+
+        _remove(db, doomed, archive)
+        if unread_by_user:
+            db.connection().execute(
+                update(models.User)
+                .where(models.User.id == bindparam("uid"))
+                .values(unread_notifications=case(
+                    (models.User.unread_notifications > bindparam("n"),
+                     models.User.unread_notifications - bindparam("n")),
+                    else_=0,
+                )),
+                [{"uid": uid, "n": n} for uid, n in unread_by_user.items()],
+            )
+        db.commit()
+        total += len(doomed)
+    return total
+
+
+def run_retention(db: Optional[Session] = None) -> dict:
+    """Job de retenção completo (scheduler ou cron HTTP)."""
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        compacted = compact_duplicate_notifications(db)
+        archived = archive_read_notifications(db)
+        logger.info(f"Retenção de notificações: {compacted} compactadas, {archived} arquivadas/apagadas")
+        return {"compacted": compacted, "archived": archived}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro na retenção de notificações: {e}")
+        raise
+    finally:
+        if own_session:
+            db.close()
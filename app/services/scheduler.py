@@ -0,0 +1,68 @@
+# app/services/scheduler.py
+"""
+Scheduler interno (APScheduler) para os jobs em background.
+
+Só é iniciado quando SCHEDULER_ENABLED=true e fora dos testes; em ambiente
+serverless (Vercel) os jobs continuam sendo disparados por cron HTTP.
+"""
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from app.core.config import settings
+from app.services.email_queue import drain_outbox
+from app.services.ingestion import refresh_watched_items
+from app.services.retention import run_retention
+
+logger = logging.getLogger("albion_market")
+
+scheduler: Optional[BackgroundScheduler] = None
+
+
+def start_scheduler() -> Optional[BackgroundScheduler]:
+    global scheduler
+    if not settings.SCHEDULER_ENABLED or os.getenv("TESTING") == "true":
+        return None
+    if scheduler is not None and scheduler.running:
+        return scheduler
+
+    scheduler = BackgroundScheduler(timezone="UTC")
+    scheduler.add_job(
+        refresh_watched_items,
+        "interval",
+        seconds=settings.INGESTION_INTERVAL_SECONDS,
+        id="price_ingestion",
+        max_instances=1,
+        coalesce=True,
+        next_run_time=datetime.now(timezone.utc),
+    )
+    scheduler.add_job(
+        drain_outbox,
+        "interval",
+        seconds=settings.EMAIL_OUTBOX_INTERVAL_SECONDS,
+        id="email_outbox",
+        max_instances=1,
+        coalesce=True,
+    )
+    scheduler.add_job(
+        run_retention,
+        "interval",
+        hours=settings.NOTIFICATION_RETENTION_INTERVAL_HOURS,
+        id="notification_retention",
+        max_instances=1,
+        coalesce=True,
+    )
+    scheduler.start()
+    logger.info("Scheduler iniciado.")
+    return scheduler
+
+
+def shutdown_scheduler() -> None:
+    global scheduler
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
+        logger.info("Scheduler encerrado.")
+    scheduler = None
@@ -0,0 +1,115 @@
+# app/services/watchlist_canonical.py
+"""
+Backfill único dos nomes legados da watchlist.
+
+Itens antigos foram salvos com o nome digitado ("BOLSA", "bag") em vez do
+UniqueName. Este job resolve cada um uma vez pelo índice de itens e grava o
+UniqueName em `item_name`; o que não tiver correspondência fica com
+`unresolved=True` e é ignorado nas rotas de preço. Se o usuário já tinha o
+mesmo item salvo pelo UniqueName, a linha legada é apagada (o
+`display_name` dela passa para a que fica, se essa não tiver um).
+
+Uso (depois de `alembic upgrade head`):
+    python -m app.services.watchlist_canonical
+"""
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import UserItem
+from app.utils.albion_index import eh_unique_name, resolver_unique_name
+
+logger = logging.getLogger("albion_market")
+
+
+def _is_canonical(name: str) -> bool:
+    return eh_unique_name(name) and name == name.upper()
+
+
+def canonicalize_watchlist(db: Optional[Session] = None, batch_size: int = 500) -> dict:
+    """
+    Percorre `user_items` por id em lotes (um commit por lote) e corrige os
+    nomes legados. Pode rodar de novo sem efeito: só toca em linhas que
+    ainda não estão no formato canônico nem marcadas como não resolvidas.
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    stats = {"scanned": 0, "resolved": 0, "unresolved": 0, "merged": 0}
+    resolved_names: Dict[str, Optional[str]] = {}  # o mesmo nome aparece em muitas watchlists
+    last_id = 0
+    try:
+        while True:
+            rows = db.execute(
+                select(UserItem.id, UserItem.user_id, UserItem.item_name, UserItem.display_name)
+                .where(UserItem.id > last_id, UserItem.unresolved.is_(False))
+                .order_by(UserItem.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            stats["scanned"] += len(rows)
+
+            legacy = [r for r in rows if not _is_canonical(r.item_name)]
+            if not legacy:
+                continue
+
+            # UniqueNames que esses usuários já têm, para não duplicar item:
+            # (usuário, UniqueName) -> [id da linha que fica, display_name]
+            taken = {
+                (uid, name): [item_id, display_name]
+                for item_id, uid, name, display_name in db.execute(
+                    select(UserItem.id, UserItem.user_id, UserItem.item_name, UserItem.display_name)
+                    .where(UserItem.user_id.in_({r.user_id for r in legacy}))
+                )
+                if _is_canonical(name)
+            }
+
+            updates: Dict[int, dict] = {}
+            doomed = []
+            for r in legacy:
+                key = r.item_name.strip().lower()
+                if key not in resolved_names:
+                    resolved_names[key] = resolver_unique_name(r.item_name)
+                unique_name = resolved_names[key]
+
+                if unique_name is None:
+                    updates.setdefault(r.id, {"id": r.id})["unresolved"] = True
+                    stats["unresolved"] += 1
+                elif (r.user_id, unique_name) in taken:
+                    survivor = taken[(r.user_id, unique_name)]
+                    if not survivor[1] and r.display_name:
+                        # mantém o nome que o usuário via na linha apagada
+                        survivor[1] = r.display_name
+                        updates.setdefault(survivor[0], {"id": survivor[0]})["display_name"] = r.display_name
+                    doomed.append(r.id)
+                    stats["merged"] += 1
+                else:
+                    updates.setdefault(r.id, {"id": r.id})["item_name"] = unique_name
+                    taken[(r.user_id, unique_name)] = [r.id, r.display_name]
+                    stats["resolved"] += 1
+
+            if updates:
+                db.execute(update(UserItem), list(updates.values()))
+            if doomed:
+                db.execute(
+                    delete(UserItem).where(UserItem.id.in_(doomed))
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+
+        logger.info(f"Watchlist canônica: {stats}")
+        return stats
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+
+if __name__ == "__main__":
+    print(canonicalize_watchlist())
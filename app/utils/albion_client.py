@@ -1,65 +1,498 @@
 # app/utils/albion_client.py
+import time
 import requests
 import cachetools
-from typing import List, Dict, Optional
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Any, Callable, List, Dict, Optional
+from datetime import datetime, timezone
 from app.core.config import settings
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
 
-# Session com retry e compressão
-session = requests.Session()
-session.headers.update(
-    {
-        "Accept-Encoding": "gzip",
-        "User-Agent": "AlbionMarketAPI/1.0",
-    }
-)
 
-# Cache global para preços
-prices_cache = cachetools.TTLCache(maxsize=1000, ttl=300)  # 5 minutos
+def _build_session() -> requests.Session:
+    """
+    Session com retry (só GET, idempotente), backoff exponencial e compressão.
+    """
+    retry = Retry(
+        total=settings.ALBION_API_RETRIES,
+        backoff_factor=settings.ALBION_API_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry)
+
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update(
+        {
+            "Accept-Encoding": "gzip",
+            "User-Agent": "AlbionMarketAPI/1.0",
+        }
+    )
+    return s
+
+
+session = _build_session()
+
+# Cache global para preços (uma entrada por região/item/cidades)
+prices_cache = cachetools.TTLCache(maxsize=5000, ttl=300)  # 5 minutos
 
 # Cache separado para histórico
 history_cache = cachetools.TTLCache(maxsize=500, ttl=600)  # 10 minutos
 
+# Último valor bom conhecido (sem TTL), usado quando a API está fora
+stale_cache = cachetools.LRUCache(maxsize=5000)
+
+# Um circuit breaker por região: se "europe" cair, "west" continua sendo consultada
+breakers: Dict[str, CircuitBreaker] = {}
+
+# Callbacks chamados a cada lote de preços novos vindo do upstream:
+# listener(region, {item_id: [linhas]})
+price_listeners: List[Callable[[str, Dict[str, List[Dict]]], None]] = []
+
+
+def add_price_listener(listener: Callable[[str, Dict[str, List[Dict]]], None]) -> None:
+    if listener not in price_listeners:
+        price_listeners.append(listener)
+
+
+def remove_price_listener(listener: Callable[[str, Dict[str, List[Dict]]], None]) -> None:
+    if listener in price_listeners:
+        price_listeners.remove(listener)
+
+
+def _notify_price_listeners(region: str, rows_by_item: Dict[str, List[Dict]]) -> None:
+    for listener in list(price_listeners):
+        try:
+            listener(region, rows_by_item)
+        except Exception as e:
+            print(f"[Albion] Erro em listener de preços: {e}")
+
+
+def _breaker(region: str) -> CircuitBreaker:
+    breaker = breakers.get(region)
+    if breaker is None:
+        breaker = breakers.setdefault(
+            region,
+            CircuitBreaker(
+                region,
+                failure_threshold=settings.ALBION_CIRCUIT_FAILURES,
+                reset_timeout=settings.ALBION_CIRCUIT_RESET_SECONDS,
+            ),
+        )
+    return breaker
+
+
+def _get_json(url: str, params: dict, region: str) -> Any:
+    """
+    GET na Albion Data API passando pelo circuit breaker da região.
+    Erros 4xx não contam como falha do upstream.
+    """
+    breaker = _breaker(region)
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"circuito aberto para a região {region}")
+
+    try:
+        resp = session.get(url, params=params, timeout=settings.ALBION_API_TIMEOUT)
+        resp.raise_for_status()
+        data = resp.json()
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code < 500 and e.response.status_code != 429:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+
+    breaker.record_success()
+    return data
+
+
+def _cached_fetch(
+    cache: cachetools.Cache,
+    cache_key: str,
+    url: str,
+    params: dict,
+    region: str,
+    transform: Callable[[Any], Any],
+    label: str,
+) -> Dict:
+    """
+    Busca com cache + fallback para o último valor conhecido.
+
+    Retorna {"data": ..., "stale": bool, "fetched_at": epoch | None,
+    "unavailable": bool}. `stale=True` indica que o upstream falhou e o dado
+    veio do cache antigo; `unavailable=True` que falhou e não havia fallback.
+    """
+    entry = cache.get(cache_key)
+    if entry is not None:
+        return {**entry, "stale": False, "unavailable": False}
+
+    try:
+        data = transform(_get_json(url, params, region))
+    except Exception as e:
+        print(f"[Albion] Erro {label}: {e}")
+        old = stale_cache.get(cache_key)
+        if old is not None:
+            return {**old, "stale": True, "unavailable": False}
+        return {"data": [], "stale": False, "fetched_at": None, "unavailable": True}
+
+    entry = {"data": data, "fetched_at": time.time()}
+    cache[cache_key] = entry
+    stale_cache[cache_key] = entry
+    return {**entry, "stale": False, "unavailable": False}
+
+
+ALL_QUALITIES = frozenset({1, 2, 3, 4, 5})
+
+
+def parse_albion_date(value: Optional[str]) -> int:
+    """
+    Converte as datas da Albion Data API ("2024-01-15T10:30:00", UTC sem
+    fuso) em epoch (segundos). Datas ausentes ("0001-01-01T00:00:00") viram 0.
+    """
+    if not value or value.startswith("0001-"):
+        return 0
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return 0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def _with_timestamps(d: Dict) -> Dict:
+    """Parse das datas feito uma única vez, na ingestão."""
+    return {
+        **d,
+        "sell_price_min_ts": parse_albion_date(d.get("sell_price_min_date")),
+        "buy_price_max_ts": parse_albion_date(d.get("buy_price_max_date")),
+    }
+
+
+def freshness_factor(ts: int, now: float) -> float:
+    """
+    Penalidade multiplicativa pela idade da oferta: 1.0 para um preço recém
+    visto, tendendo a 2.0 conforme envelhece (meia-vida configurável).
+    Preço sem data recebe a penalidade máxima.
+    """
+    half_life = settings.ALBION_FRESHNESS_HALF_LIFE_HOURS
+    if half_life <= 0:
+        return 1.0
+    if not ts:
+        return 2.0
+    age_hours = max(0.0, now - ts) / 3600
+    return 2.0 - 0.5 ** (age_hours / half_life)
+
+
+def summarize_rows(rows: List[Dict], now: Optional[float] = None) -> Dict[str, Dict]:
+    """
+    Resumo por item calculado uma única vez: oferta de venda com menor preço
+    ponderado pelo frescor, maior compra, cidade/qualidade de cada um e data.
+    """
+    now = now or time.time()
+    summary: Dict[str, Dict] = {}
+    for d in rows:
+        item_id = d["item_id"]
+        ts = d.get("sell_price_min_ts", 0)
+        weighted = d["sell_price_min"] * freshness_factor(ts, now)
+        s = summary.get(item_id)
+        if s is None or weighted < s["weighted_price"]:
+            s = summary[item_id] = {
+                **(s or {"buy_price_max": 0, "buy_city": None, "buy_quality": None}),
+                "city": d["city"],
+                "price": d["sell_price_min"],
+                "weighted_price": weighted,
+                "quality": d["quality"],
+                "enchantment": d.get("enchantment", 0),
+                "updated": d.get("sell_price_min_date"),
+                "updated_ts": ts,
+            }
+        buy = d.get("buy_price_max") or 0
+        if buy > s["buy_price_max"]:
+            s["buy_price_max"] = buy
+            s["buy_city"] = d["city"]
+            s["buy_quality"] = d["quality"]
+    return summary
+
+
+def _price_entry(rows: List[Dict], fetched_at: float) -> Dict:
+    """Entrada do cache por item: linhas já ordenadas por preço + resumo pronto."""
+    rows = sorted(rows, key=lambda d: d["sell_price_min"])
+    summary = summarize_rows(rows, now=fetched_at)
+    return {
+        "rows": rows,
+        "summary": next(iter(summary.values()), None),
+        "fetched_at": fetched_at,
+    }
+
+
+def _prices_key(region: str, item_id: str, locations: List[str]) -> str:
+    return f"prices:{region}:{item_id}:{','.join(sorted(locations))}"
+
+
+def _fetch_price_entries(
+    items: List[str], locations: List[str], region: str, notify: bool = True
+) -> Dict[str, Dict]:
+    """
+    Uma única chamada ao upstream para os itens pedidos (todas as qualidades);
+    devolve e grava no cache uma entrada por item. `notify=False` não avisa
+    os `price_listeners` (busca feita pelo próprio verificador de alertas).
+    """
+    base_url = settings.ALBION_BASE_URLS.get(
+        region, settings.ALBION_BASE_URLS["europe"]
+    )
+    # Ex.: https://europe.albion-online-data.com/api/v2/stats/prices
+    url = f"{base_url}/{','.join(items)}"
+    params = {"locations": ",".join(locations)}
+
+    data = _get_json(url, params, region)
+
+    by_item: Dict[str, List[Dict]] = {item_id: [] for item_id in items}
+    for d in data:
+        # filtra só entradas com preço mínimo > 0
+        if d.get("sell_price_min", 0) > 0:
+            by_item.setdefault(d["item_id"], []).append(_with_timestamps(d))
+
+    fetched_at = time.time()
+    entries = {}
+    for item_id, rows in by_item.items():
+        entry = _price_entry(rows, fetched_at)
+        key = _prices_key(region, item_id, locations)
+        prices_cache[key] = entry
+        stale_cache[key] = entry
+        entries[item_id] = entry
+
+    if notify:
+        _notify_price_listeners(
+            region, {item_id: entry["rows"] for item_id, entry in entries.items() if entry["rows"]}
+        )
+    return entries
+
+
+def _lookup_entry(region: str, item_id: str, locations: List[str]) -> Optional[Dict]:
+    """
+    Procura a entrada exata; se as cidades pedidas forem um subconjunto das
+    cidades padrão (as que o worker de ingestão espelha), deriva a entrada
+    filtrando a do espelho, sem ir ao upstream.
+    """
+    key = _prices_key(region, item_id, locations)
+    entry = prices_cache.get(key)
+    if entry is not None:
+        return entry
+
+    wanted = set(locations)
+    if not wanted < set(settings.DEFAULT_CITIES):
+        return None
+    mirror = prices_cache.get(_prices_key(region, item_id, settings.DEFAULT_CITIES))
+    if mirror is None:
+        return None
+
+    # não grava no cache: o TTLCache daria TTL novo a um dado derivado e ele
+    # sobreviveria à entrada do espelho de onde saiu
+    return _price_entry(
+        [d for d in mirror["rows"] if d["city"] in wanted], mirror["fetched_at"]
+    )
+
+
+def refresh_prices(
+    items: List[str],
+    region: str = settings.ALBION_REGION,
+    locations: Optional[List[str]] = None,
+    batch_size: int = 50,
+) -> int:
+    """
+    Busca (ignorando o cache) os itens em lotes e grava no cache por item.
+    Usado pelo worker de ingestão; retorna quantos itens foram atualizados.
+    """
+    locations = locations or settings.DEFAULT_CITIES
+    refreshed = 0
+    for i in range(0, len(items), batch_size):
+        batch = items[i:i + batch_size]
+        try:
+            refreshed += len(_fetch_price_entries(batch, locations, region))
+        except Exception as e:
+            print(f"[Albion] Erro refresh {region}: {e}")
+    return refreshed
+
+
+def get_prices_with_status(
+    items: List[str],
+    locations: Optional[List[str]] = None,
+    qualities: Optional[List[int]] = None,
+    region: str = settings.ALBION_REGION,
+    max_age: Optional[float] = None,
+    notify: bool = True,
+) -> Dict:
+    """
+    Igual a `get_prices`, mas devolve também o resumo por item e se o dado
+    está desatualizado.
+
+    `max_age` (segundos) descarta ofertas cuja `sell_price_min_date` é mais
+    antiga que isso; sem ele o resumo pré-calculado é usado direto.
+
+    `notify=False`: preços buscados no upstream não disparam os
+    `price_listeners` (o verificador de alertas já vai avaliar esses itens).
+
+    Retorno:
+    {"data": [...], "summary": {item_id: {...}}, "stale": bool,
+     "fetched_at": epoch | None, "unavailable": bool}.
+
+    O cache é por item, então pedidos diferentes que compartilham itens
+    reaproveitam as mesmas entradas e só os itens ausentes vão ao upstream.
+    """
+    locations = locations or settings.DEFAULT_CITIES
+
+    entries: Dict[str, Dict] = {}
+    missing: List[str] = []
+    for item_id in dict.fromkeys(items):
+        entry = _lookup_entry(region, item_id, locations)
+        if entry is None:
+            missing.append(item_id)
+        else:
+            entries[item_id] = entry
+
+    stale = False
+    unavailable = False
+    if missing:
+        try:
+            entries.update(_fetch_price_entries(missing, locations, region, notify))
+        except Exception as e:
+            print(f"[Albion] Erro prices: {e}")
+            for item_id in missing:
+                old = stale_cache.get(_prices_key(region, item_id, locations))
+                if old is not None:
+                    entries[item_id] = old
+                    stale = True
+            unavailable = not stale and not entries
+
+    quality_set = set(qualities or []) or ALL_QUALITIES
+    data: List[Dict] = []
+    if max_age is not None:
+        min_ts = time.time() - max_age
+        for entry in entries.values():
+            data.extend(
+                d for d in entry["rows"]
+                if d.get("quality") in quality_set and d["sell_price_min_ts"] >= min_ts
+            )
+        summary = summarize_rows(data)
+    elif quality_set >= ALL_QUALITIES:
+        # caminho comum: resumo já calculado no momento da inserção
+        summary = {}
+        for item_id, entry in entries.items():
+            data.extend(entry["rows"])
+            if entry["summary"] is not None:
+                summary[item_id] = entry["summary"]
+    else:
+        for entry in entries.values():
+            data.extend(d for d in entry["rows"] if d.get("quality") in quality_set)
+        summary = summarize_rows(data)
+
+    fetched = [e["fetched_at"] for e in entries.values() if e.get("fetched_at")]
+    return {
+        "data": data,
+        "summary": summary,
+        "stale": stale,
+        "fetched_at": min(fetched) if fetched else None,
+        "unavailable": unavailable,
+    }
+
 
 def get_prices(
     items: List[str],
     locations: Optional[List[str]] = None,
     qualities: Optional[List[int]] = None,
     region: str = settings.ALBION_REGION,
+    max_age: Optional[float] = None,
 ) -> List[Dict]:
     """
     Wrapper para o endpoint /stats/prices da Albion Data API.
     """
+    return get_prices_with_status(items, locations, qualities, region, max_age)["data"]
+
+
+def _format_history(data: List[Dict]) -> List[Dict]:
+    formatted: List[Dict] = []
+
+    # data = lista de cidades; cada uma tem "data": [pontos]
+    for item in data:
+        city = item.get("location")
+        series = item.get("data", [])
+        for point in series:
+            ts_raw = point.get("timestamp")
+            # timestamp vem em milissegundos (int ou string)
+            try:
+                ts_int = int(ts_raw)
+            except (TypeError, ValueError):
+                # fallback se vier em string de data
+                try:
+                    dt = datetime.fromisoformat(str(ts_raw))
+                    ts_int = int(dt.timestamp() * 1000)
+                except Exception:
+                    continue
+
+            avg_price = float(point.get("avg_price", 0) or 0)
+            item_count = int(point.get("item_count", 0) or 0)
+
+            # se absolutamente não tem nada, pula
+            if avg_price == 0 and item_count == 0:
+                continue
+
+            formatted.append(
+                {
+                    "timestamp": ts_int,
+                    "date": datetime.fromtimestamp(ts_int / 1000).isoformat(),
+                    "city": city,
+                    "avg_price": avg_price,
+                    "item_count": item_count,
+                }
+            )
+
+    formatted.sort(key=lambda x: x["timestamp"])
+    return formatted
+
+
+def get_price_history_with_status(
+    item_id: str,
+    locations: Optional[List[str]] = None,
+    days: int = 7,
+    time_resolution: str = "6h",
+    region: str = settings.ALBION_REGION,
+) -> Dict:
+    """
+    Igual a `get_price_history`, mas devolve {"data", "stale", "fetched_at"}.
+    """
     locations = locations or settings.DEFAULT_CITIES
 
-    base_url = settings.ALBION_BASE_URLS.get(
+    # monta uma chave de cache manual (tudo string)
+    cache_key = f"history:{item_id}:{','.join(locations)}:{days}:{time_resolution}:{region}"
+
+    base_prices_url = settings.ALBION_BASE_URLS.get(
         region, settings.ALBION_BASE_URLS["europe"]
     )
-    # Ex.: https://europe.albion-online-data.com/api/v2/stats/prices
-    url = f"{base_url}/{','.join(items)}"
+    # troca "/prices" por "/history" e adiciona .json
+    history_base = base_prices_url.replace("/prices", "/history")
+    url = f"{history_base}/{item_id}.json"
+
+    # Albion Data API usa "time-scale" em horas: 1, 6, 24
+    scale_map = {"1h": 1, "6h": 6, "24h": 24}
+    time_scale = scale_map.get(time_resolution, 6)
 
     params = {
         "locations": ",".join(locations),
-        "qualities": ",".join(map(str, qualities or [])) or None,
+        "time-scale": time_scale,
     }
-    params = {k: v for k, v in params.items() if v}
-
-    cache_key = f"prices:{','.join(items)}:{params.get('locations')}:{params.get('qualities')}"
-    if cache_key in prices_cache:
-        return prices_cache[cache_key]
-
-    try:
-        resp = session.get(url, params=params, timeout=settings.ALBION_API_TIMEOUT)
-        resp.raise_for_status()
-        data = resp.json()
 
-        # filtra só entradas com preço mínimo > 0
-        valid = [d for d in data if d.get("sell_price_min", 0) > 0]
-        prices_cache[cache_key] = valid
-        return valid
-    except Exception as e:
-        print(f"[Albion] Erro prices: {e}")
-        return []
+    return _cached_fetch(
+        history_cache, cache_key, url, params, region, _format_history, "history"
+    )
 
 
 def get_price_history(
@@ -93,78 +526,11 @@ def get_price_history(
       ...
     ]
     """
-    locations = locations or settings.DEFAULT_CITIES
-
-    # monta uma chave de cache manual (tudo string)
-    cache_key = f"history:{item_id}:{','.join(locations)}:{days}:{time_resolution}:{region}"
-    if cache_key in history_cache:
-        return history_cache[cache_key]
-
-    base_prices_url = settings.ALBION_BASE_URLS.get(
-        region, settings.ALBION_BASE_URLS["europe"]
-    )
-    # troca "/prices" por "/history" e adiciona .json
-    history_base = base_prices_url.replace("/prices", "/history")
-    url = f"{history_base}/{item_id}.json"
+    return get_price_history_with_status(
+        item_id, locations, days, time_resolution, region
+    )["data"]
 
-    # Albion Data API usa "time-scale" em horas: 1, 6, 24
-    scale_map = {"1h": 1, "6h": 6, "24h": 24}
-    time_scale = scale_map.get(time_resolution, 6)
-
-    params = {
-        "locations": ",".join(locations),
-        "time-scale": time_scale,
-    }
 
-    try:
-        resp = session.get(url, params=params, timeout=settings.ALBION_API_TIMEOUT)
-        resp.raise_for_status()
-        data = resp.json()
-
-        formatted: List[Dict] = []
-
-        # data = lista de cidades; cada uma tem "data": [pontos]
-        for item in data:
-            city = item.get("location")
-            series = item.get("data", [])
-            for point in series:
-                ts_raw = point.get("timestamp")
-                # timestamp vem em milissegundos (int ou string)
-                try:
-                    ts_int = int(ts_raw)
-                except (TypeError, ValueError):
-                    # fallback se vier em string de data
-                    try:
-                        dt = datetime.fromisoformat(str(ts_raw))
-                        ts_int = int(dt.timestamp() * 1000)
-                    except Exception:
-                        continue
-
-                avg_price = float(point.get("avg_price", 0) or 0)
-                item_count = int(point.get("item_count", 0) or 0)
-
-                # se absolutamente não tem nada, pula
-                if avg_price == 0 and item_count == 0:
-                    continue
-
-                formatted.append(
-                    {
-                        "timestamp": ts_int,
-                        "date": datetime.fromtimestamp(ts_int / 1000).isoformat(),
-                        "city": city,
-                        "avg_price": avg_price,
-                        "item_count": item_count,
-                    }
-                )
-
-        formatted.sort(key=lambda x: x["timestamp"])
-
-        # guarda no cache
-        history_cache[cache_key] = formatted
-        return formatted
-    except Exception as e:
-        print(f"[Albion] Erro history: {e}")
-        return []
 def get_gold_prices(
     count: int = 1,
     region: str = settings.ALBION_REGION,
@@ -182,16 +548,6 @@ def get_gold_prices(
     params = {"count": count}
     cache_key = f"gold:{count}:{region}"
 
-    if cache_key in prices_cache:
-        return prices_cache[cache_key]
-
-    try:
-        resp = session.get(gold_url, params=params, timeout=settings.ALBION_API_TIMEOUT)
-        resp.raise_for_status()
-        data = resp.json()
-        
-        prices_cache[cache_key] = data
-        return data
-    except Exception as e:
-        print(f"[Albion] Erro gold: {e}")
-        return []
+    return _cached_fetch(
+        prices_cache, cache_key, gold_url, params, region, lambda d: d, "gold"
+    )["data"]
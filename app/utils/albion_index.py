@@ -1,7 +1,8 @@
 # app/utils/albion_index.py
 import json
+import threading
 import unicodedata
-from typing import Dict, List, Literal
+from typing import Dict, List, Literal, Optional, Tuple
 
 Lang = Literal["pt_br", "en_us"]
 
@@ -15,10 +16,20 @@ def normalizar(texto: str) -> str:
     return texto.strip()
 
 
-# Índices separados por idioma
+# Índices separados por idioma (preenchidos por `carregar_indices`)
 NAME_INDEX_EXACT: Dict[Lang, Dict[str, List[dict]]] = {"pt_br": {}, "en_us": {}}
 ITEM_BY_UNIQUE: Dict[str, dict] = {}
 
+# Lista combinada com os campos PT e EN preenchidos
+ALBION_ITEMS: List[dict] = []
+
+# (nome normalizado, item) por idioma, para a busca aproximada não
+# normalizar o catálogo inteiro a cada consulta
+_NOMES_NORMALIZADOS: Dict[Lang, List[Tuple[str, dict]]] = {"pt_br": [], "en_us": []}
+
+_carregado = False
+_carregar_lock = threading.Lock()
+
 
 def _registrar_itens(caminho: str, lang: Lang):
     nome_campo = "PT-BR" if lang == "pt_br" else "EN-US"
@@ -39,16 +50,35 @@ def _registrar_itens(caminho: str, lang: Lang):
         NAME_INDEX_EXACT[lang].setdefault(chave, []).append(registro)
 
 
-_registrar_itens("nomes_pt_br.json", "pt_br")
-_registrar_itens("nomes_en_us.json", "en_us")
-
-# Lista combinada com os campos PT e EN preenchidos
-ALBION_ITEMS = list(ITEM_BY_UNIQUE.values())
-
-print(
-    f"[Albion] Índices carregados: {len(NAME_INDEX_EXACT['pt_br'])} chaves PT "
-    f"e {len(NAME_INDEX_EXACT['en_us'])} chaves EN"
-)
+def carregar_indices() -> None:
+    """
+    Lê os catálogos na primeira busca, não no import: o cold start em
+    serverless não paga pelos JSONs se a requisição não buscar item.
+    """
+    global _carregado
+    if _carregado:
+        return
+    with _carregar_lock:
+        if _carregado:
+            return
+        _registrar_itens("nomes_pt_br.json", "pt_br")
+        _registrar_itens("nomes_en_us.json", "en_us")
+        ALBION_ITEMS.extend(ITEM_BY_UNIQUE.values())
+        for lang, campo in (("pt_br", "PT-BR"), ("en_us", "EN-US")):
+            _NOMES_NORMALIZADOS[lang] = [
+                (normalizar(item.get(campo, "")), item) for item in ALBION_ITEMS
+            ]
+        _carregado = True
+
+    print(
+        f"[Albion] Índices carregados: {len(NAME_INDEX_EXACT['pt_br'])} chaves PT "
+        f"e {len(NAME_INDEX_EXACT['en_us'])} chaves EN"
+    )
+
+
+def eh_unique_name(nome: str) -> bool:
+    """Já está no formato do jogo (T4_BAG, T5_CAPE@1)? Nomes humanos não têm "_"."""
+    return nome.upper().startswith("T") and "_" in nome
 
 
 def buscar_item_por_nome(query: str, lang: Lang = "pt_br") -> List[dict]:
@@ -59,6 +89,7 @@ def buscar_item_por_nome(query: str, lang: Lang = "pt_br") -> List[dict]:
     if not query:
         return []
 
+    carregar_indices()
     lang = "pt_br" if lang not in ("pt_br", "en_us") else lang
     chave = normalizar(query)
 
@@ -80,8 +111,7 @@ def buscar_item_por_nome(query: str, lang: Lang = "pt_br") -> List[dict]:
     # Fallback aproximado
     palavras = [p for p in chave.split() if len(p) >= 2]
     candidatos = []
-    for item in ALBION_ITEMS:
-        nome = normalizar(item.get("PT-BR" if lang == "pt_br" else "EN-US", ""))
+    for nome, item in _NOMES_NORMALIZADOS[lang]:
         score = 0
 
         if chave in nome:
@@ -100,6 +130,23 @@ def buscar_item_por_nome(query: str, lang: Lang = "pt_br") -> List[dict]:
     return candidatos[:10]
 
 
+def resolver_unique_name(nome: str, lang: Lang = "pt_br") -> Optional[str]:
+    """
+    UniqueName de um nome qualquer (UniqueName, PT-BR ou EN-US): o melhor
+    candidato do índice no idioma pedido, caindo para EN-US. None se não achar.
+    """
+    nome = (nome or "").strip()
+    if not nome:
+        return None
+    if eh_unique_name(nome):
+        return nome.upper()
+
+    candidatos = buscar_item_por_nome(nome, lang)
+    if not candidatos and lang == "pt_br":
+        candidatos = buscar_item_por_nome(nome, "en_us")
+    return candidatos[0]["UniqueName"] if candidatos else None
+
+
 def buscar_item_por_nome_pt(query: str) -> List[dict]:
     return buscar_item_por_nome(query, "pt_br")
 
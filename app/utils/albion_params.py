@@ -0,0 +1,23 @@
+# app/utils/albion_params.py
+"""Parâmetros de consulta comuns às rotas que buscam preços na Albion Data."""
+from typing import Optional
+
+from fastapi import HTTPException
+
+REGIONS = [
+    {"id": "europe", "label": "Europe", "flag": "🌍", "host": "europe.albion-online-data.com"},
+    {"id": "west",   "label": "Americas", "flag": "🌎", "host": "west.albion-online-data.com"},
+    {"id": "east",   "label": "Asia",     "flag": "🌏", "host": "east.albion-online-data.com"},
+]
+
+
+def validate_region(region: str) -> str:
+    valid = [r["id"] for r in REGIONS]
+    if region not in valid:
+        raise HTTPException(400, f"Região inválida. Use: {', '.join(valid)}")
+    return region
+
+
+def max_age_seconds(max_age_hours: Optional[float]) -> Optional[float]:
+    """`max_age_hours` da query -> `max_age` do cliente (None = idade padrão do cache)."""
+    return max_age_hours * 3600 if max_age_hours else None
@@ -0,0 +1,72 @@
+# app/utils/circuit_breaker.py
+import threading
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """Levantado quando o circuito está aberto e a chamada nem é tentada."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples (closed -> open -> half_open -> closed).
+
+    - closed: requisições passam; falhas consecutivas são contadas.
+    - open: após `failure_threshold` falhas seguidas, bloqueia chamadas
+      por `reset_timeout` segundos.
+    - half_open: depois do timeout deixa UMA chamada de teste passar;
+      sucesso fecha o circuito, falha reabre.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._state_locked()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                # reabre (ou abre pela primeira vez) reiniciando a janela
+                self._opened_at = time.monotonic()
+
+    def reset(self) -> None:
+        self.record_success()
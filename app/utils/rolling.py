@@ -0,0 +1,118 @@
+# app/utils/rolling.py
+"""
+Estimadores incrementais para séries de preço.
+
+- RollingMedian: mediana de janela deslizante (por tempo) com dois heaps e
+  remoção preguiçosa; inserir/remover custa O(log n).
+- Ewma: média móvel exponencial, O(1) por ponto.
+"""
+import heapq
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class RollingMedian:
+    """
+    Mediana dos pontos com timestamp dentro de `window` (mesma unidade dos
+    timestamps). Os pontos devem chegar em ordem crescente de timestamp.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._points: Deque[Tuple[float, float]] = deque()
+        self._low: List[float] = []   # max-heap (valores negados)
+        self._high: List[float] = []  # min-heap
+        self._low_size = 0            # tamanhos sem contar removidos pendentes
+        self._high_size = 0
+        self._delayed: Dict[float, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    @property
+    def last_ts(self) -> Optional[float]:
+        return self._points[-1][0] if self._points else None
+
+    def points(self) -> List[Tuple[float, float]]:
+        return list(self._points)
+
+    def add(self, ts: float, value: float) -> None:
+        self._points.append((ts, value))
+        if not self._low or value <= -self._low[0]:
+            heapq.heappush(self._low, -value)
+            self._low_size += 1
+        else:
+            heapq.heappush(self._high, value)
+            self._high_size += 1
+        self._rebalance()
+        self.evict_before(ts - self.window)
+
+    def median(self) -> Optional[float]:
+        if not self._points:
+            return None
+        if self._low_size > self._high_size:
+            return float(-self._low[0])
+        return (-self._low[0] + self._high[0]) / 2.0
+
+    def evict_before(self, min_ts: float) -> None:
+        """Remove os pontos com timestamp menor que `min_ts`."""
+        while self._points and self._points[0][0] < min_ts:
+            _, value = self._points.popleft()
+            self._delayed[value] = self._delayed.get(value, 0) + 1
+            if self._low and value <= -self._low[0]:
+                self._low_size -= 1
+                if value == -self._low[0]:
+                    self._prune(self._low, negate=True)
+            else:
+                self._high_size -= 1
+                if self._high and value == self._high[0]:
+                    self._prune(self._high, negate=False)
+            self._rebalance()
+
+    def _prune(self, heap: List[float], negate: bool) -> None:
+        """Descarta do topo os valores marcados como removidos."""
+        while heap:
+            value = -heap[0] if negate else heap[0]
+            count = self._delayed.get(value, 0)
+            if not count:
+                break
+            if count == 1:
+                del self._delayed[value]
+            else:
+                self._delayed[value] = count - 1
+            heapq.heappop(heap)
+
+    def _rebalance(self) -> None:
+        # invariante: low tem o mesmo tamanho de high ou um a mais
+        if self._low_size > self._high_size + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+            self._low_size -= 1
+            self._high_size += 1
+            self._prune(self._low, negate=True)
+        elif self._low_size < self._high_size:
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+            self._high_size -= 1
+            self._low_size += 1
+            self._prune(self._high, negate=False)
+
+
+class Ewma:
+    """Média móvel exponencial com `alpha` fixo."""
+
+    def __init__(self, alpha: float, value: Optional[float] = None, count: int = 0):
+        self.alpha = alpha
+        self.value = value
+        self.count = count
+
+    @classmethod
+    def for_span(cls, span: int, **kwargs) -> "Ewma":
+        """alpha equivalente a uma média de `span` pontos (2 / (span + 1))."""
+        return cls(2.0 / (max(1, span) + 1), **kwargs)
+
+    def update(self, value: float) -> float:
+        if self.value is None:
+            self.value = float(value)
+        else:
+            self.value += self.alpha * (value - self.value)
+        self.count += 1
+        return self.value
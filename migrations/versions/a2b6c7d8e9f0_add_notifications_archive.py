@@ -0,0 +1,45 @@
+"""add_notifications_archive
+
+Revision ID: a2b6c7d8e9f0
+Revises: f1a5b6c7d8e9
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2b6c7d8e9f0'
+down_revision: Union[str, Sequence[str], None] = 'f1a5b6c7d8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Cria a tabela de arquivo das notificações."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "user_notifications_archive" not in inspector.get_table_names():
+        op.create_table(
+            "user_notifications_archive",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, nullable=False, index=True),
+            sa.Column("title", sa.String, nullable=False),
+            sa.Column("body", sa.String, nullable=False),
+            sa.Column("is_read", sa.Boolean, nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    """Remove a tabela de arquivo."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "user_notifications_archive" in inspector.get_table_names():
+        op.drop_table("user_notifications_archive")
@@ -0,0 +1,38 @@
+"""add_notification_alert_id
+
+Revision ID: a9c3d4e5f6a7
+Revises: f7a1b2c3d4e5
+Create Date: 2026-10-20 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c3d4e5f6a7'
+down_revision: Union[str, Sequence[str], None] = 'f7a1b2c3d4e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Alerta de origem da notificação (chave da compactação de repetidas)."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("user_notifications")]
+
+    if "alert_id" not in columns:
+        op.add_column("user_notifications", sa.Column("alert_id", sa.Integer, nullable=True))
+
+
+def downgrade() -> None:
+    """Remove o alerta de origem."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("user_notifications")]
+
+    if "alert_id" in columns:
+        op.drop_column("user_notifications", "alert_id")
@@ -0,0 +1,51 @@
+"""add_hot_path_indexes
+
+Revision ID: b3c7d8e9f0a1
+Revises: a2b6c7d8e9f0
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3c7d8e9f0a1'
+down_revision: Union[str, Sequence[str], None] = 'a2b6c7d8e9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# mesma expressão do modelo: o índice parcial só é usado se o WHERE bater
+ACTIVE = sa.column("is_active").is_(True)
+
+INDEXES = [
+    ("ix_user_items_user_id_item_name", "user_items", ["user_id", "item_name"], {}),
+    ("ix_price_alerts_active_id", "price_alerts", ["id"],
+     {"postgresql_where": ACTIVE, "sqlite_where": ACTIVE}),
+    ("ix_user_notifications_user_id_is_read_id", "user_notifications",
+     ["user_id", "is_read", "id"], {}),
+]
+
+
+def upgrade() -> None:
+    """Índices dos caminhos quentes: watchlist, checker e notificações."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    for name, table, columns, kwargs in INDEXES:
+        existing = [i["name"] for i in inspector.get_indexes(table)]
+        if name not in existing:
+            op.create_index(name, table, columns, **kwargs)
+
+
+def downgrade() -> None:
+    """Remove os índices."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    for name, table, _, _ in INDEXES:
+        existing = [i["name"] for i in inspector.get_indexes(table)]
+        if name in existing:
+            op.drop_index(name, table_name=table)
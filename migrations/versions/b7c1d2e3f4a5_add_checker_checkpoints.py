@@ -0,0 +1,45 @@
+"""add_checker_checkpoints
+
+Revision ID: b7c1d2e3f4a5
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c1d2e3f4a5'
+down_revision: Union[str, Sequence[str], None] = 'a1b2c3d4e5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Cria a tabela de checkpoint do verificador de alertas."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "checker_checkpoints" not in inspector.get_table_names():
+        op.create_table(
+            "checker_checkpoints",
+            sa.Column("name", sa.String, primary_key=True),
+            sa.Column("last_alert_id", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("checked", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("triggered", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    """Remove a tabela de checkpoint."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "checker_checkpoints" in inspector.get_table_names():
+        op.drop_table("checker_checkpoints")
@@ -0,0 +1,44 @@
+"""add_user_items_unresolved
+
+Revision ID: c4d8e9f0a1b2
+Revises: b3c7d8e9f0a1
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8e9f0a1b2'
+down_revision: Union[str, Sequence[str], None] = 'b3c7d8e9f0a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Marca itens da watchlist com nome legado não resolvido. O backfill dos
+    nomes roda à parte: `python -m app.services.watchlist_canonical`.
+    """
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("user_items")]
+
+    if "unresolved" not in columns:
+        op.add_column(
+            "user_items",
+            sa.Column("unresolved", sa.Boolean, nullable=False, server_default=sa.false()),
+        )
+
+
+def downgrade() -> None:
+    """Remove a marcação de nome não resolvido."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("user_items")]
+
+    if "unresolved" in columns:
+        op.drop_column("user_items", "unresolved")
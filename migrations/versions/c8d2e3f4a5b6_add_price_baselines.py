@@ -0,0 +1,47 @@
+"""add_price_baselines
+
+Revision ID: c8d2e3f4a5b6
+Revises: b7c1d2e3f4a5
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8d2e3f4a5b6'
+down_revision: Union[str, Sequence[str], None] = 'b7c1d2e3f4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Cria a tabela de estado dos baselines incrementais."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "price_baselines" not in inspector.get_table_names():
+        op.create_table(
+            "price_baselines",
+            sa.Column("key", sa.String, primary_key=True),
+            sa.Column("item_id", sa.String, nullable=False),
+            sa.Column("points", sa.Text, nullable=False, server_default="[]"),
+            sa.Column("ewma", sa.Float, nullable=True),
+            sa.Column("ewma_count", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("last_ts", sa.BigInteger, nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_price_baselines_item_id", "price_baselines", ["item_id"])
+
+
+def downgrade() -> None:
+    """Remove a tabela de baselines."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "price_baselines" in inspector.get_table_names():
+        op.drop_index("ix_price_baselines_item_id", table_name="price_baselines")
+        op.drop_table("price_baselines")
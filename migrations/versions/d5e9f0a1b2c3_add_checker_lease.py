@@ -0,0 +1,44 @@
+"""add_checker_lease
+
+Revision ID: d5e9f0a1b2c3
+Revises: c4d8e9f0a1b2
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e9f0a1b2c3'
+down_revision: Union[str, Sequence[str], None] = 'c4d8e9f0a1b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Lease do checkpoint: impede duas execuções do verificador ao mesmo tempo."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("checker_checkpoints")]
+
+    if "lease_owner" not in columns:
+        op.add_column("checker_checkpoints", sa.Column("lease_owner", sa.String, nullable=True))
+    if "lease_expires_at" not in columns:
+        op.add_column(
+            "checker_checkpoints",
+            sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    """Remove o lease do checkpoint."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("checker_checkpoints")]
+
+    for column in ("lease_expires_at", "lease_owner"):
+        if column in columns:
+            op.drop_column("checker_checkpoints", column)
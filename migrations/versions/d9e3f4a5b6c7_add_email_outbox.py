@@ -0,0 +1,52 @@
+"""add_email_outbox
+
+Revision ID: d9e3f4a5b6c7
+Revises: c8d2e3f4a5b6
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9e3f4a5b6c7'
+down_revision: Union[str, Sequence[str], None] = 'c8d2e3f4a5b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Cria a fila de e-mails de saída."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "email_outbox" not in inspector.get_table_names():
+        op.create_table(
+            "email_outbox",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("dedup_key", sa.String, nullable=False, unique=True),
+            sa.Column("to_email", sa.String, nullable=False),
+            sa.Column("subject", sa.String, nullable=False),
+            sa.Column("text", sa.Text, nullable=False),
+            sa.Column("html", sa.Text, nullable=True),
+            sa.Column("status", sa.String, nullable=False, server_default="pending"),
+            sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("last_error", sa.String, nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_email_outbox_status", "email_outbox", ["status"])
+
+
+def downgrade() -> None:
+    """Remove a fila de e-mails."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "email_outbox" in inspector.get_table_names():
+        op.drop_index("ix_email_outbox_status", table_name="email_outbox")
+        op.drop_table("email_outbox")
@@ -0,0 +1,41 @@
+"""add_user_alert_digest
+
+Revision ID: e0f4a5b6c7d8
+Revises: d9e3f4a5b6c7
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e0f4a5b6c7d8'
+down_revision: Union[str, Sequence[str], None] = 'd9e3f4a5b6c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Adiciona a preferência de resumo (digest) de alertas ao usuário."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("users")]
+
+    if "alert_digest_enabled" not in columns:
+        op.add_column(
+            "users",
+            sa.Column("alert_digest_enabled", sa.Boolean, nullable=False, server_default=sa.true()),
+        )
+
+
+def downgrade() -> None:
+    """Remove a preferência de digest."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("users")]
+
+    if "alert_digest_enabled" in columns:
+        op.drop_column("users", "alert_digest_enabled")
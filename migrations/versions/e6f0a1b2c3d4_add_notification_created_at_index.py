@@ -0,0 +1,38 @@
+"""add_notification_created_at_index
+
+Revision ID: e6f0a1b2c3d4
+Revises: d5e9f0a1b2c3
+Create Date: 2026-10-20 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f0a1b2c3d4'
+down_revision: Union[str, Sequence[str], None] = 'd5e9f0a1b2c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Índice em created_at: a compactação parte só das notificações recentes."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = [i["name"] for i in inspector.get_indexes("user_notifications")]
+
+    if "ix_user_notifications_created_at" not in existing:
+        op.create_index("ix_user_notifications_created_at", "user_notifications", ["created_at"])
+
+
+def downgrade() -> None:
+    """Remove o índice."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = [i["name"] for i in inspector.get_indexes("user_notifications")]
+
+    if "ix_user_notifications_created_at" in existing:
+        op.drop_index("ix_user_notifications_created_at", table_name="user_notifications")
@@ -0,0 +1,60 @@
+"""notification_pagination_and_unread
+
+Revision ID: f1a5b6c7d8e9
+Revises: e0f4a5b6c7d8
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a5b6c7d8e9'
+down_revision: Union[str, Sequence[str], None] = 'e0f4a5b6c7d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "ix_user_notifications_user_id_id"
+
+
+def upgrade() -> None:
+    """Índice (user_id, id) para paginação e contador de não lidas no usuário."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    indexes = [i["name"] for i in inspector.get_indexes("user_notifications")]
+    if INDEX_NAME not in indexes:
+        op.create_index(INDEX_NAME, "user_notifications", ["user_id", "id"])
+
+    columns = [c["name"] for c in inspector.get_columns("users")]
+    if "unread_notifications" not in columns:
+        op.add_column(
+            "users",
+            sa.Column("unread_notifications", sa.Integer, nullable=False, server_default="0"),
+        )
+        # backfill do contador com o estado atual
+        op.execute(
+            """
+            UPDATE users SET unread_notifications = (
+                SELECT COUNT(*) FROM user_notifications n
+                WHERE n.user_id = users.id AND COALESCE(n.is_read, false) = false
+            )
+            """
+        )
+
+
+def downgrade() -> None:
+    """Remove o contador e o índice."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = [c["name"] for c in inspector.get_columns("users")]
+    if "unread_notifications" in columns:
+        op.drop_column("users", "unread_notifications")
+
+    indexes = [i["name"] for i in inspector.get_indexes("user_notifications")]
+    if INDEX_NAME in indexes:
+        op.drop_index(INDEX_NAME, table_name="user_notifications")
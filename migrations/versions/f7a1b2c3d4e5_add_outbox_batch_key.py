@@ -0,0 +1,40 @@
+"""add_outbox_batch_key
+
+Revision ID: f7a1b2c3d4e5
+Revises: e6f0a1b2c3d4
+Create Date: 2026-10-20 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a1b2c3d4e5'
+down_revision: Union[str, Sequence[str], None] = 'e6f0a1b2c3d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Idempotency-Key do lote do Resend, reaproveitada nas retentativas."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("email_outbox")]
+
+    if "batch_key" not in columns:
+        op.add_column("email_outbox", sa.Column("batch_key", sa.String, nullable=True))
+        op.create_index("ix_email_outbox_batch_key", "email_outbox", ["batch_key"])
+
+
+def downgrade() -> None:
+    """Remove a chave do lote."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("email_outbox")]
+
+    if "batch_key" in columns:
+        op.drop_index("ix_email_outbox_batch_key", table_name="email_outbox")
+        op.drop_column("email_outbox", "batch_key")
@@ -2,11 +2,12 @@ import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 from app.main import app
-from app.database import Base, get_db
+from app.database import Base, get_async_db, get_db
 from app.core.limiter import limiter
 
 # Desativa o rate limiter durante os testes para evitar 429
@@ -15,18 +16,22 @@ os.environ["TESTING"] = "true"
 
 
 @pytest.fixture(scope="function")
-def test_engine():
+def test_engine(tmp_path):
     """
-    ✅ CORRIGIDO: Usa SQLite :memory: com StaticPool para compartilhar conexão
-    Múltiplas sessions usam a MESMA conexão (sem isolamento)
+    SQLite em arquivo temporário (WAL), compartilhado com o engine assíncrono
+    das rotas async. StaticPool: as sessions síncronas usam a MESMA conexão.
     """
     engine = create_engine(
-        "sqlite:///:memory:",
+        f"sqlite:///{tmp_path / 'test.db'}",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,  # ← Compartilha a mesma conexão!
         echo=False
     )
-    
+
+    @event.listens_for(engine, "connect")
+    def _wal(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
     # Cria todas as tabelas
     Base.metadata.create_all(bind=engine)
     
@@ -36,6 +41,18 @@ def test_engine():
     engine.dispose()
 
 
+@pytest.fixture(scope="function")
+def async_test_engine(test_engine):
+    """
+    Engine aiosqlite no mesmo arquivo. NullPool: cada sessão abre e fecha a
+    própria conexão no event loop da requisição (o TestClient troca de loop).
+    """
+    return create_async_engine(
+        test_engine.url.set(drivername="sqlite+aiosqlite"),
+        poolclass=NullPool,
+    )
+
+
 @pytest.fixture(scope="function")
 def session_local(test_engine):
     """
@@ -60,7 +77,7 @@ def db(session_local):
 
 
 @pytest.fixture(scope="function")
-def client(session_local):
+def client(session_local, async_test_engine):
     """
     Cliente HTTP para fazer requisições nos testes.
     ✅ CORRIGIDO: Override get_db usa a mesma session_local
@@ -71,8 +88,17 @@ def client(session_local):
             yield db
         finally:
             db.close()
-    
+
+    async_session_local = async_sessionmaker(
+        bind=async_test_engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def override_get_async_db():
+        async with async_session_local() as db:
+            yield db
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     
     with TestClient(app) as test_client:
         yield test_client
@@ -93,7 +119,64 @@ def reset_limiter():
     limiter.enabled = False
 
 
+@pytest.fixture(autouse=True)
+def clean_albion_client():
+    """Zera caches e circuit breakers do cliente da Albion entre os testes."""
+    from app.utils import albion_client
+
+    def _clear():
+        albion_client.prices_cache.clear()
+        albion_client.history_cache.clear()
+        albion_client.stale_cache.clear()
+        albion_client.breakers.clear()
+
+    _clear()
+    yield
+    _clear()
+
+
+@pytest.fixture(autouse=True)
+def clean_baselines(monkeypatch, session_local):
+    """Baselines da IA sem memo entre testes e persistidos no banco de teste."""
+    from app.services import baselines
+
+    monkeypatch.setattr(baselines, "SessionLocal", session_local)
+    baselines.baseline_cache.clear()
+    baselines._states.clear()
+    yield
+    baselines.baseline_cache.clear()
+    baselines._states.clear()
+
+
+@pytest.fixture(autouse=True)
+def clean_principal_cache():
+    """Cada teste cria o banco do zero: ids em cache de outro teste não valem."""
+    from app.dependencies import principal_cache
+
+    principal_cache.clear()
+    yield
+    principal_cache.clear()
+
+
 @pytest.fixture(scope="session")
 def anyio_backend():
     """Config para async tests (se usar pytest-asyncio)."""
-    return "asyncio"
\ No newline at end of file
+    return "asyncio"
+
+@pytest.fixture(scope="function")
+def auth_header(db):
+    """Cria um usuário verificado e devolve o header Authorization com o JWT."""
+    from app.models import User
+    from app.core.security import get_password_hash, create_access_token
+
+    user = User(
+        username="fixtureuser",
+        email="fixture@example.com",
+        hashed_password=get_password_hash("senha123"),
+        is_verified=True,
+    )
+    db.add(user)
+    db.commit()
+
+    access_token = create_access_token({"sub": user.username})
+    return {"Authorization": f"Bearer {access_token}"}
@@ -0,0 +1,191 @@
+import pytest
+import requests
+from datetime import datetime, timedelta, timezone
+
+from app.utils import albion_client
+from app.utils.circuit_breaker import CircuitBreaker
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+    def json(self):
+        return self._payload
+
+
+ROW = {
+    "item_id": "T4_BAG",
+    "city": "Caerleon",
+    "quality": 1,
+    "sell_price_min": 1500,
+    "sell_price_min_date": "2024-01-15T10:30:00",
+}
+
+
+def test_fallback_to_stale_when_upstream_fails(monkeypatch):
+    """Se a API cair, devolve o último valor conhecido marcado como stale."""
+    monkeypatch.setattr(albion_client.session, "get", lambda *a, **k: FakeResponse([ROW]))
+    fresh = albion_client.get_prices_with_status(["T4_BAG"], region="europe")
+    assert fresh["stale"] is False
+    assert fresh["data"][0]["sell_price_min"] == 1500
+
+    def boom(*args, **kwargs):
+        raise requests.ConnectionError("upstream fora")
+
+    albion_client.prices_cache.clear()  # simula TTL expirado
+    monkeypatch.setattr(albion_client.session, "get", boom)
+
+    result = albion_client.get_prices_with_status(["T4_BAG"], region="europe")
+    assert result["stale"] is True
+    assert result["unavailable"] is False
+    assert result["data"][0]["sell_price_min"] == 1500
+
+
+def test_unavailable_without_fallback(monkeypatch):
+    def boom(*args, **kwargs):
+        raise requests.ConnectionError("upstream fora")
+
+    monkeypatch.setattr(albion_client.session, "get", boom)
+    result = albion_client.get_prices_with_status(["T4_BAG"], region="europe")
+    assert result["data"] == []
+    assert result["unavailable"] is True
+
+
+def test_circuit_opens_per_region(monkeypatch):
+    """Depois de N falhas a região para de receber requisições; as outras não."""
+    monkeypatch.setattr(albion_client.settings, "ALBION_CIRCUIT_FAILURES", 2)
+    calls = []
+
+    def boom(url, *args, **kwargs):
+        calls.append(url)
+        raise requests.ConnectionError("upstream fora")
+
+    monkeypatch.setattr(albion_client.session, "get", boom)
+
+    for i in range(5):
+        albion_client.get_prices_with_status([f"T4_BAG@{i}"], region="europe")
+    assert len(calls) == 2
+    assert albion_client.breakers["europe"].state == CircuitBreaker.OPEN
+
+    albion_client.get_prices_with_status(["T4_BAG"], region="west")
+    assert len(calls) == 3
+
+
+def test_client_errors_do_not_open_circuit(monkeypatch):
+    monkeypatch.setattr(albion_client.settings, "ALBION_CIRCUIT_FAILURES", 1)
+    monkeypatch.setattr(albion_client.session, "get", lambda *a, **k: FakeResponse({}, 404))
+
+    albion_client.get_prices_with_status(["NAO_EXISTE"], region="europe")
+    assert albion_client.breakers["europe"].state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_single_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_session_retries_idempotent_gets():
+    adapter = albion_client.session.get_adapter("https://europe.albion-online-data.com")
+    retry = adapter.max_retries
+    assert retry.total == albion_client.settings.ALBION_API_RETRIES
+    assert "GET" in retry.allowed_methods
+    assert 503 in retry.status_forcelist
+
+
+def test_per_item_cache_and_precomputed_summary(monkeypatch):
+    """Cada item vira uma entrada de cache com o resumo pronto; só itens novos vão ao upstream."""
+    rows = [
+        {**ROW, "city": "Martlock", "sell_price_min": 1800, "buy_price_max": 1400},
+        {**ROW, "city": "Caerleon", "sell_price_min": 1500, "buy_price_max": 1100},
+        {**ROW, "item_id": "T5_BAG", "sell_price_min": 9000, "quality": 2},
+    ]
+    calls = []
+
+    def fake_get(url, *args, **kwargs):
+        calls.append(url)
+        requested = url.rsplit("/", 1)[-1].split(",")
+        return FakeResponse([r for r in rows if r["item_id"] in requested])
+
+    monkeypatch.setattr(albion_client.session, "get", fake_get)
+
+    result = albion_client.get_prices_with_status(["T4_BAG", "T5_BAG"], region="europe")
+    summary = result["summary"]["T4_BAG"]
+    assert summary["price"] == 1500 and summary["city"] == "Caerleon"
+    assert summary["buy_price_max"] == 1400 and summary["buy_city"] == "Martlock"
+
+    # pedido diferente reaproveita as entradas por item, sem nova chamada
+    albion_client.get_prices_with_status(["T5_BAG"], region="europe")
+    assert len(calls) == 1
+
+    # filtro de qualidade recalcula o resumo só sobre as linhas filtradas
+    filtered = albion_client.get_prices_with_status(["T4_BAG", "T5_BAG"], qualities=[2], region="europe")
+    assert list(filtered["summary"]) == ["T5_BAG"]
+    assert len(calls) == 1
+
+
+def test_dates_parsed_once_and_max_age_filters(monkeypatch):
+    """As datas viram epoch na ingestão; max_age descarta ofertas velhas."""
+    now = datetime.now(timezone.utc)
+    fresh_date = (now - timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M:%S")
+    old_date = (now - timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%S")
+    rows = [
+        {**ROW, "city": "Martlock", "sell_price_min": 900, "sell_price_min_date": old_date},
+        {**ROW, "city": "Caerleon", "sell_price_min": 1000, "sell_price_min_date": fresh_date},
+    ]
+    monkeypatch.setattr(albion_client.session, "get", lambda *a, **k: FakeResponse(rows))
+
+    result = albion_client.get_prices_with_status(["T4_BAG"], region="europe")
+    assert all(isinstance(d["sell_price_min_ts"], int) for d in result["data"])
+    # preço de 3 dias atrás perde para um pouco mais caro porém recente
+    assert result["summary"]["T4_BAG"]["city"] == "Caerleon"
+
+    recent = albion_client.get_prices_with_status(["T4_BAG"], region="europe", max_age=3600)
+    assert [d["city"] for d in recent["data"]] == ["Caerleon"]
+
+
+def test_parse_albion_date_handles_missing_values():
+    assert albion_client.parse_albion_date("0001-01-01T00:00:00") == 0
+    assert albion_client.parse_albion_date(None) == 0
+    assert albion_client.parse_albion_date("2024-01-15T10:30:00") == 1705314600
+
+
+def test_city_subset_served_from_mirror(monkeypatch):
+    """Pedido por uma cidade padrão é derivado do espelho, sem ir ao upstream."""
+    rows = [
+        {**ROW, "city": "Martlock", "sell_price_min": 1800},
+        {**ROW, "city": "Caerleon", "sell_price_min": 1500},
+    ]
+    calls = []
+
+    def fake_get(url, *args, **kwargs):
+        calls.append(url)
+        return FakeResponse(rows)
+
+    monkeypatch.setattr(albion_client.session, "get", fake_get)
+
+    assert albion_client.refresh_prices(["T4_BAG"], region="europe") == 1
+    result = albion_client.get_prices_with_status(["T4_BAG"], ["Martlock"], region="europe")
+    assert [d["city"] for d in result["data"]] == ["Martlock"]
+    assert result["summary"]["T4_BAG"]["price"] == 1800
+    assert len(calls) == 1
+
+
+def test_city_subset_does_not_outlive_mirror(monkeypatch):
+    """O recorte derivado não fica no cache: expira junto com o espelho."""
+    monkeypatch.setattr(albion_client.session, "get", lambda *a, **k: FakeResponse([ROW]))
+    albion_client.refresh_prices(["T4_BAG"], region="europe")
+
+    albion_client.get_prices_with_status(["T4_BAG"], ["Caerleon"], region="europe")
+    subset_key = albion_client._prices_key("europe", "T4_BAG", ["Caerleon"])
+    assert subset_key not in albion_client.prices_cache
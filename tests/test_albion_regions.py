@@ -52,3 +52,40 @@ def test_prices_with_region(client):
         # Se não logar, pelo menos garantimos que sem auth dá 401
         response = client.get("/albion/prices?items=T4_BAG&region=invalid")
         assert response.status_code == 401
+
+
+def test_compare_prices_between_regions(client, auth_header, monkeypatch):
+    """Consulta todas as regiões e devolve o mais barato de cada uma."""
+    from app.routers import albion
+    from app.utils.albion_client import summarize_rows
+
+    prices = {"europe": 1500, "west": 1200, "east": None}
+
+    def fake_get_prices_with_status(items, locations, qualities, region, max_age=None):
+        rows = []
+        if prices[region] is not None:
+            rows.append({
+                "item_id": "T4_BAG",
+                "city": "Caerleon",
+                "quality": 1,
+                "sell_price_min": prices[region],
+                "sell_price_min_date": "2024-01-15T10:30:00",
+            })
+        return {
+            "data": rows,
+            "summary": summarize_rows(rows),
+            "stale": False,
+            "fetched_at": None,
+            "unavailable": region == "east",
+        }
+
+    monkeypatch.setattr(albion, "get_prices_with_status", fake_get_prices_with_status)
+
+    response = client.get("/albion/prices/compare?items=T4_BAG", headers=auth_header)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["items"]["T4_BAG"]["europe"]["price"] == 1500
+    assert data["items"]["T4_BAG"]["west"]["price"] == 1200
+    assert data["items"]["T4_BAG"]["east"] is None
+    assert data["best_region"]["T4_BAG"] == "west"
+    assert data["regions"]["east"]["available"] is False
@@ -1,6 +1,7 @@
 import pytest
 from datetime import datetime, timedelta, timezone
 from app import models
+from app.services import mailer
 
 def test_alert_checker_http_endpoint(client, db):
     """
@@ -46,3 +47,216 @@ def test_alert_checker_http_endpoint(client, db):
         print(f"Status do Checker: {response.status_code}")
     finally:
         pass # A transação será revertida pela fixture 'db' se necessário
+
+
+def _fake_prices(price):
+    def fake(items, locations=None, qualities=None, region="europe", max_age=None, notify=True):
+        return {"data": [], "summary": {items[0]: {"price": price}}, "stale": False,
+                "fetched_at": None, "unavailable": False}
+    return fake
+
+
+def test_checker_commits_per_batch_and_resumes(db, monkeypatch):
+    """Uma execução interrompida retoma do último lote confirmado."""
+    from app.services import alert_checker
+
+    user = models.User(username="batchuser", email="batch@example.com", hashed_password="...")
+    db.add(user)
+    db.commit()
+    alerts = [
+        models.PriceAlert(user_id=user.id, item_id=f"T4_BAG@{i}", target_price=1000,
+                          use_ai_expected=False, is_active=True)
+        for i in range(3)
+    ]
+    db.add_all(alerts)
+    db.commit()
+    ids = [a.id for a in alerts]
+
+    monkeypatch.setattr(alert_checker, "get_prices_with_status", _fake_prices(900))
+    monkeypatch.setattr(mailer, "send_email", lambda *a, **k: None)
+
+    fired = []
+    original_fire = alert_checker._fire_alert
+
+    def crashing_fire(alert, *args, **kwargs):
+        if alert.id == ids[2]:
+            raise RuntimeError("timeout do cron")
+        fired.append(alert.id)
+        return original_fire(alert, *args, **kwargs)
+
+    monkeypatch.setattr(alert_checker, "_fire_alert", crashing_fire)
+    with pytest.raises(RuntimeError):
+        alert_checker.run_checker_internal(db, batch_size=1, workers=1)
+    db.rollback()
+
+    cp = db.get(models.CheckerCheckpoint, alert_checker.CHECKPOINT_NAME)
+    assert cp.last_alert_id == ids[1]
+    assert cp.finished_at is None
+
+    monkeypatch.setattr(alert_checker, "_fire_alert", original_fire)
+    result = alert_checker.run_checker_internal(db, batch_size=1, workers=2)
+    assert result["resumed"] is True
+    assert result["checked"] == 3
+    assert result["triggered"] == 3
+    assert result["batches"] == 1
+    assert fired == ids[:2]
+
+    # a próxima execução começa uma passada nova
+    again = alert_checker.run_checker_internal(db, batch_size=10, workers=1)
+    assert again["resumed"] is False
+    assert again["checked"] == 3
+
+
+def test_concurrent_run_does_not_resume_live_checkpoint(db, monkeypatch):
+    """Com outra execução segurando o lease, a chamada é ignorada; depois que expira, retoma."""
+    from datetime import datetime, timedelta, timezone
+
+    from app.services import alert_checker
+
+    user = models.User(username="leaseuser", email="lease@example.com", hashed_password="...")
+    db.add(user)
+    db.commit()
+    db.add(models.PriceAlert(user_id=user.id, item_id="T4_BAG", target_price=1000,
+                             use_ai_expected=False, is_active=True))
+    db.add(models.CheckerCheckpoint(
+        name=alert_checker.CHECKPOINT_NAME, last_alert_id=0, checked=0, triggered=0,
+        started_at=datetime.now(timezone.utc), lease_owner="outra-instancia",
+        lease_expires_at=datetime.now(timezone.utc) + timedelta(minutes=5),
+    ))
+    db.commit()
+
+    monkeypatch.setattr(alert_checker, "get_prices_with_status", _fake_prices(900))
+    monkeypatch.setattr(mailer, "send_email", lambda *a, **k: None)
+
+    assert alert_checker.run_checker_internal(db, workers=1) == {
+        "skipped": True, "reason": "already_running",
+    }
+    assert db.query(models.UserNotification).count() == 0
+
+    # a outra execução morreu: o lease expira e esta retoma o checkpoint
+    cp = db.get(models.CheckerCheckpoint, alert_checker.CHECKPOINT_NAME)
+    cp.lease_expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.commit()
+
+    result = alert_checker.run_checker_internal(db, workers=1)
+    assert result["resumed"] is True
+    assert result["triggered"] == 1
+    db.refresh(cp)
+    assert cp.lease_owner is None
+
+
+def _fire_three(db, monkeypatch, username, digest):
+    from app.services import alert_checker
+
+    user = models.User(username=username, email=f"{username}@example.com",
+                       hashed_password="...", alert_digest_enabled=digest)
+    db.add(user)
+    db.commit()
+    db.add_all([
+        models.PriceAlert(user_id=user.id, item_id=f"T4_BAG@{i}", target_price=1000,
+                          use_ai_expected=False, is_active=True)
+        for i in range(3)
+    ])
+    db.commit()
+
+    monkeypatch.setattr(alert_checker, "get_prices_with_status", _fake_prices(900))
+    monkeypatch.setattr(mailer, "send_email", lambda *a, **k: None)
+    result = alert_checker.run_checker_internal(db, batch_size=10, workers=1)
+    assert result["triggered"] == 3
+    return user
+
+
+def test_checker_digests_firings_per_user(db, monkeypatch):
+    """Vários disparos do mesmo usuário viram uma notificação e um e-mail."""
+    user = _fire_three(db, monkeypatch, "digestuser", digest=True)
+
+    notifs = db.query(models.UserNotification).filter_by(user_id=user.id).all()
+    assert len(notifs) == 1
+    assert notifs[0].title.startswith("🚨 3 ")
+    assert notifs[0].body.count("chegou a 900") == 3
+
+    emails = db.query(models.EmailOutbox).filter_by(to_email=user.email).all()
+    assert len(emails) == 1
+    assert emails[0].dedup_key.startswith("price_digest:")
+
+
+def test_checker_without_digest_notifies_each_alert(db, monkeypatch):
+    user = _fire_three(db, monkeypatch, "nodigestuser", digest=False)
+
+    assert db.query(models.UserNotification).filter_by(user_id=user.id).count() == 3
+    assert db.query(models.EmailOutbox).filter_by(to_email=user.email).count() == 3
+
+
+def test_alert_preferences_endpoint(client, auth_header):
+    assert client.get("/alerts/preferences", headers=auth_header).json() == {"alert_digest_enabled": True}
+
+    resp = client.put("/alerts/preferences", json={"alert_digest_enabled": False}, headers=auth_header)
+    assert resp.status_code == 200
+    assert client.get("/alerts/preferences", headers=auth_header).json() == {"alert_digest_enabled": False}
+
+
+def test_checker_writes_in_bulk(db, monkeypatch, test_engine):
+    """O número de statements de escrita não cresce com o número de disparos."""
+    from sqlalchemy import event
+    from app.services import alert_checker
+
+    users = [models.User(username=f"bulk{i}", email=f"bulk{i}@example.com", hashed_password="...",
+                         alert_digest_enabled=False) for i in range(2)]
+    db.add_all(users)
+    db.commit()
+    db.add_all([
+        models.PriceAlert(user_id=users[i % 2].id, item_id=f"T4_BAG@{i}", target_price=1000,
+                          use_ai_expected=False, is_active=True)
+        for i in range(20)
+    ])
+    db.commit()
+
+    monkeypatch.setattr(alert_checker, "get_prices_with_status", _fake_prices(900))
+    monkeypatch.setattr(mailer, "send_email", lambda *a, **k: None)
+
+    statements = []
+
+    def count(conn, cursor, statement, params, context, executemany):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(test_engine, "before_cursor_execute", count)
+    try:
+        result = alert_checker.run_checker_internal(db, batch_size=50, workers=1)
+    finally:
+        event.remove(test_engine, "before_cursor_execute", count)
+
+    assert result["triggered"] == 20
+    # notificações + outbox em INSERT único cada; disparos em um UPDATE ... IN
+    assert statements.count("SELECT") <= 13  # inclui a reserva do lote da outbox
+    assert statements.count("INSERT") <= 3
+    assert statements.count("UPDATE") <= 11  # inclui lease do checkpoint e chave do lote da outbox
+    db.expire_all()
+    assert db.query(models.UserNotification).count() == 20
+    assert db.query(models.EmailOutbox).count() == 20
+    assert db.query(models.PriceAlert).filter(models.PriceAlert.last_triggered_at.is_(None)).count() == 0
+
+
+def test_email_dedup_key_is_per_cooldown_window(db):
+    """O mesmo disparo entregue duas vezes entra uma vez só na outbox."""
+    from app.services import alert_checker
+
+    user = models.User(username="dedupuser", email="dedup@example.com", hashed_password="...",
+                       alert_digest_enabled=False)
+    db.add(user)
+    db.commit()
+    previous = datetime.now(timezone.utc) - timedelta(hours=2)
+    firing = {"alert_id": 7, "user_id": user.id, "item": "T4_BAG", "current_price": 900.0,
+              "city": None, "expected_price": None, "percent_below": 0.0,
+              "previous_trigger": previous}
+
+    alert_checker.deliver_firings(db, [dict(firing)])
+    db.commit()
+    # outro caminho, outro instante, mesma janela de cooldown
+    alert_checker.deliver_firings(db, [dict(firing, current_price=890.0)])
+    db.commit()
+    assert db.query(models.EmailOutbox).count() == 1
+
+    # depois do cooldown o disparo anterior muda e o e-mail é outro
+    alert_checker.deliver_firings(db, [dict(firing, previous_trigger=datetime.now(timezone.utc))])
+    db.commit()
+    assert db.query(models.EmailOutbox).count() == 2
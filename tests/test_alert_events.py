@@ -0,0 +1,211 @@
+from app import models
+from app.services import alert_checker, alert_events, alert_index, mailer
+
+
+def _make_user(db, name):
+    user = models.User(username=name, email=f"{name}@example.com", hashed_password="...")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_index_matches_item_city_quality(db):
+    user = _make_user(db, "eventuser")
+    caerleon = models.PriceAlert(user_id=user.id, item_id="T4_BAG", city="Caerleon",
+                                 target_price=1000, is_active=True)
+    anywhere = models.PriceAlert(user_id=user.id, item_id="T4_BAG", target_price=1000, is_active=True)
+    quality3 = models.PriceAlert(user_id=user.id, item_id="T4_BAG", quality=3,
+                                 target_price=1000, is_active=True)
+    other = models.PriceAlert(user_id=user.id, item_id="T5_BAG", target_price=1000, is_active=True)
+    db.add_all([caerleon, anywhere, quality3, other])
+    db.commit()
+
+    index = alert_index.AlertIndex()
+    index.rebuild(db)
+    assert len(index) == 4
+
+    rows = [{"city": "Caerleon", "quality": 1, "sell_price_min": 900}]
+    assert index.match("T4_BAG", rows) == {caerleon.id, anywhere.id}
+
+    index.remove(anywhere.id)
+    assert index.match("T4_BAG", [{"city": "Martlock", "quality": 3, "sell_price_min": 900}]) == {quality3.id}
+
+
+def test_threshold_index_uses_binary_search_on_trigger_price(db):
+    user = _make_user(db, "thresholduser")
+    alerts = [
+        models.PriceAlert(user_id=user.id, item_id="T4_BAG", target_price=500, is_active=True),
+        models.PriceAlert(user_id=user.id, item_id="T4_BAG", target_price=800, is_active=True),
+        # esperado 1000 com 10% abaixo -> dispara a partir de 900
+        models.PriceAlert(user_id=user.id, item_id="T4_BAG", expected_price=1000,
+                          percent_below=10, use_ai_expected=False, is_active=True),
+        # IA ainda sem baseline: sempre candidato
+        models.PriceAlert(user_id=user.id, item_id="T4_BAG", percent_below=20,
+                          use_ai_expected=True, is_active=True),
+    ]
+    db.add_all(alerts)
+    db.commit()
+
+    index = alert_index.AlertIndex()
+    index.rebuild(db)
+
+    def match(price):
+        return index.match("T4_BAG", [{"city": "Caerleon", "quality": 1, "sell_price_min": price}])
+
+    ids = [a.id for a in alerts]
+    assert match(850) == {ids[2], ids[3]}
+    assert match(700) == {ids[1], ids[2], ids[3]}
+
+    # baseline da IA calculado -> limiar passa a ser 1000 * 0.8 = 800
+    alerts[3].last_expected_price = 1000
+    index.upsert(alerts[3])
+    assert match(850) == {ids[2]}
+
+
+def test_price_event_evaluates_only_affected_alerts(db, monkeypatch):
+    user = _make_user(db, "eventuser2")
+    hit = models.PriceAlert(user_id=user.id, item_id="T4_BAG", target_price=1000,
+                            use_ai_expected=False, is_active=True)
+    miss = models.PriceAlert(user_id=user.id, item_id="T5_BAG", target_price=1000,
+                             use_ai_expected=False, is_active=True)
+    db.add_all([hit, miss])
+    db.commit()
+
+    index = alert_index.AlertIndex()
+    index.rebuild(db)
+    monkeypatch.setattr(alert_events, "index", index)
+
+    submitted = []
+
+    class InlineExecutor:
+        def submit(self, fn, ids):
+            submitted.append(ids)
+
+    monkeypatch.setattr(alert_events, "_executor", InlineExecutor())
+    row = {"city": "Caerleon", "quality": 1, "sell_price_min": 900}
+    alert_events.on_prices_updated("europe", {"T4_BAG": [row]})
+    alert_events.on_prices_updated("europe", {"T5_BAG": [{**row, "sell_price_min": 5000}]})
+    alert_events.on_prices_updated("west", {"T5_BAG": [row]})
+    assert submitted == [[hit.id]]
+
+    monkeypatch.setattr(
+        alert_checker, "get_prices_with_status",
+        lambda items, *a, **k: {"summary": {items[0]: {"price": 900}}},
+    )
+    monkeypatch.setattr(mailer, "send_email", lambda *a, **k: None)
+
+    assert alert_events.evaluate_alert_ids(db, submitted[0]) == 1
+    assert db.query(models.UserNotification).filter_by(user_id=user.id).count() == 1
+
+
+def test_index_is_not_maintained_until_rebuilt(db):
+    user = _make_user(db, "idleindex")
+    alert = models.PriceAlert(user_id=user.id, item_id="T4_BAG", target_price=1000, is_active=True)
+    db.add(alert)
+    db.commit()
+
+    index = alert_index.AlertIndex()
+    index.upsert(alert)  # eventos desligados: nada é indexado
+    assert len(index) == 0
+
+    index.rebuild(db)
+    index.clear()
+    index.upsert(alert)
+    assert len(index) == 0
+
+
+def test_bucket_applies_pending_changes_on_lookup():
+    bucket = alert_index._Bucket()
+    for alert_id, threshold in enumerate([500, 900, 700, 800]):
+        bucket.add(threshold, alert_id)
+    bucket.discard(700, 2)
+    bucket.discard(900, 1)
+    bucket.add(900, 1)  # reinserção com o mesmo limiar
+    assert bucket.triggered_by(750) == [3, 1]
+    assert bucket.thresholds == [500, 800, 900]
+
+    bucket.discard(500, 0)
+    bucket.discard(800, 3)
+    bucket.discard(900, 1)
+    assert not bucket
+
+
+def test_checker_fetch_does_not_trigger_event_evaluation(db, session_local, monkeypatch):
+    """Com o listener de eventos ligado, cada alerta dispara uma vez só."""
+    from datetime import datetime, timezone
+
+    from app.utils import albion_client
+
+    user = _make_user(db, "racecheck")
+    user.alert_digest_enabled = False  # uma notificação por alerta
+    db.commit()
+    alerts = [
+        models.PriceAlert(user_id=user.id, item_id=item, target_price=1000,
+                          use_ai_expected=False, is_active=True)
+        for item in ("T4_BAG", "T5_BAG")
+    ]
+    db.add_all(alerts)
+    db.commit()
+    ids = {alert.item_id: alert.id for alert in alerts}
+
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+    def fake_get_json(url, params, region):
+        return [{"item_id": item, "city": "Caerleon", "quality": 1,
+                 "sell_price_min": 900, "sell_price_min_date": now}
+                for item in url.rsplit("/", 1)[-1].split(",")]
+
+    submitted = []
+
+    class InlineExecutor:
+        """Pior caso: o evento é avaliado antes do commit do verificador."""
+
+        def submit(self, fn, ids):
+            submitted.append(ids)
+            other = session_local()
+            try:
+                alert_events.evaluate_alert_ids(other, ids)
+            finally:
+                other.close()
+
+    index = alert_index.AlertIndex()
+    index.rebuild(db)
+    monkeypatch.setattr(alert_events, "index", index)
+    monkeypatch.setattr(alert_events, "_executor", InlineExecutor())
+    monkeypatch.setattr(albion_client, "_get_json", fake_get_json)
+    monkeypatch.setattr(mailer, "send_email", lambda *a, **k: None)
+    albion_client.add_price_listener(alert_events.on_prices_updated)
+    try:
+        result = alert_checker.run_checker_internal(db, batch_size=10, workers=1)
+        assert result["triggered"] == 2
+        assert submitted == []
+
+        # o listener está ligado: uma busca de fora do verificador o aciona
+        albion_client.prices_cache.clear()
+        albion_client.get_prices_with_status(["T4_BAG"])
+        assert submitted == [[ids["T4_BAG"]]]
+    finally:
+        albion_client.remove_price_listener(alert_events.on_prices_updated)
+
+    db.expire_all()
+    for item_id in ids:
+        assert db.query(models.UserNotification).filter(
+            models.UserNotification.body.like(f"{item_id} %")
+        ).count() == 1
+
+
+def test_firing_is_claimed_once(db):
+    """Dois caminhos com o mesmo resultado: só o primeiro entrega."""
+    user = _make_user(db, "claimuser")
+    alert = models.PriceAlert(user_id=user.id, item_id="T4_BAG", target_price=1000,
+                              use_ai_expected=False, cooldown_minutes=60, is_active=True)
+    db.add(alert)
+    db.commit()
+    result = {"fire": True, "current_price": 900.0, "expected_price": None, "baseline": None}
+
+    assert alert_checker.apply_results(db, [alert], [dict(result)]) == 1
+    db.commit()
+    # o outro caminho avaliou quando o alerta ainda estava fora do cooldown
+    assert alert_checker.apply_results(db, [alert], [dict(result)]) == 0
+    db.commit()
+    assert db.query(models.UserNotification).filter_by(user_id=user.id).count() == 1
@@ -121,6 +121,14 @@ def test_run_checker_manual(client):
     assert isinstance(data["triggered"], int)
 
 
+def test_run_checker_vercel_cron(client, monkeypatch):
+    """Vercel Cron chama com GET e o segredo em Authorization: Bearer."""
+    monkeypatch.setenv("CRON_SECRET", "testsecret")
+    response = client.get("/alerts/run-check", headers={"Authorization": "Bearer testsecret"})
+    assert response.status_code == 200
+    assert "checked" in response.json()
+
+
 def test_run_checker_invalid_secret(client):
     """Testa o disparo manual com secret inválido."""
     os.environ["CRON_SECRET"] = "testsecret"
@@ -1,4 +1,5 @@
 import pytest
+from sqlalchemy import event
 from app import models
 from datetime import datetime, timezone
 
@@ -103,4 +104,40 @@ def test_login_wrong_password(client, db):
         "username": test_user["username"],
         "password": "senhaerrada"
     })
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+def _count_user_selects(test_engine):
+    statements = []
+
+    def count(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", count)
+    return statements, lambda: event.remove(test_engine, "before_cursor_execute", count)
+
+
+def test_authenticated_user_is_cached(client, auth_header, async_test_engine):
+    """Requisições seguidas com o mesmo token não voltam a buscar o usuário."""
+    statements, stop = _count_user_selects(async_test_engine.sync_engine)
+    try:
+        for _ in range(3):
+            assert client.get("/me", headers=auth_header).status_code == 200
+            assert client.get("/items/", headers=auth_header).status_code == 200
+    finally:
+        stop()
+
+    assert len(statements) == 1
+
+
+def test_user_change_invalidates_cache(client, db, auth_header):
+    assert client.get("/me", headers=auth_header).json()["email"] == "fixture@example.com"
+
+    user = db.query(models.User).filter_by(username="fixtureuser").one()
+    user.email = "novo@example.com"
+    db.commit()
+    assert client.get("/me", headers=auth_header).json()["email"] == "novo@example.com"
+
+    db.delete(user)
+    db.commit()
+    assert client.get("/me", headers=auth_header).status_code == 401
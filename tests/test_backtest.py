@@ -0,0 +1,75 @@
+import time
+
+from app.routers import alerts as alerts_router
+from app.services import backtest
+
+HOUR_MS = 3600 * 1000
+
+
+def _series(prices, start=0):
+    return [((start + i) * HOUR_MS, float(p)) for i, p in enumerate(prices)]
+
+
+def test_target_price_with_cooldown():
+    series = _series([1200, 900, 900, 900, 1200, 900])
+    [res] = backtest.simulate(series, [{"target_price": 1000, "cooldown_minutes": 120}], "1h")
+    # dispara em 1h, ignora 2h (cooldown), dispara em 3h, de novo em 5h
+    assert res["fired_at"] == [1 * HOUR_MS, 3 * HOUR_MS, 5 * HOUR_MS]
+    assert res["fires"] == 3
+
+
+def test_ai_baseline_uses_only_past_points():
+    series = _series([1000] * 10 + [700, 1000])
+    cfg = {"percent_below": 20, "use_ai_expected": True, "ai_days": 7,
+           "ai_stat": "median", "ai_min_points": 10, "cooldown_minutes": 0}
+    [res] = backtest.simulate(series, [cfg], "1h")
+    assert res["fired_at"] == [10 * HOUR_MS]
+
+    # com mínimo maior que o histórico disponível, nunca dispara
+    [res] = backtest.simulate(series, [{**cfg, "ai_min_points": 50}], "1h")
+    assert res["fires"] == 0
+
+
+def test_baselines_shared_across_configs(monkeypatch):
+    calls = []
+    real = backtest.baseline_series
+
+    def spy(*args, **kwargs):
+        calls.append(args[1:])
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(backtest, "baseline_series", spy)
+    series = _series([1000 + (i % 7) * 10 for i in range(720)])  # 30 dias de 1h
+    configs = [
+        {"percent_below": p, "use_ai_expected": True, "ai_days": 7, "ai_stat": "median",
+         "ai_min_points": 10, "cooldown_minutes": c}
+        for p in range(1, 11) for c in (0, 60, 240, 720, 1440)
+    ]
+
+    started = time.perf_counter()
+    results = backtest.simulate(series, configs, "1h")
+    elapsed = time.perf_counter() - started
+
+    assert len(results) == 50
+    assert len(calls) == 1
+    assert elapsed < 2
+
+
+def test_backtest_endpoint(client, auth_header, monkeypatch):
+    now_ms = int(time.time() * 1000)
+    start = now_ms // HOUR_MS - 20
+    history = [{"timestamp": ts, "city": "Caerleon", "avg_price": p, "item_count": 1}
+               for ts, p in _series([1000] * 15 + [500] + [1000] * 4, start=start)]
+    monkeypatch.setattr(alerts_router, "get_price_history", lambda **kw: history)
+
+    resp = client.post("/alerts/backtest", headers=auth_header, json={
+        "item_id": "t4_bag",
+        "days": 2,
+        "configs": [{"target_price": 600}, {"percent_below": 30, "ai_min_points": 5}],
+    })
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["item_id"] == "T4_BAG"
+    assert body["points"] == 20
+    assert [r["fires"] for r in body["results"]] == [1, 1]
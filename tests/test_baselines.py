@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import models
+from app.services import baselines
+from app.utils.rolling import Ewma, RollingMedian
+
+HOUR_MS = 3600 * 1000
+
+
+def _history(values, start=0):
+    return [{"timestamp": (start + i) * HOUR_MS, "city": "Caerleon", "avg_price": v, "item_count": 1}
+            for i, v in enumerate(values)]
+
+
+def _ewma(values, span):
+    e = Ewma.for_span(span)
+    for v in values:
+        e.update(v)
+    return e.value
+
+
+def test_baseline_computed_once_per_key(monkeypatch):
+    """Centenas de alertas do mesmo item compartilham um único cálculo."""
+    calls = []
+    lock = threading.Lock()
+
+    def fake_history(**kwargs):
+        with lock:
+            calls.append(kwargs)
+        time.sleep(0.05)  # força sobreposição entre as threads
+        return _history([100, 200, 300])
+
+    monkeypatch.setattr(baselines, "get_price_history", fake_history)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(
+            lambda _: baselines.get_expected_price("t4_bag", ["Caerleon"], 7, "6h", "median", 3),
+            range(50),
+        ))
+
+    assert set(results) == {200.0}
+    assert len(calls) == 1
+
+    # parâmetros diferentes -> outra chave (mean usa a EWMA da janela: 7d / 6h = 28 pontos)
+    mean = baselines.get_expected_price("T4_BAG", ["Caerleon"], 7, "6h", "mean", 3)
+    assert mean == pytest.approx(_ewma([100, 200, 300], 28))
+    assert len(calls) == 2
+
+
+def test_insufficient_history_is_memoized(monkeypatch):
+    calls = []
+
+    def fake_history(**kwargs):
+        calls.append(kwargs)
+        return _history([100])
+
+    monkeypatch.setattr(baselines, "get_price_history", fake_history)
+
+    assert baselines.get_expected_price("T4_BAG", ["Caerleon"], 7, "6h", "median", 10) is None
+    assert baselines.get_expected_price("T4_BAG", ["Caerleon"], 7, "6h", "median", 10) is None
+    assert len(calls) == 1
+
+
+def test_fetch_failure_is_not_memoized(monkeypatch):
+    calls = []
+
+    def flaky_history(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise RuntimeError("API fora do ar")
+        return _history([100, 200, 300])
+
+    monkeypatch.setattr(baselines, "get_price_history", flaky_history)
+
+    assert baselines.get_expected_price("T4_BAG", ["Caerleon"], 7, "6h", "median", 3) is None
+    assert baselines.get_expected_price("T4_BAG", ["Caerleon"], 7, "6h", "median", 3) == 200.0
+    assert len(calls) == 2
+
+
+def test_rolling_median_matches_window():
+    import random
+    import statistics
+
+    rng = random.Random(7)
+    rm = RollingMedian(window=50)
+    values = []
+    for ts in range(300):
+        v = rng.choice([10, 20, 20, 30, 40, 50, 50, 60])
+        rm.add(ts, v)
+        values.append((ts, v))
+        in_window = [x for t, x in values if t >= ts - 50]
+        assert rm.median() == statistics.median(in_window)
+        assert len(rm) == len(in_window)
+
+
+def test_baseline_state_is_incremental_and_persisted(monkeypatch, db):
+    """Só pontos novos entram no estado, que sobrevive a um restart."""
+    history = _history([100, 200, 300])
+    seen = []
+
+    def fake_history(**kwargs):
+        return history
+
+    monkeypatch.setattr(baselines, "get_price_history", fake_history)
+    real_feed = baselines.BaselineState.feed
+
+    def spy_feed(self, points):
+        added = real_feed(self, points)
+        seen.append(added)
+        return added
+
+    monkeypatch.setattr(baselines.BaselineState, "feed", spy_feed)
+
+    assert baselines.compute_expected_price_from_history("T4_BAG", ["Caerleon"], 1, "1h", "median", 3) == 200.0
+
+    history = _history([100, 200, 300, 400, 500])
+    assert baselines.compute_expected_price_from_history("T4_BAG", ["Caerleon"], 1, "1h", "median", 3) == 300.0
+    assert seen == [3, 2]
+
+    row = db.get(models.PriceBaseline, "T4_BAG:Caerleon:1:1h")
+    assert row is not None and row.last_ts == 4 * HOUR_MS
+
+    # "restart": memória zerada, estado volta do banco e nada é reprocessado
+    baselines._states.clear()
+    assert baselines.compute_expected_price_from_history("T4_BAG", ["Caerleon"], 1, "1h", "median", 3) == 300.0
+    assert seen[-1] == 0
+
+    # janela de 1 dia: pontos com mais de 24h saem da mediana
+    history = _history([1000] * 3, start=27)
+    assert baselines.compute_expected_price_from_history("T4_BAG", ["Caerleon"], 1, "1h", "median", 3) == 1000.0
+
+    # o JSON salvo é a própria janela, montado só com os pontos novos
+    row = db.get(models.PriceBaseline, "T4_BAG:Caerleon:1:1h")
+    db.refresh(row)
+    state = baselines._get_state("T4_BAG", ["Caerleon"], 1, "1h")
+    assert json.loads(row.points) == [list(p) for p in state.median.points()]
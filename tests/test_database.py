@@ -0,0 +1,39 @@
+import pytest
+
+from app.core import db_pool
+from app.database import async_database_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("sqlite:///./app.db", "sqlite+aiosqlite:///./app.db"),
+    ("postgresql://u:p@host/db", "postgresql+asyncpg://u:p@host/db"),
+    ("postgresql+psycopg2://u:p@host/db", "postgresql+asyncpg://u:p@host/db"),
+    ("postgresql://u:p@host/db?sslmode=require&channel_binding=require",
+     "postgresql+asyncpg://u:p@host/db?ssl=require"),
+])
+def test_async_database_url(url, expected):
+    assert async_database_url(url) == expected
+
+
+def test_async_database_url_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u:p@host/db")
+
+
+def test_null_pool_disables_asyncpg_prepared_statement_cache(monkeypatch):
+    """Atrás do PgBouncer (modo transaction) o asyncpg não pode reusar prepared statements."""
+    monkeypatch.setattr(db_pool.settings, "DB_NULL_POOL", True)
+    monkeypatch.setattr(db_pool, "pool_stats", {})
+
+    options = db_pool.engine_options("test_async", is_async=True, url="postgresql+asyncpg://u:p@host/db")
+    args = options["connect_args"]
+    assert args["statement_cache_size"] == 0
+    assert args["prepared_statement_cache_size"] == 0
+    assert args["prepared_statement_name_func"]() != args["prepared_statement_name_func"]()
+
+    # aiosqlite e o engine síncrono não recebem esses argumentos
+    assert "connect_args" not in db_pool.engine_options(
+        "test_async", is_async=True, url="sqlite+aiosqlite:///./app.db"
+    )
+    assert "connect_args" not in db_pool.engine_options("test_sync", url="postgresql://u:p@host/db")
+
@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.services import alert_checker, email_queue, mailer
+
+
+def _message(i, key):
+    return {"to_email": f"u{i}@example.com", "subject": "assunto", "text": "texto",
+            "html": None, "dedup_key": key}
+
+
+def _enqueue(db, n, prefix="k"):
+    email_queue.enqueue_emails(db, [_message(i, f"{prefix}{i}") for i in range(n)])
+    db.commit()
+
+
+def test_enqueue_dedups(db):
+    # chave repetida no mesmo lote e depois já no banco
+    assert email_queue.enqueue_emails(db, [_message(0, "dup"), _message(1, "dup")]) == 1
+    db.commit()
+    assert email_queue.enqueue_emails(db, [_message(0, "dup"), _message(2, "novo")]) == 1
+    db.commit()
+    assert db.query(models.EmailOutbox).count() == 2
+
+
+def test_drain_uses_resend_batches(db, monkeypatch):
+    """250 e-mails saem em 3 chamadas ao /emails/batch, não em 250."""
+    _enqueue(db, 250)
+    calls = []
+    monkeypatch.setattr(mailer, "resend_configured", lambda: True)
+    monkeypatch.setattr(mailer, "send_batch_via_resend", lambda msgs, idempotency_key=None: calls.append(len(msgs)))
+
+    stats = email_queue.drain_outbox(db)
+
+    assert stats == {"sent": 250, "retry": 0, "failed": 0}
+    assert calls == [100, 100, 50]
+    assert db.query(models.EmailOutbox).filter_by(status="pending").count() == 0
+    # nada mais a enviar
+    assert email_queue.drain_outbox(db)["sent"] == 0
+
+
+def test_drain_retries_with_backoff(db, monkeypatch):
+    _enqueue(db, 2)
+    monkeypatch.setattr(mailer, "resend_configured", lambda: True)
+    monkeypatch.setattr(email_queue.settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 2)
+
+    def boom(msgs, idempotency_key=None):
+        raise RuntimeError("Resend fora do ar")
+
+    monkeypatch.setattr(mailer, "send_batch_via_resend", boom)
+    assert email_queue.drain_outbox(db) == {"sent": 0, "retry": 2, "failed": 0}
+
+    rows = db.query(models.EmailOutbox).all()
+    now = datetime.now(timezone.utc)
+    for row in rows:
+        assert row.attempts == 1 and row.status == "pending"
+        assert row.next_attempt_at.replace(tzinfo=timezone.utc) > now
+    # ainda em backoff: nada é tentado
+    assert email_queue.drain_outbox(db)["retry"] == 0
+
+    for row in rows:
+        row.next_attempt_at = now
+    db.commit()
+    assert email_queue.drain_outbox(db) == {"sent": 0, "retry": 0, "failed": 2}
+    assert db.query(models.EmailOutbox).filter_by(status="failed").count() == 2
+
+
+def test_checker_enqueues_instead_of_sending(db, monkeypatch):
+    user = models.User(username="outboxuser", email="outbox@example.com", hashed_password="...",
+                       alert_digest_enabled=False)
+    db.add(user)
+    db.commit()
+    db.add_all([
+        models.PriceAlert(user_id=user.id, item_id=f"T4_BAG@{i}", target_price=1000,
+                          use_ai_expected=False, is_active=True)
+        for i in range(3)
+    ])
+    db.commit()
+
+    def fake_prices(items, locations=None, qualities=None, region="europe", max_age=None, notify=True):
+        return {"data": [], "summary": {items[0]: {"price": 900}}, "stale": False,
+                "fetched_at": None, "unavailable": False}
+
+    def fail_single_send(*args, **kwargs):
+        raise AssertionError("checker não deve enviar e-mail um a um")
+
+    batches = []
+    monkeypatch.setattr(alert_checker, "get_prices_with_status", fake_prices)
+    monkeypatch.setattr(mailer, "send_email", fail_single_send)
+    monkeypatch.setattr(mailer, "resend_configured", lambda: True)
+    monkeypatch.setattr(mailer, "send_batch_via_resend", lambda msgs, idempotency_key=None: batches.append(msgs))
+
+    result = alert_checker.run_checker_internal(db, batch_size=10, workers=1)
+
+    assert result["triggered"] == 3
+    assert result["emails"]["sent"] == 3
+    assert len(batches) == 1 and len(batches[0]) == 3
+    assert {m["to_email"] for m in batches[0]} == {"outbox@example.com"}
+
+
+def test_overlapping_drains_send_each_email_once(db, test_engine, monkeypatch):
+    """Duas drenagens (como em dois processos) não enviam o mesmo e-mail."""
+    _enqueue(db, 5)
+    other_engine = create_engine(test_engine.url)
+    other_db = sessionmaker(bind=other_engine)()
+
+    sent = []
+    inner = {}
+
+    def send(msgs, idempotency_key=None):
+        sent.extend(m["to_email"] for m in msgs)
+        if not inner:
+            # o segundo "processo" drena enquanto o primeiro está enviando
+            inner["stats"] = None
+            inner["stats"] = email_queue._drain(other_db, None)
+
+    monkeypatch.setattr(mailer, "resend_configured", lambda: True)
+    monkeypatch.setattr(mailer, "send_batch_via_resend", send)
+    monkeypatch.setattr(email_queue.settings, "EMAIL_OUTBOX_BATCH_SIZE", 2)
+    try:
+        outer = email_queue._drain(db, None)
+    finally:
+        other_db.close()
+        other_engine.dispose()
+
+    assert sorted(sent) == sorted(f"u{i}@example.com" for i in range(5))
+    assert outer["sent"] + inner["stats"]["sent"] == 5
+    assert db.query(models.EmailOutbox).filter_by(status="sent").count() == 5
+
+
+def test_abandoned_claim_is_retried(db, monkeypatch):
+    _enqueue(db, 1)
+    row = db.query(models.EmailOutbox).one()
+    # reserva de um processo que morreu no meio do envio
+    row.status = "sending"
+    row.next_attempt_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+    db.commit()
+
+    monkeypatch.setattr(mailer, "resend_configured", lambda: True)
+    monkeypatch.setattr(mailer, "send_batch_via_resend", lambda msgs, idempotency_key=None: None)
+    assert email_queue.drain_outbox(db)["sent"] == 0
+
+    row.next_attempt_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.commit()
+    assert email_queue.drain_outbox(db)["sent"] == 1
+
+
+def test_retry_resends_same_batch_with_same_idempotency_key(db, monkeypatch):
+    """Timeout depois do Resend aceitar: a retentativa não pode entregar de novo."""
+    _enqueue(db, 3)
+    calls = []
+
+    def timeout(msgs, idempotency_key=None):
+        calls.append((idempotency_key, sorted(m["to_email"] for m in msgs)))
+        raise RuntimeError("timeout")
+
+    monkeypatch.setattr(mailer, "resend_configured", lambda: True)
+    monkeypatch.setattr(mailer, "send_batch_via_resend", timeout)
+    assert email_queue.drain_outbox(db)["retry"] == 3
+    first_key = calls[0][0]
+    assert first_key
+    assert {row.batch_key for row in db.query(models.EmailOutbox)} == {first_key}
+
+    # e-mails novos entram na fila antes da retentativa
+    _enqueue(db, 2, prefix="novo")
+    for row in db.query(models.EmailOutbox):
+        row.next_attempt_at = datetime.now(timezone.utc)
+    db.commit()
+
+    calls.clear()
+    monkeypatch.setattr(
+        mailer, "send_batch_via_resend",
+        lambda msgs, idempotency_key=None: calls.append(
+            (idempotency_key, sorted(m["to_email"] for m in msgs))
+        ),
+    )
+    assert email_queue.drain_outbox(db)["sent"] == 5
+
+    retry = [c for c in calls if c[0] == first_key]
+    assert retry == [(first_key, ["u0@example.com", "u1@example.com", "u2@example.com"])]
+    assert len(calls) == 2 and calls[1][0] != first_key
+
+
+
+def test_resend_batch_sends_idempotency_key(monkeypatch):
+    posts = []
+
+    class FakeResponse:
+        status_code = 200
+        text = ""
+
+    class FakeClient:
+        def post(self, url, json=None, headers=None):
+            posts.append((url, headers))
+            return FakeResponse()
+
+    monkeypatch.setattr(mailer, "_get_resend_client", lambda: FakeClient())
+    msg = {"to_email": "a@example.com", "subject": "s", "text": "t", "html": None}
+    mailer.send_batch_via_resend([msg], idempotency_key="outbox-abc")
+
+    assert posts == [(f"{mailer.RESEND_API_URL}/batch", {"Idempotency-Key": "outbox-abc"})]
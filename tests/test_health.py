@@ -1,3 +1,10 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app.core import db_pool
+from app.core.config import settings
+
+
 def test_health_ok(client):
     """Testa se o endpoint /health retorna status 200 e 'ok'."""
     response = client.get("/health")
@@ -9,4 +16,34 @@ def test_root(client):
     """Testa se a rota raiz retorna a mensagem da API."""
     response = client.get("/")
     assert response.status_code == 200
-    assert "Albion Market API" in response.json()["message"]
\ No newline at end of file
+    assert "Albion Market API" in response.json()["message"]
+
+def test_health_pool_reports_checkout_metrics(monkeypatch):
+    """Cada checkout é cronometrado e um timeout do pool é contado."""
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr(settings, "DB_POOL_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(db_pool, "pool_stats", {})
+    engine = create_engine("sqlite://", **db_pool.engine_options("teste"))
+
+    held = engine.connect()
+    held.execute(text("SELECT 1"))
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    status = db_pool.pool_status("teste", engine.pool)
+    held.close()
+
+    assert status["checked_out"] == 1
+    assert status["checkouts"] == 2
+    assert status["timeouts"] == 1
+    assert status["wait_max_ms"] >= 50
+
+
+def test_health_pool_endpoint(client, monkeypatch):
+    monkeypatch.setenv("CRON_SECRET", "segredo")
+    assert client.get("/health/pool").status_code == 401
+
+    response = client.get("/health/pool", headers={"X-Cron-Secret": "segredo"})
+    assert response.status_code == 200
+    [sync] = [p for p in response.json()["pools"] if p["engine"] == "sync"]
+    assert {"checked_out", "checkouts", "timeouts", "wait_avg_ms"} <= sync.keys()
@@ -0,0 +1,39 @@
+from app import models
+from app.services import ingestion
+
+
+def test_watched_items_union_of_watchlists_and_active_alerts(db):
+    user = models.User(username="ingest", email="ingest@example.com", hashed_password="...")
+    db.add(user)
+    db.commit()
+
+    db.add_all([
+        models.UserItem(user_id=user.id, item_name="T4_BAG"),
+        models.UserItem(user_id=user.id, item_name="T4_BAG"),
+        models.UserItem(user_id=user.id, item_name="BOLSA"),  # legado, não é UniqueName
+        models.PriceAlert(user_id=user.id, item_id="T5_CAPE", target_price=10, is_active=True),
+        models.PriceAlert(user_id=user.id, item_id="T6_CAPE", target_price=10, is_active=False),
+    ])
+    db.commit()
+
+    assert ingestion.watched_item_ids(db) == ["T4_BAG", "T5_CAPE"]
+
+
+def test_refresh_watched_items_fetches_each_region_once(db, monkeypatch):
+    user = models.User(username="ingest2", email="ingest2@example.com", hashed_password="...")
+    db.add(user)
+    db.commit()
+    db.add(models.UserItem(user_id=user.id, item_name="T4_BAG"))
+    db.commit()
+
+    calls = []
+
+    def fake_refresh(items, region, batch_size):
+        calls.append((tuple(items), region))
+        return len(items)
+
+    monkeypatch.setattr(ingestion, "refresh_prices", fake_refresh)
+
+    result = ingestion.refresh_watched_items(db, regions=["europe", "west"])
+    assert result == {"items": 1, "refreshed": {"europe": 1, "west": 1}}
+    assert calls == [(("T4_BAG",), "europe"), (("T4_BAG",), "west")]
@@ -1,3 +1,7 @@
+from app import models
+from app.utils import albion_client
+
+
 def test_search_item_pt_br(client):
     """Testa busca de item em PT-BR."""
     response = client.get("/albion/search/pt-br?q=Bolsa")
@@ -15,4 +19,116 @@ def test_search_item_en_us(client):
 def test_search_query_muito_curta(client):
     """Testa que busca com menos de 2 caracteres retorna erro."""
     response = client.get("/albion/search/pt-br?q=a")
-    assert response.status_code == 422  # FastAPI valida min_length=2
\ No newline at end of file
+    assert response.status_code == 422  # FastAPI valida min_length=2
+
+
+def test_watchlist_snapshot_served_from_cache(client, db, auth_header, monkeypatch):
+    """Itens + preços numa resposta; com o cache quente, nenhuma chamada ao upstream."""
+    user = db.query(models.User).filter_by(username="fixtureuser").one()
+    db.add_all([
+        models.UserItem(user_id=user.id, item_name="T4_BAG", display_name="Bolsa"),
+        models.UserItem(user_id=user.id, item_name="T5_BAG"),
+    ])
+    db.commit()
+
+    calls = []
+
+    def fake_get_json(url, params, region):
+        calls.append(url)
+        return [{"item_id": "T4_BAG", "city": "Caerleon", "quality": 1,
+                 "sell_price_min": 1500, "sell_price_min_date": "2024-01-15T10:30:00"}]
+
+    monkeypatch.setattr(albion_client, "_get_json", fake_get_json)
+
+    for _ in range(2):
+        resp = client.get("/items/snapshot", headers=auth_header)
+        assert resp.status_code == 200
+        body = resp.json()
+        assert [i["item_name"] for i in body["items"]] == ["T4_BAG", "T5_BAG"]
+        assert body["items"][0]["display_name"] == "Bolsa"
+        assert body["items"][0]["price"]["price"] == 1500
+        assert body["items"][1]["price"] is None
+
+    assert len(calls) == 1
+
+
+
+def test_bulk_import_dedupes_and_inserts_once(client, db, auth_header, async_test_engine):
+    from sqlalchemy import event
+
+    user = db.query(models.User).filter_by(username="fixtureuser").one()
+    db.add(models.UserItem(user_id=user.id, item_name="T4_BAG"))
+    db.commit()
+
+    inserts = []
+
+    def count(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT"):
+            inserts.append(statement)
+
+    event.listen(async_test_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        resp = client.post("/items/bulk", headers=auth_header, json={"items": [
+            {"item_name": "T4_BAG"},
+            {"item_name": "T5_BAG", "display_name": "Bolsa T5"},
+            {"item_name": "t5_bag"},
+            {"item_name": "T6_BAG"},
+            {"item_name": "zzzz qqqq"},
+        ]})
+    finally:
+        event.remove(async_test_engine.sync_engine, "before_cursor_execute", count)
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [i["item_name"] for i in body["added"]] == ["T5_BAG", "T6_BAG"]
+    assert body["added"][0]["display_name"] == "Bolsa T5"
+    assert body["duplicates"] == ["T4_BAG", "T5_BAG"]
+    assert body["not_found"] == ["ZZZZ QQQQ"]
+    assert len(inserts) == 1
+
+
+def test_bulk_delete_and_csv_export(client, db, auth_header):
+    user = db.query(models.User).filter_by(username="fixtureuser").one()
+    items = [models.UserItem(user_id=user.id, item_name=n, display_name=d)
+             for n, d in [("T4_BAG", "Bolsa"), ("T5_BAG", None), ("T6_BAG", None)]]
+    db.add_all(items)
+    db.commit()
+
+    resp = client.post("/items/bulk-delete", headers=auth_header,
+                       json={"ids": [items[1].id], "item_names": ["t6_bag"]})
+    assert resp.json() == {"removed": 2}
+
+    resp = client.get("/items/export.csv", headers=auth_header)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    lines = resp.text.strip().splitlines()
+    assert lines[0] == "item_name,display_name,created_at"
+    assert [line.split(",")[:2] for line in lines[1:]] == [["T4_BAG", "Bolsa"]]
+
+
+def test_csv_export_reads_in_batches(client, db, auth_header, async_test_engine, monkeypatch):
+    from sqlalchemy import event
+
+    from app.routers import items as items_router
+
+    user = db.query(models.User).filter_by(username="fixtureuser").one()
+    db.add_all([models.UserItem(user_id=user.id, item_name=f"T{i}_BAG") for i in range(5)])
+    db.commit()
+    monkeypatch.setattr(items_router, "EXPORT_BATCH_SIZE", 2)
+
+    selects = []
+
+    def count(conn, cursor, statement, params, context, executemany):
+        if "FROM user_items" in statement:
+            selects.append(statement)
+
+    event.listen(async_test_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        resp = client.get("/items/export.csv", headers=auth_header)
+    finally:
+        event.remove(async_test_engine.sync_engine, "before_cursor_execute", count)
+
+    lines = resp.text.strip().splitlines()
+    assert [line.split(",")[0] for line in lines[1:]] == [f"T{i}_BAG" for i in range(5)]
+    assert len(selects) == 3  # 2 + 2 + 1
+
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+
+from app import models
+from app.services import notification_hub
+from app.services.notification_hub import NotificationHub, publish_after_commit
+
+
+def test_hub_delivers_across_threads():
+    """publish() de outra thread chega na fila asyncio da conexão."""
+    hub = NotificationHub()
+
+    async def scenario():
+        queue = hub.subscribe(7)
+        other = hub.subscribe(8)
+        threading.Thread(target=hub.publish, args=(7, {"id": 1, "user_id": 7})).start()
+        payload = await asyncio.wait_for(queue.get(), timeout=2)
+        assert other.empty()
+        hub.unsubscribe(7, queue)
+        assert hub.connected(7) == 0
+        return payload
+
+    assert asyncio.run(scenario()) == {"id": 1, "user_id": 7}
+
+
+def test_publish_only_after_commit(db, monkeypatch):
+    published = []
+    monkeypatch.setattr(notification_hub.hub, "publish_many", published.extend)
+
+    # como no checker: as notificações vêm de uma transação já aberta
+    db.query(models.User).count()
+    publish_after_commit(db, [{"id": 1, "user_id": 1}])
+    db.rollback()
+    assert published == []
+
+    db.query(models.User).count()
+    publish_after_commit(db, [{"id": 2, "user_id": 1}])
+    assert published == []
+    db.commit()
+    assert published == [{"id": 2, "user_id": 1}]
+
+
+def test_checker_pushes_created_notifications(db, monkeypatch):
+    from app.services import alert_checker, mailer
+
+    user = models.User(username="pushuser", email="push@example.com", hashed_password="...")
+    db.add(user)
+    db.commit()
+    db.add(models.PriceAlert(user_id=user.id, item_id="T4_BAG", target_price=1000,
+                             use_ai_expected=False, is_active=True))
+    db.commit()
+
+    def fake_prices(items, locations=None, qualities=None, region="europe", max_age=None, notify=True):
+        return {"data": [], "summary": {items[0]: {"price": 900}}, "stale": False,
+                "fetched_at": None, "unavailable": False}
+
+    published = []
+    monkeypatch.setattr(notification_hub.hub, "publish_many", published.extend)
+    monkeypatch.setattr(alert_checker, "get_prices_with_status", fake_prices)
+    monkeypatch.setattr(mailer, "send_email", lambda *a, **k: None)
+
+    alert_checker.run_checker_internal(db, workers=1)
+
+    notif = db.query(models.UserNotification).filter_by(user_id=user.id).one()
+    assert [p["id"] for p in published] == [notif.id]
+    db.refresh(user)
+    assert user.unread_notifications == 1
+    assert published[0]["user_id"] == user.id
+    assert "chegou a 900" in published[0]["body"]
+
+
+def test_notifications_since_id(client, db, auth_header):
+    user = db.query(models.User).filter_by(username="fixtureuser").one()
+    notifs = [models.UserNotification(user_id=user.id, title=f"n{i}", body="b") for i in range(3)]
+    db.add_all(notifs)
+    db.commit()
+
+    resp = client.get(f"/alerts/notifications?since_id={notifs[0].id}", headers=auth_header)
+    assert resp.status_code == 200
+    assert [n["title"] for n in resp.json()] == ["n1", "n2"]
+
+
+def test_notifications_stream_requires_valid_token(client):
+    resp = client.get("/alerts/notifications/stream?token=invalido")
+    assert resp.status_code == 401
+
+
+def _seed(db, n):
+    user = db.query(models.User).filter_by(username="fixtureuser").one()
+    notifs = [models.UserNotification(user_id=user.id, title=f"n{i}", body="b", is_read=False)
+              for i in range(n)]
+    db.add_all(notifs)
+    user.unread_notifications = n
+    db.commit()
+    return user, notifs
+
+
+def test_notifications_keyset_pagination(client, db, auth_header):
+    _seed(db, 5)
+
+    first = client.get("/alerts/notifications?limit=2", headers=auth_header).json()
+    assert [n["title"] for n in first] == ["n4", "n3"]
+
+    second = client.get(f"/alerts/notifications?limit=2&before_id={first[-1]['id']}",
+                        headers=auth_header).json()
+    assert [n["title"] for n in second] == ["n2", "n1"]
+
+
+def test_unread_counter_and_read_all(client, db, auth_header):
+    user, notifs = _seed(db, 3)
+    assert client.get("/alerts/notifications/unread-count", headers=auth_header).json() == {"unread": 3}
+
+    client.post(f"/alerts/notifications/{notifs[0].id}/read", headers=auth_header)
+    # marcar de novo não decrementa duas vezes
+    client.post(f"/alerts/notifications/{notifs[0].id}/read", headers=auth_header)
+    assert client.get("/alerts/notifications/unread-count", headers=auth_header).json() == {"unread": 2}
+
+    resp = client.post("/alerts/notifications/read-all", headers=auth_header)
+    assert resp.json() == {"ok": True, "updated": 2}
+    assert client.get("/alerts/notifications/unread-count", headers=auth_header).json() == {"unread": 0}
+    db.expire_all()
+    assert db.query(models.UserNotification).filter_by(user_id=user.id, is_read=False).count() == 0
+
+
+def test_read_all_keeps_count_of_concurrent_notifications(client, db, auth_header):
+    user, _ = _seed(db, 2)
+    # um disparo em paralelo já somou no contador, mas a linha ainda não
+    # estava visível para o UPDATE do read-all
+    user.unread_notifications = 3
+    db.commit()
+
+    resp = client.post("/alerts/notifications/read-all", headers=auth_header)
+    assert resp.json() == {"ok": True, "updated": 2}
+    assert client.get("/alerts/notifications/unread-count", headers=auth_header).json() == {"unread": 1}
+
+
+def test_mark_read_only_decrements_when_it_flips(client, db, auth_header):
+    user, notifs = _seed(db, 1)
+    # outra requisição já marcou a notificação; o contador ainda não refletiu
+    notifs[0].is_read = True
+    user.unread_notifications = 1
+    db.commit()
+
+    resp = client.post(f"/alerts/notifications/{notifs[0].id}/read", headers=auth_header)
+    assert resp.json() == {"ok": True}
+    assert client.get("/alerts/notifications/unread-count", headers=auth_header).json() == {"unread": 1}
+
+    assert client.post("/alerts/notifications/999999/read", headers=auth_header).status_code == 404
@@ -0,0 +1,95 @@
+"""
+Planos das consultas quentes: falha se alguma virar varredura completa da
+tabela.
+
+- SQLite (sempre roda): smoke check com EXPLAIN QUERY PLAN no banco dos
+  testes; pega índice esquecido, mas o planner não é o de produção.
+- PostgreSQL (só com TEST_POSTGRES_URL): EXPLAIN com `enable_seqscan=off`
+  num schema temporário; se ainda assim sair "Seq Scan", nenhum índice
+  serve para a consulta. Tudo roda numa transação desfeita no fim.
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import Base
+
+
+def _plan(db, query) -> list[str]:
+    stmt = query.statement if hasattr(query, "statement") else query
+    sql = str(stmt.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def _full_scans(plan: list[str]) -> list[str]:
+    return [step for step in plan if step.startswith("SCAN") and "INDEX" not in step]
+
+
+N = models.UserNotification
+
+HOT_QUERIES = {
+    "watchlist do usuário": lambda db: db.query(models.UserItem).filter(models.UserItem.user_id == 1),
+    "lote do checker": lambda db: (
+        db.query(models.PriceAlert)
+        .filter(models.PriceAlert.is_active.is_(True))
+        .filter(models.PriceAlert.id > 100)
+        .order_by(models.PriceAlert.id)
+        .limit(200)
+    ),
+    "rebuild do índice de alertas": lambda db: (
+        db.query(models.PriceAlert).filter(models.PriceAlert.is_active.is_(True))
+    ),
+    "página de notificações": lambda db: (
+        db.query(N).filter(N.user_id == 1).filter(N.id < 500).order_by(N.id.desc()).limit(50)
+    ),
+    "notificações não lidas": lambda db: (
+        db.query(N).filter(N.user_id == 1).filter(N.is_read == False)  # noqa: E712
+        .order_by(N.id.desc()).limit(50)
+    ),
+    "polling por since_id": lambda db: (
+        db.query(N).filter(N.user_id == 1).filter(N.id > 10).order_by(N.id)
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_queries_use_indexes_sqlite(db, name):
+    plan = _plan(db, HOT_QUERIES[name](db))
+    assert not _full_scans(plan), f"{name}: {plan}"
+
+
+def test_harness_detects_full_scan(db):
+    """Sanidade: uma consulta sem índice tem que ser pega."""
+    plan = _plan(db, db.query(N).filter(N.title == "x"))
+    assert _full_scans(plan)
+
+
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+@pytest.fixture(scope="module")
+def pg_session():
+    engine = create_engine(POSTGRES_URL)
+    with engine.connect() as conn:
+        trans = conn.begin()
+        conn.execute(text("CREATE SCHEMA query_plans_test"))
+        conn.execute(text("SET LOCAL search_path TO query_plans_test"))
+        Base.metadata.create_all(conn)
+        # tabelas vazias: sem isso o planner sempre prefere o Seq Scan
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        yield Session(bind=conn)
+        trans.rollback()
+    engine.dispose()
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL não definido")
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_queries_use_indexes_postgres(pg_session, name):
+    stmt = HOT_QUERIES[name](pg_session).statement
+    sql = str(stmt.compile(dialect=pg_session.bind.dialect, compile_kwargs={"literal_binds": True}))
+    plan = [row[0] for row in pg_session.execute(text(f"EXPLAIN {sql}"))]
+    assert not [step for step in plan if "Seq Scan" in step], f"{name}: {plan}"
+
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+
+from app import models
+from app.services import retention
+
+
+def _user(db, name="retuser", unread=0):
+    user = models.User(username=name, email=f"{name}@example.com", hashed_password="...",
+                       unread_notifications=unread)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_archives_old_read_notifications_in_batches(db):
+    user = _user(db)
+    old = datetime.now(timezone.utc) - timedelta(days=40)
+    recent = datetime.now(timezone.utc) - timedelta(days=1)
+    db.add_all(
+        [models.UserNotification(user_id=user.id, title="t", body=f"velha {i}", is_read=True, created_at=old)
+         for i in range(5)]
+        + [models.UserNotification(user_id=user.id, title="t", body="velha não lida", is_read=False, created_at=old),
+           models.UserNotification(user_id=user.id, title="t", body="recente", is_read=True, created_at=recent)]
+    )
+    db.commit()
+
+    moved = retention.archive_read_notifications(db, older_than_days=30, archive=True, batch_size=2)
+
+    assert moved == 5
+    remaining = {n.body for n in db.query(models.UserNotification).all()}
+    assert remaining == {"velha não lida", "recente"}
+    archived = db.query(models.NotificationArchive).all()
+    assert len(archived) == 5
+    assert all(a.user_id == user.id for a in archived)
+
+
+def test_delete_without_archive(db):
+    user = _user(db)
+    old = datetime.now(timezone.utc) - timedelta(days=40)
+    db.add(models.UserNotification(user_id=user.id, title="t", body="b", is_read=True, created_at=old))
+    db.commit()
+
+    assert retention.archive_read_notifications(db, older_than_days=30, archive=False) == 1
+    assert db.query(models.NotificationArchive).count() == 0
+    assert db.query(models.UserNotification).count() == 0
+
+
+def test_compacts_duplicates_and_fixes_unread_counter(db):
+    user = _user(db, unread=3)
+    db.add_all([
+        models.UserNotification(user_id=user.id, title="🚨", body="T4_BAG chegou a 900.", is_read=False)
+        for _ in range(3)
+    ] + [models.UserNotification(user_id=user.id, title="🚨", body="T5_BAG chegou a 900.", is_read=True)])
+    db.commit()
+
+    assert retention.compact_duplicate_notifications(db, batch_size=10) == 2
+
+    bodies = [n.body for n in db.query(models.UserNotification).order_by(models.UserNotification.id)]
+    assert bodies == ["T4_BAG chegou a 900.", "T5_BAG chegou a 900."]
+    db.refresh(user)
+    assert user.unread_notifications == 1
+
+
+def test_compaction_archives_duplicates_and_skips_old_pairs(db):
+    user = _user(db, unread=2)
+    old = datetime.now(timezone.utc) - timedelta(days=10)
+    db.add_all([
+        # par antigo: já teria sido compactado numa execução anterior
+        models.UserNotification(user_id=user.id, title="t", body="antiga", is_read=True, created_at=old),
+        models.UserNotification(user_id=user.id, title="t", body="antiga", is_read=True, created_at=old),
+        # cópia velha de uma notificação que acabou de chegar de novo
+        models.UserNotification(user_id=user.id, title="t", body="repetida", is_read=False, created_at=old),
+        models.UserNotification(user_id=user.id, title="t", body="repetida", is_read=False),
+    ])
+    db.commit()
+    stale_copy = db.query(models.UserNotification).filter_by(body="repetida").order_by(
+        models.UserNotification.id).first().id
+
+    assert retention.compact_duplicate_notifications(db, lookback_days=2, archive=True) == 1
+
+    assert db.query(models.UserNotification).filter_by(body="antiga").count() == 2
+    assert db.query(models.UserNotification).filter_by(body="repetida").count() == 1
+    assert [a.id for a in db.query(models.NotificationArchive)] == [stale_copy]
+    db.refresh(user)
+    assert user.unread_notifications == 1
+
+    # lookback 0: tabela inteira
+    assert retention.compact_duplicate_notifications(db, lookback_days=0, archive=False) == 1
+    assert db.query(models.NotificationArchive).count() == 1
+
+
+def test_compaction_groups_firings_of_the_same_alert(db):
+    """Disparos do mesmo alerta têm preços diferentes no texto e ainda assim são repetidos."""
+    from app.services import alert_checker
+
+    user = _user(db, name="compactalert")
+    user.alert_digest_enabled = False
+    db.commit()
+
+    def fire(alert_id, price):
+        alert_checker.deliver_firings(db, [{
+            "alert_id": alert_id, "user_id": user.id, "item": "T4_BAG", "current_price": price,
+            "city": None, "expected_price": None, "percent_below": 0.0, "previous_trigger": None,
+        }])
+        db.commit()
+
+    fire(1, 900.0)
+    fire(1, 850.0)
+    fire(2, 900.0)  # outro alerta do mesmo item: não é repetição
+
+    assert retention.compact_duplicate_notifications(db, lookback_days=2, archive=False) == 1
+    remaining = db.query(models.UserNotification).order_by(models.UserNotification.id).all()
+    assert [(n.alert_id, n.body) for n in remaining] == [
+        (1, "T4_BAG chegou a 850."),
+        (2, "T4_BAG chegou a 900."),
+    ]
+    db.refresh(user)
+    assert user.unread_notifications == 2
+
+
+def test_run_retention_endpoint(client, monkeypatch):
+    monkeypatch.setenv("CRON_SECRET", "segredo")
+    assert client.post("/alerts/run-retention").status_code == 401
+
+    resp = client.post("/alerts/run-retention", headers={"X-Cron-Secret": "segredo"})
+    assert resp.status_code == 200
+    assert resp.json() == {"compacted": 0, "archived": 0}
+
+    # Vercel Cron: GET com o segredo como Bearer
+    assert client.get("/alerts/run-retention", headers={"Authorization": "Bearer errado"}).status_code == 401
+    resp = client.get("/alerts/run-retention", headers={"Authorization": "Bearer segredo"})
+    assert resp.status_code == 200
@@ -0,0 +1,57 @@
+"""
+Cold start: importar o app (o que o Vercel faz a cada instância nova) não
+pode ler os catálogos de itens nem abrir conexão com o banco.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import api.index
+elapsed = time.perf_counter() - started
+from app.core.db_pool import pool_stats
+from app.database import current_async_engine
+from app.utils import albion_index
+print(json.dumps({
+    "elapsed": elapsed,
+    "catalog_loaded": albion_index._carregado,
+    "checkouts": pool_stats["sync"].checkouts,
+    "async_engine": current_async_engine() is not None,
+}))
+"""
+
+
+def _import_app(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k != "TESTING"}
+    env.update(SECRET_KEY="x", DATABASE_URL=f"sqlite:///{tmp_path / 'cold.db'}")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True, timeout=60,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_import_does_not_touch_db_or_catalog(tmp_path):
+    result = _import_app(tmp_path)
+
+    assert result["catalog_loaded"] is False
+    assert result["async_engine"] is False
+    assert result["checkouts"] == 0
+    # o SQLite cria o arquivo na primeira conexão
+    assert not (tmp_path / "cold.db").exists()
+    # folga grande: o que importa é não voltar a carregar catálogo/banco no import
+    assert result["elapsed"] < 5
+
+
+def test_catalog_loads_on_first_search():
+    from app.utils import albion_index
+
+    assert albion_index.buscar_item_por_nome("Bolsa", "pt_br")
+    assert albion_index._carregado
+    assert albion_index.ALBION_ITEMS
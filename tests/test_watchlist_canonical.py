@@ -0,0 +1,85 @@
+from app import models
+from app.services import watchlist_canonical
+from app.utils.albion_index import resolver_unique_name
+
+
+def _user(db, name):
+    user = models.User(username=name, email=f"{name}@example.com", hashed_password="...")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_backfill_resolves_legacy_names_once(db, monkeypatch):
+    ana, bia = _user(db, "ana"), _user(db, "bia")
+    bolsa = resolver_unique_name("Bolsa do Adepto")
+    db.add_all([
+        models.UserItem(user_id=ana.id, item_name="Bolsa do Adepto"),
+        models.UserItem(user_id=ana.id, item_name="t5_bag"),
+        models.UserItem(user_id=ana.id, item_name="zzzz qqqq"),
+        models.UserItem(user_id=bia.id, item_name=bolsa),
+        models.UserItem(user_id=bia.id, item_name="Bolsa do Adepto"),  # duplicado
+    ])
+    db.commit()
+
+    lookups = []
+    real = watchlist_canonical.resolver_unique_name
+    monkeypatch.setattr(watchlist_canonical, "resolver_unique_name",
+                        lambda name: lookups.append(name) or real(name))
+
+    stats = watchlist_canonical.canonicalize_watchlist(db, batch_size=2)
+
+    assert stats == {"scanned": 5, "resolved": 2, "unresolved": 1, "merged": 1}
+    assert lookups.count("Bolsa do Adepto") == 1
+    rows = {(i.user_id, i.item_name, i.unresolved) for i in db.query(models.UserItem)}
+    assert rows == {
+        (ana.id, bolsa, False),
+        (ana.id, "T5_BAG", False),
+        (ana.id, "zzzz qqqq", True),
+        (bia.id, bolsa, False),
+    }
+
+    # segunda rodada não tem o que fazer
+    again = watchlist_canonical.canonicalize_watchlist(db)
+    assert again["resolved"] == again["unresolved"] == again["merged"] == 0
+
+
+def test_merge_keeps_legacy_display_name(db):
+    ana, bia = _user(db, "ana"), _user(db, "bia")
+    bolsa = resolver_unique_name("Bolsa do Adepto")
+    db.add_all([
+        models.UserItem(user_id=ana.id, item_name=bolsa),
+        models.UserItem(user_id=ana.id, item_name="Bolsa do Adepto", display_name="Minha bolsa"),
+        models.UserItem(user_id=bia.id, item_name=bolsa, display_name="Bolsa da Bia"),
+        models.UserItem(user_id=bia.id, item_name="Bolsa do Adepto", display_name="Outra"),
+    ])
+    db.commit()
+
+    stats = watchlist_canonical.canonicalize_watchlist(db)
+
+    assert stats["merged"] == 2
+    db.expire_all()
+    rows = {(i.user_id, i.item_name, i.display_name) for i in db.query(models.UserItem)}
+    # a linha que fica herda o nome só quando não tinha um
+    assert rows == {(ana.id, bolsa, "Minha bolsa"), (bia.id, bolsa, "Bolsa da Bia")}
+
+
+def test_price_routes_skip_unresolved_items(client, db, auth_header, monkeypatch):
+    from app.routers import albion
+
+    user = db.query(models.User).filter_by(username="fixtureuser").one()
+    db.add_all([
+        models.UserItem(user_id=user.id, item_name="T4_BAG"),
+        models.UserItem(user_id=user.id, item_name="zzzz qqqq", unresolved=True),
+    ])
+    db.commit()
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("nome resolvido durante a requisição")
+
+    asked = []
+    monkeypatch.setattr(albion, "get_prices", lambda items, **kw: asked.extend(items) or [])
+    monkeypatch.setattr(albion, "buscar_item_por_nome", no_search)
+
+    assert client.get("/albion/my-items-prices", headers=auth_header).status_code == 200
+    assert asked == ["T4_BAG"]